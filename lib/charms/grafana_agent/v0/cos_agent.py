@@ -211,12 +211,15 @@ class GrafanaAgentMachineCharm(GrafanaAgentCharm)
 ```
 """
 
+import base64
 import copy
 import enum
 import hashlib
 import json
 import logging
+import os
 import socket
+import zlib
 from collections import namedtuple
 from itertools import chain
 from pathlib import Path
@@ -226,6 +229,7 @@ from typing import (
     Callable,
     ClassVar,
     Dict,
+    Iterable,
     List,
     Literal,
     MutableMapping,
@@ -239,7 +243,7 @@ import pydantic
 from cosl import DashboardPath40UID, JujuTopology, LZMABase64
 from cosl.rules import AlertRules, generic_alert_groups
 from ops.charm import RelationChangedEvent
-from ops.framework import EventBase, EventSource, Object, ObjectEvents
+from ops.framework import EventBase, EventSource, Object, ObjectEvents, StoredState
 from ops.model import ModelError, Relation
 from ops.testing import CharmType
 
@@ -256,17 +260,67 @@ if TYPE_CHECKING:
 
 LIBID = "dc15fa84cef84ce58155fb84f6c6213a"
 LIBAPI = 0
-LIBPATCH = 26
+LIBPATCH = 38
 
 PYDEPS = ["cosl >= 0.0.50", "pydantic"]
 
 DEFAULT_RELATION_NAME = "cos-agent"
 DEFAULT_PEER_RELATION_NAME = "peers"
+DEFAULT_DASHBOARDS_CACHE_MAX_BYTES = 32 * 1024 * 1024
 
 logger = logging.getLogger(__name__)
 SnapEndpoint = namedtuple("SnapEndpoint", "owner, name")
 
 
+def _zlib_compress(data: str) -> str:
+    return base64.b64encode(zlib.compress(data.encode("utf-8"))).decode("utf-8")
+
+
+def _zlib_decompress(data: str) -> str:
+    return zlib.decompress(base64.b64decode(data)).decode("utf-8")
+
+
+# Codecs dashboards can be encoded with, by name, fastest first. The requirer advertises the ones
+# it can decode and the provider picks the first of its own it finds there. "lzma" is the only
+# codec older versions of this library know of: its payloads are not prefixed, and it is used
+# whenever the requirer does not advertise any codec. Other payloads are prefixed with "<name>:".
+DASHBOARD_CODECS: Dict[str, Tuple[Callable[[str], str], Callable[[str], str]]] = {}
+try:
+    from compression import zstd  # type: ignore  # Python >= 3.14
+
+    DASHBOARD_CODECS["zstd"] = (
+        lambda data: base64.b64encode(zstd.compress(data.encode("utf-8"))).decode("utf-8"),
+        lambda data: zstd.decompress(base64.b64decode(data)).decode("utf-8"),
+    )
+except ImportError:
+    pass
+DASHBOARD_CODECS["zlib"] = (_zlib_compress, _zlib_decompress)
+DASHBOARD_CODECS["lzma"] = (LZMABase64.compress, LZMABase64.decompress)
+DEFAULT_DASHBOARD_CODEC = "lzma"
+
+
+def encode_dashboard(dashboard: str, codec: str = DEFAULT_DASHBOARD_CODEC) -> str:
+    """Compress a serialized dashboard with `codec`, into a self-describing payload."""
+    encoded = DASHBOARD_CODECS[codec][0](dashboard)
+    return encoded if codec == DEFAULT_DASHBOARD_CODEC else f"{codec}:{encoded}"
+
+
+def decode_dashboard(encoded_dashboard: str) -> str:
+    """Decompress a payload made by `encode_dashboard`, whatever codec it was made with."""
+    # Base64, hence unprefixed lzma payloads, never contain a colon.
+    codec, _, payload = encoded_dashboard.rpartition(":")
+    if not codec:
+        codec = DEFAULT_DASHBOARD_CODEC
+    if codec not in DASHBOARD_CODECS:
+        raise ValueError(f"unsupported dashboard codec: {codec}")
+    return DASHBOARD_CODECS[codec][1](payload)
+
+
+def _dashboard_codec_of(encoded_dashboard: str) -> str:
+    """The codec a payload made by `encode_dashboard` was made with."""
+    return encoded_dashboard.rpartition(":")[0] or DEFAULT_DASHBOARD_CODEC
+
+
 class TransportProtocolType(str, enum.Enum):
     """Receiver Type."""
 
@@ -310,6 +364,43 @@ def _dedupe_list(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     return unique_items
 
 
+def _minify_panel(panel: Dict[str, Any]) -> Dict[str, Any]:
+    minified = {}
+    for key, value in panel.items():
+        if value in (None, "", [], {}):
+            continue  # same as the panel default
+        if key == "panels" and isinstance(value, list):
+            # rows nest their panels
+            value = [_minify_panel(p) if isinstance(p, dict) else p for p in value]
+        minified[key] = value
+    return minified
+
+
+def _drop_nulls(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: _drop_nulls(v) for k, v in value.items() if v is not None}
+    if isinstance(value, list):
+        return [_drop_nulls(v) for v in value]
+    return value
+
+
+def minify_dashboard(dashboard: Dict[str, Any]) -> str:
+    """Serialize a dashboard as compactly as Grafana allows.
+
+    Null values, and empty panel fields, are dropped since Grafana falls back to the same
+    defaults without them. Keys are sorted and whitespace removed, which also makes dashboards
+    compress better.
+    """
+    minified = _drop_nulls(dashboard)
+    # Provisioned dashboards may wrap the dashboard itself in a "dashboard" key.
+    for container in (minified, minified.get("dashboard")):
+        if isinstance(container, dict) and isinstance(container.get("panels"), list):
+            container["panels"] = [
+                _minify_panel(p) if isinstance(p, dict) else p for p in container["panels"]
+            ]
+    return json.dumps(minified, sort_keys=True, separators=(",", ":"))
+
+
 def _dict_hash_except_key(scrape_config: Dict[str, Any], key: Optional[str]):
     """Get a hash of the scrape_config dict, except for the specified key."""
     cfg_for_hash = {k: v for k, v in scrape_config.items() if k != key}
@@ -613,6 +704,10 @@ class CosAgentRequirerUnitData(DatabagModel):  # type: ignore
         ...,
         description="List of all receivers enabled on the tracing provider.",
     )
+    dashboard_codecs: Optional[List[str]] = pydantic.Field(
+        None,
+        description="Codecs the requirer can decode dashboards with, fastest first.",
+    )
 
 
 class COSAgentProvider(Object):
@@ -633,6 +728,7 @@ class COSAgentProvider(Object):
         *,
         scrape_configs: Optional[Union[List[dict], Callable[[], List[Dict[str, Any]]]]] = None,
         extra_alert_groups: Optional[Callable[[], Dict[str, Any]]] = None,
+        dashboards_budget_bytes: Optional[int] = None,
     ):
         """Create a COSAgentProvider instance.
 
@@ -656,6 +752,8 @@ class COSAgentProvider(Object):
             extra_alert_groups: A callable that returns a dict of alert rule groups in case the
                 alerts need to be generated dynamically. The contents of this dict will be merged
                 with generic and bundled alert rules.
+            dashboards_budget_bytes: Compressed size the dashboards should fit in; a warning is
+                logged when they do not.
         """
         super().__init__(charm, relation_name)
         dashboard_dirs = dashboard_dirs or ["./src/grafana_dashboards"]
@@ -665,6 +763,7 @@ class COSAgentProvider(Object):
         self._metrics_endpoints = metrics_endpoints or []
         self._scrape_configs = scrape_configs or []
         self._extra_alert_groups = extra_alert_groups or {}
+        self._dashboards_budget_bytes = dashboards_budget_bytes
         self._metrics_rules = metrics_rules_dir
         self._logs_rules = logs_rules_dir
         self._recursive = recurse_rules_dirs
@@ -683,6 +782,8 @@ class COSAgentProvider(Object):
     def _on_refresh(self, event):
         """Trigger the class to update relation data."""
         relations = self._charm.model.relations[self._relation_name]
+        # Dashboards by codec, so that they are only encoded once per codec the relations use.
+        dashboards: Dict[str, List[str]] = {}
 
         for relation in relations:
             # Before a principal is related to the grafana-agent subordinate, we'd get
@@ -690,11 +791,14 @@ class COSAgentProvider(Object):
             # Add a guard to make sure it doesn't happen.
             if relation.data and self._charm.unit in relation.data:
                 # Subordinate relations can communicate only over unit data.
+                codec = self._dashboard_codec(relation)
+                if codec not in dashboards:
+                    dashboards[codec] = self._encoded_dashboards(codec)
                 try:
                     data = CosAgentProviderUnitData(
                         metrics_alert_rules=self._metrics_alert_rules,
                         log_alert_rules=self._log_alert_rules,
-                        dashboards=self._dashboards,
+                        dashboards=dashboards[codec],
                         metrics_scrape_jobs=self._scrape_jobs,
                         log_slots=self._log_slots,
                         tracing_protocols=self._tracing_protocols,
@@ -783,8 +887,25 @@ class COSAgentProvider(Object):
         alert_rules.add_path(self._logs_rules, recursive=self._recursive)
         return alert_rules.as_dict()
 
+    def _dashboard_codec(self, relation: Relation) -> str:
+        """The fastest codec dashboards can be encoded with that the requirer can decode."""
+        unit = next(iter(relation.units), None)
+        if not unit:
+            return DEFAULT_DASHBOARD_CODEC
+        try:
+            remote_codecs = CosAgentRequirerUnitData.load(relation.data[unit]).dashboard_codecs
+        except (json.JSONDecodeError, pydantic.ValidationError, DataValidationError):
+            return DEFAULT_DASHBOARD_CODEC
+        for codec in DASHBOARD_CODECS:
+            if codec in (remote_codecs or ()):
+                return codec
+        return DEFAULT_DASHBOARD_CODEC
+
     @property
     def _dashboards(self) -> List[str]:
+        return self._encoded_dashboards(DEFAULT_DASHBOARD_CODEC)
+
+    def _encoded_dashboards(self, codec: str) -> List[str]:
         dashboards: List[str] = []
         for d in self._dashboard_dirs:
             for path in Path(d).glob("*"):
@@ -804,7 +925,25 @@ class COSAgentProvider(Object):
                     tags.append(f"charm: {self._charm.meta.name}")
                 dashboard["tags"] = tags
 
-                dashboards.append(LZMABase64.compress(json.dumps(dashboard)))
+                minified = minify_dashboard(dashboard)
+                encoded = encode_dashboard(minified, codec)
+                logger.debug(
+                    "dashboard %s: %d bytes raw, %d minified, %d compressed with %s",
+                    rel_path,
+                    path.stat().st_size,
+                    len(minified),
+                    len(encoded),
+                    codec,
+                )
+                dashboards.append(encoded)
+
+        total = sum(len(encoded) for encoded in dashboards)
+        if self._dashboards_budget_bytes is not None and total > self._dashboards_budget_bytes:
+            logger.warning(
+                "dashboards take %d bytes compressed, over the budget of %d bytes",
+                total,
+                self._dashboards_budget_bytes,
+            )
         return dashboards
 
     @property
@@ -927,6 +1066,30 @@ class COSAgentDataChanged(EventBase):
     """Event emitted by `COSAgentRequirer` when relation data changes."""
 
 
+class COSAgentMetricsJobsChanged(COSAgentDataChanged):
+    """Event emitted by `COSAgentRequirer` when the metrics scrape jobs change."""
+
+
+class COSAgentMetricsRulesChanged(COSAgentDataChanged):
+    """Event emitted by `COSAgentRequirer` when the metrics alert rules change."""
+
+
+class COSAgentLogRulesChanged(COSAgentDataChanged):
+    """Event emitted by `COSAgentRequirer` when the log alert rules change."""
+
+
+class COSAgentDashboardsChanged(COSAgentDataChanged):
+    """Event emitted by `COSAgentRequirer` when the dashboards change."""
+
+
+class COSAgentLogSlotsChanged(COSAgentDataChanged):
+    """Event emitted by `COSAgentRequirer` when the snap log slots change."""
+
+
+class COSAgentTracingProtocolsChanged(COSAgentDataChanged):
+    """Event emitted by `COSAgentRequirer` when the requested tracing protocols change."""
+
+
 class COSAgentValidationError(EventBase):
     """Event emitted by `COSAgentRequirer` when there is an error in the relation data."""
 
@@ -947,13 +1110,92 @@ class COSAgentRequirerEvents(ObjectEvents):
     """`COSAgentRequirer` events."""
 
     data_changed = EventSource(COSAgentDataChanged)
+    metrics_jobs_changed = EventSource(COSAgentMetricsJobsChanged)
+    metrics_rules_changed = EventSource(COSAgentMetricsRulesChanged)
+    log_rules_changed = EventSource(COSAgentLogRulesChanged)
+    dashboards_changed = EventSource(COSAgentDashboardsChanged)
+    log_slots_changed = EventSource(COSAgentLogSlotsChanged)
+    tracing_protocols_changed = EventSource(COSAgentTracingProtocolsChanged)
     validation_error = EventSource(COSAgentValidationError)
 
 
+# The event `COSAgentRequirer` emits when each field of the provider data changes.
+_PROVIDER_FIELD_EVENTS = {
+    "metrics_scrape_jobs": "metrics_jobs_changed",
+    "metrics_alert_rules": "metrics_rules_changed",
+    "log_alert_rules": "log_rules_changed",
+    "dashboards": "dashboards_changed",
+    "log_slots": "log_slots_changed",
+    "tracing_protocols": "tracing_protocols_changed",
+}
+# The provider data fields that are forwarded to the leader over peer data.
+_PEER_FIELDS = ("metrics_alert_rules", "log_alert_rules", "dashboards")
+# The peer unit databag key each unit advertises the dashboard codecs it can decode under. Units
+# running older versions of this library do not advertise any: they only decode lzma.
+_PEER_CODECS_KEY = "dashboard_codecs"
+
+
+class _DashboardsCache:
+    """Bounded on-disk cache of decoded dashboards, keyed by a digest of their encoded form.
+
+    Cached dashboards are kept as JSON, so a hit skips the decompression; the least recently
+    used ones are evicted once the cache grows beyond `max_bytes`.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int = DEFAULT_DASHBOARDS_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, encoded_dashboard: str) -> Dict[str, Any]:
+        """Return the decoded dashboard, decompressing it only if it is not cached."""
+        digest = hashlib.sha256(encoded_dashboard.encode()).hexdigest()
+        path = self.directory / f"{digest}.json"
+        try:
+            dashboard = json.loads(path.read_text())
+            path.touch()  # mark as recently used
+            self.hits += 1
+            return dashboard
+        except (OSError, ValueError):
+            # Not cached, or not readable (e.g. corrupted on disk): decode it again.
+            pass
+        decoded = decode_dashboard(encoded_dashboard)
+        self.misses += 1
+        self._store(path, decoded)
+        return json.loads(decoded)
+
+    def _store(self, path: Path, decoded: str):
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            # Written aside then moved in place, so that an interrupted hook cannot leave a
+            # truncated entry behind.
+            tmp_path = path.with_name(f"{path.name}.tmp")
+            tmp_path.write_text(decoded)
+            os.replace(tmp_path, path)
+            self._evict()
+        except OSError as e:
+            # The cache is an optimization only: a dashboard that cannot be cached is not an error.
+            logger.debug("could not cache dashboard %s: %s", path.name, e)
+
+    def _evict(self):
+        entries = sorted(
+            ((entry.stat(), entry) for entry in self.directory.glob("*.json")),
+            key=lambda item: item[0].st_mtime,
+            reverse=True,
+        )
+        size = 0
+        for stat, entry in entries:
+            size += stat.st_size
+            if size > self.max_bytes:
+                entry.unlink(missing_ok=True)
+
+
 class COSAgentRequirer(Object):
     """Integration endpoint wrapper for the Requirer side of the cos_agent interface."""
 
     on = COSAgentRequirerEvents()  # pyright: ignore
+    _stored = StoredState()
 
     def __init__(
         self,
@@ -963,6 +1205,9 @@ class COSAgentRequirer(Object):
         peer_relation_name: str = DEFAULT_PEER_RELATION_NAME,
         refresh_events: Optional[List[str]] = None,
         is_tracing_ready: Optional[Callable] = None,
+        dashboards_cache_dir: Optional[Union[str, Path]] = None,
+        dashboards_cache_max_bytes: int = DEFAULT_DASHBOARDS_CACHE_MAX_BYTES,
+        dashboards_budget_bytes: Optional[int] = None,
     ):
         """Create a COSAgentRequirer instance.
 
@@ -972,6 +1217,11 @@ class COSAgentRequirer(Object):
             peer_relation_name: The name of the peer relation to communicate over.
             refresh_events: List of events on which to refresh relation data.
             is_tracing_ready: Custom function to evaluate whether the trace receiver url should be sent.
+            dashboards_cache_dir: Directory to cache decompressed dashboards in, across hooks.
+                Dashboards are decompressed every time they are read if not set.
+            dashboards_cache_max_bytes: Size the dashboards cache is kept under.
+            dashboards_budget_bytes: Compressed size the dashboards of each principal application
+                should fit in; a warning is logged for those that do not.
         """
         super().__init__(charm, relation_name)
         self._charm = charm
@@ -979,6 +1229,23 @@ class COSAgentRequirer(Object):
         self._peer_relation_name = peer_relation_name
         self._refresh_events = refresh_events or [self._charm.on.config_changed]
         self._is_tracing_ready = is_tracing_ready
+        self._dashboards_budget_bytes = dashboards_budget_bytes
+        # Raw and validated provider data, by cos-agent relation id, for this dispatch.
+        self._provider_data_snapshot: Dict[
+            int, Tuple[str, Optional[CosAgentProviderUnitData]]
+        ] = {}
+        # Raw and parsed peer data, by peer unit name and databag key, for this dispatch.
+        self._peer_data_snapshot: Dict[Tuple[str, str], Tuple[str, CosAgentPeersUnitData]] = {}
+        # Digest of the provider data last processed, as a whole and by field, by cos-agent
+        # relation id, and the codecs the forwarded dashboards were last re-encoded for.
+        self._stored.set_default(
+            provider_digests={}, provider_field_digests={}, peer_dashboard_codecs=None
+        )
+        self._dashboards_cache = (
+            _DashboardsCache(Path(dashboards_cache_dir), dashboards_cache_max_bytes)
+            if dashboards_cache_dir
+            else None
+        )
 
         events = self._charm.on[relation_name]
         self.framework.observe(
@@ -1009,10 +1276,87 @@ class COSAgentRequirer(Object):
         return self.model.get_relation(self._peer_relation_name)
 
     def _on_peer_relation_changed(self, _):
+        self._advertise_dashboard_codecs()
+        # A unit that cannot decode some of the forwarded dashboards may have joined.
+        self._transcode_peer_dashboards()
         # Peer data is used for forwarding data from principal units to the grafana agent
         # subordinate leader, for updating the app data of the outgoing o11y relations.
         if self._charm.unit.is_leader():
-            self.on.data_changed.emit()  # pyright: ignore
+            self._emit_changes(_PEER_FIELDS)
+
+    def _advertise_dashboard_codecs(self):
+        """Tell the peers which codecs this unit can decode dashboards with."""
+        if not self.peer_relation:
+            return
+        databag = self.peer_relation.data[self._charm.unit]
+        codecs = json.dumps(list(DASHBOARD_CODECS))
+        if databag.get(_PEER_CODECS_KEY) != codecs:
+            databag[_PEER_CODECS_KEY] = codecs
+
+    def _peer_dashboard_codecs(self) -> Set[str]:
+        """The codecs every unit on the peer relation can decode dashboards with."""
+        codecs = set(DASHBOARD_CODECS)
+        if not self.peer_relation:
+            return codecs
+        for unit in self.peer_relation.units:
+            try:
+                advertised = json.loads(
+                    self.peer_relation.data[unit].get(_PEER_CODECS_KEY) or "[]"
+                )
+            except json.JSONDecodeError:
+                advertised = []
+            codecs.intersection_update({*advertised, DEFAULT_DASHBOARD_CODEC})
+        return codecs
+
+    @staticmethod
+    def _peer_dashboards(dashboards: Optional[List[str]], codecs: Set[str]) -> Optional[List[str]]:
+        """`dashboards`, with those in a codec not in `codecs` encoded with the default one."""
+        if dashboards is None:
+            return None
+        return [
+            encode_dashboard(decode_dashboard(dashboard))
+            if (codec := _dashboard_codec_of(dashboard)) not in codecs
+            and codec in DASHBOARD_CODECS
+            else dashboard
+            for dashboard in dashboards
+        ]
+
+    def _transcode_peer_dashboards(self):
+        """Re-encode the forwarded dashboards for the codecs every peer can decode now.
+
+        Dashboards are downgraded to the default codec when a unit that cannot decode them
+        joins, and restored from the principal's data once every peer can decode its codec again.
+        """
+        if not self.peer_relation:
+            return
+        codecs = self._peer_dashboard_codecs()
+        if self._stored.peer_dashboard_codecs == sorted(codecs):  # pyright: ignore
+            return
+        relations = {
+            str(relation.id): relation
+            for relation in self._charm.model.relations[self._relation_name]
+        }
+        databag = self.peer_relation.data[self._charm.unit]
+        for key, raw in list(databag.items()):
+            if not key.startswith(f"{CosAgentPeersUnitData.KEY}-"):
+                continue
+            data = self._peer_data(self._charm.unit.name, key, raw)
+            relation = relations.get(data.relation_id)
+            provider_data = self._provider_data(relation) if relation else None
+            dashboards = self._peer_dashboards(
+                provider_data.dashboards if provider_data else data.dashboards, codecs
+            )
+            if dashboards == data.dashboards:
+                continue
+            databag[key] = CosAgentPeersUnitData(
+                unit_name=data.unit_name,
+                relation_id=data.relation_id,
+                relation_name=data.relation_name,
+                metrics_alert_rules=data.metrics_alert_rules,
+                log_alert_rules=data.log_alert_rules,
+                dashboards=dashboards,
+            ).json()
+        self._stored.peer_dashboard_codecs = sorted(codecs)  # pyright: ignore
 
     def _on_relation_departed(self, event):
         """Remove provider's (principal's) alert rules and dashboards from peer data when the cos-agent relation to the principal is removed."""
@@ -1031,8 +1375,10 @@ class COSAgentRequirer(Object):
         self.peer_relation.data[self._charm.unit][
             f"{CosAgentPeersUnitData.KEY}-{event.unit.name}"
         ] = data.json()
+        self._stored.provider_digests.pop(str(event.relation.id), None)  # pyright: ignore
+        self._stored.provider_field_digests.pop(str(event.relation.id), None)  # pyright: ignore
 
-        self.on.data_changed.emit()  # pyright: ignore
+        self._emit_changes(_PROVIDER_FIELD_EVENTS)
 
     def _on_relation_data_changed(self, event: RelationChangedEvent):
         # Peer data is the only means of communication between subordinate units.
@@ -1040,6 +1386,7 @@ class COSAgentRequirer(Object):
             event.defer()
             return
 
+        self._advertise_dashboard_codecs()
         cos_agent_relation = event.relation
         if not event.unit or not cos_agent_relation.data.get(event.unit):
             return
@@ -1057,33 +1404,69 @@ class COSAgentRequirer(Object):
         if not (raw := cos_agent_relation.data[principal_unit].get(CosAgentProviderUnitData.KEY)):
             return
 
-        if not (provider_data := self._validated_provider_data(raw)):
+        # Most relation-changed events carry the same data as the previous one: skip those.
+        # The digest covers the library version too, since what is derived from the data may
+        # differ across versions.
+        peer_key = f"{CosAgentPeersUnitData.KEY}-{principal_unit.name}"
+        digest = hashlib.sha256(f"{LIBPATCH}\0{raw}".encode()).hexdigest()
+        provider_digests = self._stored.provider_digests  # pyright: ignore
+        if (
+            provider_digests.get(str(cos_agent_relation.id)) == digest
+            and peer_key in self.peer_relation.data[self._charm.unit]
+        ):
+            logger.debug("cos-agent data of %s unchanged", principal_unit.name)
+            return
+
+        # The principal's data changed: parse it again, but only for this relation.
+        self._provider_data_snapshot.pop(cos_agent_relation.id, None)
+        if not (provider_data := self._provider_data(cos_agent_relation)):
             return
 
+        # Tell which parts of the data changed, so that only the work depending on them is done.
+        field_digests = {
+            field: hashlib.sha256(
+                json.dumps(getattr(provider_data, field), sort_keys=True).encode()
+            ).hexdigest()
+            for field in _PROVIDER_FIELD_EVENTS
+        }
+        provider_field_digests = self._stored.provider_field_digests  # pyright: ignore
+        previous = provider_field_digests.get(str(cos_agent_relation.id), {})
+        changed = [field for field, d in field_digests.items() if previous.get(field) != d]
+
         # write enabled receivers to cos-agent relation
-        try:
+        if not previous or "tracing_protocols" in changed:
             self.update_tracing_receivers()
-        except ModelError:
-            raise
 
         # Copy data from the cos_agent relation to the peer relation, so the leader could
-        # follow up.
+        # follow up. Dashboards stay in the default codec until every peer can decode the one
+        # the principal used.
         # Save the originating unit name, so it could be used for topology later on by the leader.
-        data = CosAgentPeersUnitData(  # peer relation databag model
-            unit_name=event.unit.name,
-            relation_id=str(event.relation.id),
-            relation_name=event.relation.name,
-            metrics_alert_rules=provider_data.metrics_alert_rules,
-            log_alert_rules=provider_data.log_alert_rules,
-            dashboards=provider_data.dashboards,
-        )
-        self.peer_relation.data[self._charm.unit][
-            f"{CosAgentPeersUnitData.KEY}-{event.unit.name}"
-        ] = data.json()
+        peer_databag = self.peer_relation.data[self._charm.unit]
+        if peer_key not in peer_databag or set(changed).intersection(_PEER_FIELDS):
+            data = CosAgentPeersUnitData(  # peer relation databag model
+                unit_name=event.unit.name,
+                relation_id=str(event.relation.id),
+                relation_name=event.relation.name,
+                metrics_alert_rules=provider_data.metrics_alert_rules,
+                log_alert_rules=provider_data.log_alert_rules,
+                dashboards=self._peer_dashboards(
+                    provider_data.dashboards, self._peer_dashboard_codecs()
+                ),
+            )
+            peer_databag[peer_key] = data.json()
+        provider_digests[str(cos_agent_relation.id)] = digest
+        provider_field_digests[str(cos_agent_relation.id)] = field_digests
+
+        # Emitted on every unit, leader or not: each of them renders the data of its principal.
+        self._emit_changes(changed)
 
-        # We can't easily tell if the data that was changed is limited to only the data
-        # that goes into peer relation (in which case, if this is not a leader unit, we wouldn't
-        # need to emit `on.data_changed`), so we're emitting `on.data_changed` either way.
+    def _emit_changes(self, fields: Iterable[str]):
+        """Emit the change event of each of the provider data `fields`, then `data_changed`."""
+        fields = list(fields)
+        if not fields:
+            return
+        for field in fields:
+            getattr(self.on, _PROVIDER_FIELD_EVENTS[field]).emit()
         self.on.data_changed.emit()  # pyright: ignore
 
     def update_tracing_receivers(self):
@@ -1093,7 +1476,7 @@ class COSAgentRequirer(Object):
         )
         try:
             for relation in self._charm.model.relations[self._relation_name]:
-                CosAgentRequirerUnitData(
+                data = CosAgentRequirerUnitData(
                     receivers=[
                         Receiver(
                             # if tracing isn't ready, we don't want the wrong receiver URLs present in the databag.
@@ -1113,7 +1496,12 @@ class COSAgentRequirer(Object):
                         )
                         for protocol in self.requested_tracing_protocols()
                     ],
-                ).dump(relation.data[self._charm.unit])
+                    dashboard_codecs=list(DASHBOARD_CODECS),
+                )
+                databag = relation.data[self._charm.unit]
+                # Only rewrite the databag (and notify the principal) if the data changed.
+                if any(databag.get(key) != value for key, value in data.dump().items()):
+                    data.dump(databag)
 
         except ModelError as e:
             # args are bytes
@@ -1129,6 +1517,24 @@ class COSAgentRequirer(Object):
                     return
             raise
 
+    def _provider_data(self, relation: Relation) -> Optional[CosAgentProviderUnitData]:
+        """Validated data of the principal unit on `relation`, if any.
+
+        The data of each relation is only parsed and validated once per dispatch, however many
+        of the accessors need it.
+        """
+        unit = next(iter(relation.units), None)
+        if not unit:
+            return None
+        if not (raw := relation.data[unit].get(CosAgentProviderUnitData.KEY)):
+            return None
+        cached = self._provider_data_snapshot.get(relation.id)
+        if cached and cached[0] == raw:
+            return cached[1]
+        provider_data = self._validated_provider_data(raw)
+        self._provider_data_snapshot[relation.id] = (raw, provider_data)
+        return provider_data
+
     def _validated_provider_data(self, raw) -> Optional[CosAgentProviderUnitData]:
         try:
             return CosAgentProviderUnitData(**json.loads(raw))
@@ -1139,7 +1545,7 @@ class COSAgentRequirer(Object):
     def trigger_refresh(self, _):
         """Trigger a refresh of relation data."""
         # FIXME: Figure out what we should do here
-        self.on.data_changed.emit()  # pyright: ignore
+        self._emit_changes(_PROVIDER_FIELD_EVENTS)
 
     def _get_requested_protocols(self, relation: Relation):
         # Coherence check
@@ -1150,15 +1556,7 @@ class COSAgentRequirer(Object):
                 f"unexpected error: subordinate relation {relation} should have exactly one unit"
             )
 
-        unit = next(iter(units), None)
-
-        if not unit:
-            return None
-
-        if not (raw := relation.data[unit].get(CosAgentProviderUnitData.KEY)):
-            return None
-
-        if not (provider_data := self._validated_provider_data(raw)):
+        if not (provider_data := self._provider_data(relation)):
             return None
 
         return provider_data.tracing_protocols
@@ -1203,9 +1601,7 @@ class COSAgentRequirer(Object):
             if not relation.units:
                 continue
             unit = next(iter(relation.units))
-            if not (raw := relation.data[unit].get(CosAgentProviderUnitData.KEY)):
-                continue
-            if not (provider_data := self._validated_provider_data(raw)):
+            if not (provider_data := self._provider_data(relation)):
                 continue
 
             topology = JujuTopology(
@@ -1219,6 +1615,20 @@ class COSAgentRequirer(Object):
 
         return all_data
 
+    def _peer_data(self, unit_name: str, key: str, raw: str) -> CosAgentPeersUnitData:
+        """Parsed peer databag entry `key` of `unit_name`, whose content is `raw`.
+
+        The metrics alerts, log alerts and dashboards are all gathered from the peer data, usually
+        within the same dispatch, and validating every entry is the bulk of gathering them: each
+        entry is only parsed once per dispatch. The parsed data is shared: it must not be modified.
+        """
+        cached = self._peer_data_snapshot.get((unit_name, key))
+        if cached and cached[0] == raw:
+            return cached[1]
+        data = CosAgentPeersUnitData(**json.loads(raw))
+        self._peer_data_snapshot[(unit_name, key)] = (raw, data)
+        return data
+
     def _gather_peer_data(self) -> List[CosAgentPeersUnitData]:
         """Collect data from the peers.
 
@@ -1244,7 +1654,7 @@ class COSAgentRequirer(Object):
                 raw = relation.data[unit].get(unit_name)
                 if raw is None:
                     continue
-                data = CosAgentPeersUnitData(**json.loads(raw))
+                data = self._peer_data(unit.name, unit_name, raw)
                 # Have we already seen this principal app?
                 if (app_name := data.app_name) in app_names:
                     continue
@@ -1287,6 +1697,8 @@ class COSAgentRequirer(Object):
         scrape_jobs = []
         for data, topology in self._remote_data:
             for job in data.metrics_scrape_jobs:
+                # The provider data is shared by every accessor in the dispatch: leave it as is.
+                job = copy.deepcopy(job)
                 # In #220, relation schema changed from a simplified dict to the standard
                 # `scrape_configs`.
                 # This is to ensure backwards compatibility with Providers older than v0.5.
@@ -1403,8 +1815,17 @@ class COSAgentRequirer(Object):
                 continue  # dedup!
             seen_apps.append(app_name)
 
+            size = sum(len(encoded) for encoded in data.dashboards or ())
+            if self._dashboards_budget_bytes is not None and size > self._dashboards_budget_bytes:
+                logger.warning(
+                    "dashboards of %s take %d bytes compressed, over the budget of %d bytes",
+                    app_name,
+                    size,
+                    self._dashboards_budget_bytes,
+                )
+
             for encoded_dashboard in data.dashboards or ():
-                content = json.loads(LZMABase64.decompress(encoded_dashboard))
+                content = self._decode_dashboard(encoded_dashboard)
 
                 title = content.get("title") or content.get("dashboard", {}).get("title")
                 if not title:
@@ -1421,8 +1842,19 @@ class COSAgentRequirer(Object):
                     }
                 )
 
+        if self._dashboards_cache:
+            logger.debug(
+                "dashboards cache: %d hits, %d misses",
+                self._dashboards_cache.hits,
+                self._dashboards_cache.misses,
+            )
         return dashboards
 
+    def _decode_dashboard(self, encoded_dashboard: str) -> Dict[str, Any]:
+        if self._dashboards_cache:
+            return self._dashboards_cache.get(encoded_dashboard)
+        return json.loads(decode_dashboard(encoded_dashboard))
+
 
 def charm_tracing_config(
     endpoint_requirer: COSAgentProvider, cert_path: Optional[Union[Path, str]]
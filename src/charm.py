@@ -5,29 +5,39 @@
 
 """A  juju charm for Grafana Agent on Kubernetes."""
 
+import functools
 import logging
 import os
 import re
 import subprocess
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Set, Union, get_args
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union, cast, get_args
 
 import yaml
 from charms.grafana_agent.v0.cos_agent import COSAgentRequirer, ReceiverProtocol
 from charms.operator_libs_linux.v2 import snap  # type: ignore
-from charms.tempo_coordinator_k8s.v0.charm_tracing import trace_charm
+from charms.tempo_coordinator_k8s.v0.charm_tracing import get_current_span, trace_charm
 from cosl import JujuTopology
 from cosl.rules import AlertRules
 from ops import main
-from ops.model import BlockedStatus, MaintenanceStatus, Relation
+from ops.framework import Framework
+from ops.model import BlockedStatus, MaintenanceStatus, Relation, WaitingStatus
 
 from grafana_agent import (
     CONFIG_PATH,
     METRICS_RULES_SRC_PATH,
     GrafanaAgentCharm,
 )
-from snap_management import SnapSpecError, install_ga_snap
+from profiling import (
+    PROFILE_ENV,
+    HookProfiler,
+    hook_name,
+    profile_modes,
+    profiles_dir,
+    summarize,
+)
+from snap_management import SnapHandle, SnapSpecError, install_ga_snap
 
 logger = logging.getLogger(__name__)
 
@@ -155,6 +165,12 @@ class GrafanaAgentServiceError(GrafanaAgentError):
     pass
 
 
+class GrafanaAgentLogPathError(GrafanaAgentError):
+    """Custom exception type for errors evaluating the log paths of a snap."""
+
+    pass
+
+
 @trace_charm(
     # these attrs are implemented on GrafanaAgentCharm
     tracing_endpoint="_charm_tracing_endpoint",
@@ -166,6 +182,24 @@ class GrafanaAgentMachineCharm(GrafanaAgentCharm):
 
     service_name = "grafana-agent.grafana-agent"
 
+    _relation_libs = {
+        **GrafanaAgentCharm._relation_libs,
+        "_cos": {"cos-agent", "peers"},
+    }
+    # The cos-agent library defers relation events until the peer relation is there.
+    _deferring_relation_libs = {"_cos"}
+
+    # What to reconcile when each part of the cos-agent data changes.
+    _cos_change_aspects = {
+        "metrics_jobs_changed": ("config",),
+        "metrics_rules_changed": ("metrics_rules",),
+        "log_rules_changed": ("logs_rules",),
+        "dashboards_changed": ("dashboards",),
+        # The log paths of the plugged snaps are rendered in the config.
+        "log_slots_changed": ("snap", "snap_plugs", "config"),
+        "tracing_protocols_changed": ("config", "tracing_receivers"),
+    }
+
     mandatory_relation_pairs = {
         "cos-agent": [  # must be paired with:
             {"grafana-cloud-config"},  # or
@@ -181,21 +215,22 @@ class GrafanaAgentMachineCharm(GrafanaAgentCharm):
         ],
     }
 
-    def __init__(self, *args):
-        super().__init__(*args)
+    def __init__(self, framework: Framework, *args):
+        # Profiling starts before the base class is set up, so that building the relation
+        # objects is accounted for too.
+        self._profiler = self._start_profiler(framework)
+        super().__init__(framework, *args)
+        # Fingerprint of the snap state last applied (see `install_ga_snap`), the snapd change
+        # refreshing the snap, if any, whether applying the snap state failed, and the log
+        # directories of the snaps connected over the "logs" endpoint in classic mode (see
+        # `_snap_log_dirs`).
+        self._stored.set_default(
+            snap_fingerprint=None, snap_change=None, snap_failed=False, snap_log_dirs={}
+        )
         # technically, only one of 'cos-agent' and 'juju-info' are likely to ever be active at
-        # any given time. however, for the sake of understandability, we always set _cos, and
+        # any given time. however, for the sake of understandability, we always have _cos, and
         # we always listen to juju-info-joined events even though one of the two paths will be
         # at all effects unused.
-        self._cos = COSAgentRequirer(self)
-        self.framework.observe(
-            self._cos.on.data_changed,  # pyright: ignore
-            self._on_cos_data_changed,
-        )
-        self.framework.observe(
-            self._cos.on.validation_error,
-            self._on_cos_validation_error,  # pyright: ignore
-        )
         self.framework.observe(self.on["juju_info"].relation_joined, self._on_juju_info_joined)
         self.framework.observe(self.on.install, self.on_install)
         self.framework.observe(self.on.start, self._on_start)
@@ -211,26 +246,92 @@ class GrafanaAgentMachineCharm(GrafanaAgentCharm):
             self.tracing.on.endpoint_removed,  # pyright: ignore
             self._on_tracing_endpoint_removed,
         )
+        self.framework.observe(self.on.show_profiles_action, self._on_show_profiles_action)
+        if self._profiler:
+            # Commit is the last thing dispatch does, after collect-status.
+            self.framework.observe(self.framework.on.commit, self._on_commit)
+
+    @functools.cached_property
+    def _cos(self) -> COSAgentRequirer:
+        budget_kib = int(self.config.get("dashboards_size_budget", 0))
+        cos = COSAgentRequirer(
+            self,
+            dashboards_cache_dir=self.charm_dir / ".cos_agent_dashboards",
+            dashboards_budget_bytes=budget_kib * 1024 if budget_kib > 0 else None,
+        )
+        for event_name in self._cos_change_aspects:
+            self.framework.observe(getattr(cos.on, event_name), self._on_cos_data_changed)
+        self.framework.observe(
+            cos.on.validation_error,
+            self._on_cos_validation_error,  # pyright: ignore
+        )
+        return cos
+
+    def _start_profiler(self, framework: Framework) -> Optional[HookProfiler]:
+        """Start profiling this dispatch if enabled by config or environment."""
+        modes = profile_modes(os.environ.get(PROFILE_ENV)) or profile_modes(
+            str(framework.model.config.get("profile_hooks", ""))
+        )
+        if not modes:
+            return None
+        profiler = HookProfiler(profiles_dir(framework.charm_dir), modes)
+        profiler.start()
+        return profiler
+
+    def _on_commit(self, _event) -> None:
+        """Write this hook's profiles and attach their location to the charm trace."""
+        if not self._profiler:
+            return
+        written = self._profiler.stop(hook_name())
+        self._profiler = None
+        if written and (span := get_current_span()):
+            span.set_attributes({f"profile.{mode}": path for mode, path in written.items()})
+        logger.debug(f"hook profiles written: {written}")
+
+    def _on_show_profiles_action(self, event) -> None:
+        """Report the hottest functions and allocation sites of the last profiled hooks."""
+        summaries = summarize(
+            profiles_dir(self.charm_dir),
+            hooks=event.params.get("hooks", 3),
+            top=event.params.get("top", 10),
+        )
+        if not summaries:
+            event.fail("No hook profiles recorded: set the `profile_hooks` config option first.")
+            return
+        event.set_results(
+            {f"hook-{index}": summary for index, summary in enumerate(summaries, start=1)}
+        )
+
+    @functools.cached_property
+    def _snap_handle(self) -> SnapHandle:
+        """The Grafana Agent snap, shared by everything using it in this dispatch."""
+        return SnapHandle()
 
     @property
     def snap(self):
         """Return the snap object for the Grafana Agent snap."""
         # This is handled in a property to avoid calls to snapd until they're necessary.
-        return snap.SnapCache()["grafana-agent"]
+        return self._snap_handle.snap
+
+    def _reconcile_steps(self) -> List[Tuple[str, Callable[[], Any]]]:
+        """Return the work to do for each aspect, in the order it must run."""
+        steps = super()._reconcile_steps()
+        order = [aspect for aspect, _ in steps]
+        # Snap plugs are connected once the snap is refreshed, and before the config is rendered
+        # from the snap fstab. Tracing receivers are advertised once the config is in place.
+        steps.insert(order.index("config"), ("snap_plugs", self._update_snap_plugs))
+        steps.insert(
+            order.index("config") + 2, ("tracing_receivers", self._cos.update_tracing_receivers)
+        )
+        return steps
 
     def _on_juju_info_joined(self, _event):
         """Update the config when Juju info is joined."""
-        self._update_config()
-        self._update_status()
+        self._mark_dirty("config", "status")
 
     def _on_cos_data_changed(self, event):
-        """Trigger renewals of all data if there is a change."""
-        self._connect_logging_snap_endpoints()
-        self._update_config()
-        self._update_status()
-        self._update_metrics_alerts()
-        self._update_loki_alerts()
-        self._update_grafana_dashboards()
+        """Trigger renewals of the data depending on what changed."""
+        self._mark_dirty("status", *self._cos_change_aspects[event.handle.kind])
 
     def _on_cos_validation_error(self, event):
         msg_text = "Validation errors for cos-agent relation - check juju debug-log."
@@ -242,30 +343,94 @@ class GrafanaAgentMachineCharm(GrafanaAgentCharm):
         for msg in messages[1:]:
             logger.error(msg)
 
-        self._update_status()
+        self._mark_dirty("status")
 
     def _on_tracing_endpoint_changed(self, _event) -> None:
         """Event handler for the tracing endpoint-changed event."""
-        super()._update_config()
-        super()._update_status()
-        self._cos.update_tracing_receivers()
+        self._mark_dirty("config", "status", "tracing_receivers")
 
     def _on_tracing_endpoint_removed(self, _event) -> None:
         """Event handler for the tracing endpoint-removed event."""
-        super()._update_config()
-        super()._update_status()
-        self._cos.update_tracing_receivers()
+        self._mark_dirty("config", "status", "tracing_receivers")
 
     def _verify_snap_track(self) -> None:
+        # install_ga_snap calls snap.ensure so it should do the right thing whether the track
+        # changes or not. It does not call snapd at all if the snap state it would apply is the
+        # one already applied.
+        self._ensure_snap(
+            "Failed to refresh grafana-agent.",
+            applied_fingerprint=self._stored.snap_fingerprint,  # pyright: ignore
+        )
+
+    def _ensure_snap(self, error: str, applied_fingerprint: Optional[str] = None) -> None:
+        """Apply the desired snap state, unless a refresh to it is still in progress."""
+        if self._stored.snap_change and not self._snap_refresh_done():
+            return
         try:
-            # install_ga_snap calls snap.ensure so it should do the right thing whether the track
-            # changes or not.
-            install_ga_snap(
+            fingerprint = install_ga_snap(
                 classic=bool(self.config["classic_snap"]),
                 config={"reporting-enabled": "1" if self.config["reporting_enabled"] else "0"},
+                handle=self._snap_handle,
+                applied_fingerprint=applied_fingerprint,
+            )
+        except SnapSpecError as e:
+            raise GrafanaAgentInstallError(error) from e
+        except snap.Error as e:
+            # Nothing was applied for sure: apply the state in full again on update-status.
+            self._stored.snap_fingerprint = None
+            self._stored.snap_failed = True
+            self._mark_dirty("status")
+            if isinstance(e, snap.SnapAPIError) and e.code == 409:
+                # snapd is making another change to the snap, e.g. an auto-refresh.
+                logger.warning("%s %s", error, e)
+                self.status.snap_error = WaitingStatus(
+                    "waiting for another snapd change to grafana-agent"
+                )
+            else:
+                logger.error("%s %s", error, e)
+                self.status.snap_error = BlockedStatus(f"{error} {e}")
+            return
+        self._stored.snap_fingerprint = fingerprint
+        self._stored.snap_failed = False
+        if self._snap_handle.pending_change:
+            # Completion is checked on the next hooks, update-status at the latest.
+            self._stored.snap_change = self._snap_handle.pending_change
+            self.status.snap_refresh = MaintenanceStatus("Refreshing grafana-agent snap")
+
+    def _snap_refresh_done(self) -> bool:
+        """Check on the pending snap refresh, and restart the agent once it is done."""
+        change = cast(str, self._stored.snap_change)
+        try:
+            status, progress = self._snap_handle.change_progress(change)
+        except snap.SnapAPIError as e:
+            # e.g. the change was pruned by snapd: its outcome is unknown, so apply again.
+            status, progress = "Unknown", str(e)
+        if status in ("Do", "Doing"):
+            logger.debug("snap change %s in progress: %s", change, progress)
+            self.status.snap_refresh = MaintenanceStatus(
+                f"Refreshing grafana-agent snap: {progress}"
             )
-        except (snap.SnapError, SnapSpecError) as e:
-            raise GrafanaAgentInstallError("Failed to refresh grafana-agent.") from e
+            return False
+
+        self._stored.snap_change = None
+        self._snap_handle.refresh()
+        # The work held back while the snap was refreshing is done now, whatever the outcome.
+        self._mark_dirty("snap_plugs", "config", "status")
+        if status not in ("Done", "Wait"):
+            logger.error("refreshing grafana-agent snap failed (%s): %s", status, progress)
+            return True
+        logger.info("grafana-agent snap refreshed in snapd change %s", change)
+        try:
+            self.snap.start(enable=True)
+        except snap.SnapError as e:
+            raise GrafanaAgentServiceError("Failed to start grafana-agent") from e
+        return True
+
+    def _on_update_status(self, _event=None):
+        """Check on a pending snap refresh, or apply a snap state that failed to be."""
+        super()._on_update_status(_event)
+        if self._stored.snap_change or self._stored.snap_failed:
+            self._mark_dirty("snap", "status")
 
     def on_install(self, _event) -> None:
         """Install the Grafana Agent snap."""
@@ -278,16 +443,15 @@ class GrafanaAgentMachineCharm(GrafanaAgentCharm):
         # On install, create a config file, to avoid a transient error:
         #   error reading config file open /etc/grafana-agent.yaml: no such file or directory
         if not os.path.exists(CONFIG_PATH):
-            self.write_file(CONFIG_PATH, yaml.dump(self._generate_config()))
-        try:
-            install_ga_snap(
-                classic=bool(self.config["classic_snap"]),
-                config={"reporting-enabled": "1" if self.config["reporting_enabled"] else "0"},
-            )
-        except (snap.SnapError, SnapSpecError) as e:
-            raise GrafanaAgentInstallError("Failed to install grafana-agent.") from e
+            self._write_config(yaml.dump(self._generate_config()))
+        # Always applied in full, so that changes made to the snap by hand are reverted.
+        self._ensure_snap("Failed to install grafana-agent.")
 
     def _on_start(self, _event) -> None:
+        if self._stored.snap_change:
+            # The agent is started once the snap refresh is done.
+            self._mark_dirty("status")
+            return
         # Ensure the config is up-to-date before we start to avoid racy relation
         # changes and starting with a "bare" config in ActiveStatus
         self._update_config()
@@ -298,7 +462,7 @@ class GrafanaAgentMachineCharm(GrafanaAgentCharm):
         except snap.SnapError as e:
             raise GrafanaAgentServiceError("Failed to start grafana-agent") from e
 
-        self._update_status()
+        self._mark_dirty("status")
 
     def _on_stop(self, _event) -> None:
         self.unit.status = MaintenanceStatus("Stopping grafana-agent snap")
@@ -307,7 +471,7 @@ class GrafanaAgentMachineCharm(GrafanaAgentCharm):
         except snap.SnapError as e:
             raise GrafanaAgentServiceError("Failed to stop grafana-agent") from e
 
-        self._update_status()
+        self._mark_dirty("status")
 
     def _on_remove(self, _event) -> None:
         """Uninstall the Grafana Agent snap."""
@@ -316,6 +480,7 @@ class GrafanaAgentMachineCharm(GrafanaAgentCharm):
             self.snap.ensure(state=snap.SnapState.Absent)
         except snap.SnapError as e:
             raise GrafanaAgentInstallError("Failed to uninstall grafana-agent") from e
+        self._stored.snap_fingerprint = None
 
     def _on_upgrade_charm(self, event):
         """Upgrade the charm."""
@@ -328,7 +493,7 @@ class GrafanaAgentMachineCharm(GrafanaAgentCharm):
         super()._on_cert_changed(event)
         # most cases are already resolved within `grafana_agent` parent object, but we don't have the notion of
         # tracing receivers in COS agent there so we need to update them separately.
-        self._cos.update_tracing_receivers()
+        self._mark_dirty("tracing_receivers")
 
     @property
     def is_k8s(self) -> bool:
@@ -344,7 +509,11 @@ class GrafanaAgentMachineCharm(GrafanaAgentCharm):
         own_rules = AlertRules(query_type="promql", topology=topology)
         own_rules.add_path(METRICS_RULES_SRC_PATH)
         if topology.identifier in rules:
-            rules[topology.identifier]["groups"] += own_rules.as_dict()["groups"]
+            # Not `+=`: the rules gathered from peer data are shared, and must not be modified.
+            rules[topology.identifier] = {
+                **rules[topology.identifier],
+                "groups": rules[topology.identifier]["groups"] + own_rules.as_dict()["groups"],
+            }
         else:
             rules[topology.identifier] = own_rules.as_dict()
 
@@ -570,23 +739,101 @@ class GrafanaAgentMachineCharm(GrafanaAgentCharm):
         ] + topology_relabels  # type: ignore
 
     def _evaluate_log_paths(self, paths: List[str], snap: str, app: str) -> List[str]:
-        """Evaluate each log path using snap to resolve environment variables.
+        """Evaluate the log paths using snap to resolve environment variables.
+
+        All paths are evaluated in a single `snap run --shell` invocation.
 
         Raises:
-            Exception: If echo fails.
+            GrafanaAgentLogPathError: If the paths could not be evaluated.
         """
+        if not paths:
+            return []
         # There is a potential for shell injection here. It seems okay because the potential
         # attacking charm has root access on the machine already anyway.
-        new_paths = []
-        for path in paths:
-            cmd = f"echo 'echo {path}' | snap run --shell {snap}.{app}"
-            p = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-            if p.returncode != 0:
-                raise Exception(
-                    f"Failed to evaluate path with command: {cmd}\nSTDOUT: {p.stdout}\nSTDERR: {p.stderr}"
+        cmd = ["snap", "run", "--shell", f"{snap}.{app}"]
+        script = "".join(f"echo {path}\n" for path in paths)
+        p = subprocess.run(cmd, input=script, capture_output=True, text=True)
+        # One line per path, empty ones included.
+        stdout = p.stdout[:-1] if p.stdout.endswith("\n") else p.stdout
+        new_paths = stdout.split("\n")
+        if p.returncode != 0 or len(new_paths) != len(paths):
+            raise GrafanaAgentLogPathError(
+                f"Failed to evaluate paths with command: {' '.join(cmd)}\nINPUT: {script}"
+                f"\nSTDOUT: {p.stdout}\nSTDERR: {p.stderr}"
+            )
+        return [path.strip() for path in new_paths]
+
+    def _snap_log_dirs(self, owner: str, slots: List[str]) -> Optional[Dict[str, Any]]:
+        """The evaluated log directories of each of the `slots` of the `owner` snap.
+
+        They only depend on the snap revision: those kept in the stored state (see
+        `_update_snap_log_dirs`) are used for as long as it is current, so that an unchanged snap
+        is neither read nor run again.
+
+        Returns:
+            The snap revision, under "revision", and the directories by slot, under "slots"; or
+            None if the snap is not installed or its paths could not be evaluated.
+        """
+        try:
+            revision = os.readlink(f"/snap/{owner}/current")
+        except OSError:
+            logger.error(f"snap file for {owner} not found. It is likely not installed. Skipping.")
+            return None
+        cache: Any = self._stored.snap_log_dirs  # pyright: ignore
+        cached = cache.get(owner)
+        if cached and cached["revision"] == revision and set(slots) <= set(cached["slots"]):
+            return {
+                "revision": revision,
+                "slots": {slot: list(cached["slots"][slot]) for slot in slots},
+            }
+
+        try:
+            with open(f"/snap/{owner}/current/meta/snap.yaml") as f:
+                snap_yaml = yaml.safe_load(f)
+        except FileNotFoundError:
+            logger.error(f"snap file for {owner} not found. It is likely not installed. Skipping.")
+            return None
+        # Get the directories we need to monitor.
+        raw_dirs = {slot: list(snap_yaml["slots"][slot]["source"]["read"]) for slot in slots}
+        snap_app_name = next(iter(snap_yaml["apps"]))  # Just use any app.
+        # Evaluate any variables in the paths, for all slots at once.
+        try:
+            evaluated = iter(
+                self._evaluate_log_paths(
+                    paths=[path for dirs in raw_dirs.values() for path in dirs],
+                    snap=owner,
+                    app=snap_app_name,
                 )
-            new_paths.append(p.stdout.strip())
-        return new_paths
+            )
+        except GrafanaAgentLogPathError as e:
+            logger.error(f"log paths of {owner} could not be evaluated. Skipping.\n{e}")
+            return None
+        log_dirs = {slot: [next(evaluated) for _ in dirs] for slot, dirs in raw_dirs.items()}
+        return {"revision": revision, "slots": log_dirs}
+
+    def _snap_log_endpoints_by_owner(self) -> Dict[str, List[Tuple[Any, Any]]]:
+        """The logging endpoints and their topology, grouped by the snap owning them."""
+        endpoints_by_owner: Dict[str, List[Tuple[Any, Any]]] = {}
+        for endpoint, topology in self._cos.snap_log_endpoints_with_topology:
+            endpoints_by_owner.setdefault(endpoint.owner, []).append((endpoint, topology))
+        return endpoints_by_owner
+
+    def _update_snap_log_dirs(self) -> None:
+        """Keep the log directories of the snaps connected over "logs" in the stored state.
+
+        Only in classic mode, where they are evaluated by running the snaps; those of snaps no
+        longer connected are dropped.
+        """
+        cache: Any = self._stored.snap_log_dirs  # pyright: ignore
+        endpoints_by_owner = (
+            self._snap_log_endpoints_by_owner() if self.config["classic_snap"] else {}
+        )
+        for owner in [owner for owner in cache.keys() if owner not in endpoints_by_owner]:
+            del cache[owner]
+        for owner, endpoints in endpoints_by_owner.items():
+            log_dirs = self._snap_log_dirs(owner, [endpoint.name for endpoint, _ in endpoints])
+            if log_dirs is not None and log_dirs != cache.get(owner):
+                cache[owner] = log_dirs
 
     def _snap_plug_job(
         self, owner: str, target_path: str, app: str, unit: str, label_path: str
@@ -658,35 +905,22 @@ class GrafanaAgentMachineCharm(GrafanaAgentCharm):
         shared_logs_configs = []
 
         if self.config["classic_snap"]:
-            # Iterate through each logging endpoint.
-            for endpoint, topology in self._cos.snap_log_endpoints_with_topology:
-                try:
-                    with open(f"/snap/{endpoint.owner}/current/meta/snap.yaml") as f:
-                        snap_yaml = yaml.safe_load(f)
-                except FileNotFoundError:
-                    logger.error(
-                        f"snap file for {endpoint.owner} not found. It is likely not installed. Skipping."
-                    )
+            # Grouped by snap, so that each snap is only evaluated once.
+            for owner, endpoints in self._snap_log_endpoints_by_owner().items():
+                log_dirs = self._snap_log_dirs(owner, [endpoint.name for endpoint, _ in endpoints])
+                if log_dirs is None:
                     continue
-                # Get the directories we need to monitor.
-                log_dirs = snap_yaml["slots"][endpoint.name]["source"]["read"]
-                for key in snap_yaml["apps"].keys():
-                    snap_app_name = key  # Just use any app.
-                    break
-                # Evaluate any variables in the paths.
-                log_dirs = self._evaluate_log_paths(
-                    paths=log_dirs, snap=endpoint.owner, app=snap_app_name
-                )
                 # Create a job for each path.
-                for path in log_dirs:
-                    job = self._snap_plug_job(
-                        endpoint.owner,
-                        f"{path}/**",
-                        topology.application,
-                        str(topology.unit),
-                        self._path_label(path),
-                    )
-                    shared_logs_configs.append(job)
+                for endpoint, topology in endpoints:
+                    for path in log_dirs["slots"][endpoint.name]:
+                        job = self._snap_plug_job(
+                            owner,
+                            f"{path}/**",
+                            topology.application,
+                            str(topology.unit),
+                            self._path_label(path),
+                        )
+                        shared_logs_configs.append(job)
         else:
             endpoint_owners = {
                 endpoint.owner: {
@@ -716,16 +950,34 @@ class GrafanaAgentMachineCharm(GrafanaAgentCharm):
 
         return shared_logs_configs
 
+    def _update_config(self) -> None:
+        if self._stored.snap_change:
+            # snapd would fail to restart the agent: the config is applied once the snap
+            # refresh is done.
+            return
+        super()._update_config()
+
+    def _update_snap_plugs(self):
+        """Connect the snaps logging over the "logs" endpoint, or look up where they log."""
+        if self._stored.snap_change:
+            # Connected once the snap refresh is done.
+            return
+        self._connect_logging_snap_endpoints()
+        self._update_snap_log_dirs()
+
     def _connect_logging_snap_endpoints(self):
-        # We need to run _verify_snap_track so we make sure we have refreshed BEFORE connecting.
-        self._verify_snap_track()
+        # The "snap" reconcile step runs _verify_snap_track first, so that we have refreshed
+        # BEFORE connecting.
         if not self.config["classic_snap"]:
-            for plug in self._cos.snap_log_endpoints:
-                try:
-                    self.snap.connect("logs", service=plug.owner, slot=plug.name)
-                except snap.SnapError as e:
-                    logger.error(f"error connecting plug {plug} to grafana-agent:logs")
-                    logger.error(e.message)
+            slots = [(plug.owner, plug.name) for plug in self._cos.snap_log_endpoints]
+            try:
+                # Only the slots not connected yet are, all at once.
+                errors = self._snap_handle.connect_all("logs", slots)
+            except (snap.SnapError, snap.SnapAPIError) as e:
+                errors = dict.fromkeys(slots, e)
+            for (owner, name), e in errors.items():
+                logger.error(f"error connecting plug {owner}:{name} to grafana-agent:logs")
+                logger.error(e.message)
 
     def positions_dir(self) -> str:
         """Return the positions directory."""
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Compressed dashboards, computed once per dashboard content instead of on every update.
+
+`GrafanaDashboardProvider` parses, uid-stamps and LZMA-compresses every dashboard file each
+time it reloads them. The builtin dashboards are precompressed when the charm is built (run
+this module from the charm source tree), and any other dashboard is compressed the first time
+it is seen: both are then reused for as long as the file's content does not change. Likewise,
+only the templates of the dashboards that changed are updated, and relations are only
+rewritten when the digest of the templates changed.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, cast
+
+import yaml
+from charms.grafana_k8s.v0.grafana_dashboard import (
+    CharmedDashboard,
+    GrafanaDashboardProvider,
+    _data_hash,
+)
+from cosl import LZMABase64
+from cosl.types import type_convert_stored
+from ops.charm import LeaderElectedEvent
+from ops.model import Relation
+
+logger = logging.getLogger(__name__)
+
+# Relative to the charm root. Precompressed builtin dashboards, shipped with the charm.
+PRECOMPRESSED_PATH = "src/grafana_dashboards.lzma.json"
+# Relative to the charm root. Dashboards compressed at runtime.
+CACHE_PATH = ".grafana_dashboards.lzma.json"
+
+_DASHBOARD_SUFFIXES = (".json", ".json.tmpl", ".tmpl")
+
+
+def _digest(content: bytes, charm_name: str, rel_path: str) -> str:
+    # The uid of a dashboard depends on the charm name and on its path, not only on its content.
+    key = hashlib.sha256(f"{charm_name}\0{rel_path}\0".encode())
+    key.update(content)
+    return key.hexdigest()
+
+
+def _compress(content: bytes, path: Path, charm_dir: Path, charm_name: str) -> Optional[str]:
+    """Compress a dashboard the way `CharmedDashboard.load_dashboards_from_dir` does."""
+    try:
+        dashboard_dict = json.loads(content)
+    except json.JSONDecodeError as e:
+        logger.error("Failed to load dashboard '%s': %s", path, e)
+        return None
+    if type(dashboard_dict) is not dict:
+        logger.error("Invalid dashboard '%s': expected dict, got %s", path, type(dashboard_dict))
+        return None
+    CharmedDashboard._replace_uid(  # noqa
+        dashboard_dict=dashboard_dict,
+        dashboard_path=path,
+        charm_dir=charm_dir,
+        charm_name=charm_name,
+    )
+    CharmedDashboard._add_tags(dashboard_dict=dashboard_dict, charm_name=charm_name)  # noqa
+    return LZMABase64.compress(json.dumps(dashboard_dict))
+
+
+def _write_atomically(path: Path, content: str) -> None:
+    # Written aside then moved in place, so that an interrupted hook cannot truncate the cache.
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    tmp_path.write_text(content)
+    os.replace(tmp_path, path)
+
+
+def _read_cache(path: Path) -> Dict[str, str]:
+    try:
+        return json.loads(path.read_text())
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def compressed_dashboards(
+    dashboards_path: Path, charm_dir: Path, charm_name: str
+) -> Dict[str, Tuple[str, str]]:
+    """Return the dashboards in `dashboards_path` by dashboard id, as (digest, compressed content).
+
+    Only the dashboards missing from the precompressed and runtime caches are compressed; the
+    digest is the key they can be looked up with in those (see `cached_dashboards`).
+    """
+    precompressed = _read_cache(charm_dir / PRECOMPRESSED_PATH)
+    cache = _read_cache(charm_dir / CACHE_PATH)
+    used: Dict[str, str] = {}
+    dashboards = {}
+
+    for path in sorted(Path(dashboards_path).glob("**/*")):
+        if not (path.is_file() and path.name.endswith(_DASHBOARD_SUFFIXES)):
+            continue
+        content = path.read_bytes()
+        digest = _digest(content, charm_name, _rel_path(path, charm_dir))
+        compressed = precompressed.get(digest) or cache.get(digest)
+        if compressed is None:
+            compressed = _compress(content, path, charm_dir, charm_name)
+            if compressed is None:
+                continue
+        if digest not in precompressed:
+            used[digest] = compressed
+        dashboards[f"file:{path.stem}"] = (digest, compressed)
+
+    if used != cache:
+        _write_atomically(charm_dir / CACHE_PATH, json.dumps(used, sort_keys=True))
+    return dashboards
+
+
+def cached_dashboards(charm_dir: Path) -> Dict[str, str]:
+    """Return the compressed content of the dashboards seen so far, by digest."""
+    return {**_read_cache(charm_dir / CACHE_PATH), **_read_cache(charm_dir / PRECOMPRESSED_PATH)}
+
+
+def _rel_path(path: Path, charm_dir: Path) -> str:
+    try:
+        return str(path.relative_to(charm_dir))
+    except ValueError:
+        return str(path)
+
+
+def _template_digest(template: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(template, sort_keys=True).encode()).hexdigest()
+
+
+class CachedDashboardProvider(GrafanaDashboardProvider):
+    """A `GrafanaDashboardProvider` that only processes the dashboards that changed.
+
+    Unchanged dashboard files are not recompressed, only the templates of added, changed or
+    removed dashboards are updated, and the relations are only rewritten when the digest of the
+    templates differs from the one last written to them.
+
+    The templates of dashboard files are kept in the stored state without their content, which
+    is only looked up from the dashboard caches when the relations are written.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Digest of each template, and of all templates as last written to each relation.
+        self._stored.set_default(template_digests={}, relation_digests={})  # type: ignore
+
+    def _update_all_dashboards_from_dir(self, event: Any = None, inject_dropdowns: bool = True):
+        """Scans the built-in dashboards and updates relations with changes."""
+        if isinstance(event, LeaderElectedEvent):
+            # Another leader may have written the relations since this unit last did.
+            self._stored.relation_digests.clear()  # type: ignore
+        if not self._dashboards_path:
+            return
+        charm_name = self._charm.meta.name
+        stored_dashboard_templates: Any = self._stored.dashboard_templates  # pyright: ignore
+        template_digests: Any = self._stored.template_digests  # pyright: ignore
+
+        dashboards = compressed_dashboards(
+            Path(self._dashboards_path), self._charm.charm_dir, charm_name
+        )
+        for dashboard_id in list(stored_dashboard_templates.keys()):
+            if dashboard_id.startswith("file:") and dashboard_id not in dashboards:
+                del stored_dashboard_templates[dashboard_id]
+        for dashboard_id, (content_digest, _content) in dashboards.items():
+            template = CharmedDashboard._content_to_dashboard_object(  # noqa
+                charm_name=charm_name,
+                content="",
+                dashboard_alt_uid=CharmedDashboard._generate_alt_uid(  # noqa
+                    charm_name, dashboard_id
+                ),
+                inject_dropdowns=inject_dropdowns,
+                juju_topology=self._juju_topology,
+            )
+            del template["content"]
+            template["content_digest"] = content_digest
+            digest = _template_digest(template)
+            if (
+                dashboard_id in stored_dashboard_templates
+                and template_digests.get(dashboard_id) == digest
+            ):
+                continue
+            stored_dashboard_templates[dashboard_id] = template
+            template_digests[dashboard_id] = digest
+
+        if self._charm.unit.is_leader():
+            for dashboard_relation in self._charm.model.relations[self._relation_name]:
+                self._upset_dashboards_on_relation(dashboard_relation)
+
+    def _templates_digest(self) -> str:
+        """Digest of all the templates, from the digest of each."""
+        stored_dashboard_templates: Any = self._stored.dashboard_templates  # pyright: ignore
+        template_digests: Any = self._stored.template_digests  # pyright: ignore
+        # Templates may also be added or removed by the library itself (e.g. `add_dashboard`).
+        for dashboard_id in list(template_digests.keys()):
+            if dashboard_id not in stored_dashboard_templates:
+                del template_digests[dashboard_id]
+        for dashboard_id in stored_dashboard_templates.keys():
+            if dashboard_id not in template_digests:
+                template = cast(
+                    Dict[str, Any], type_convert_stored(stored_dashboard_templates[dashboard_id])
+                )
+                template_digests[dashboard_id] = _template_digest(template)
+        return hashlib.sha256(json.dumps(sorted(template_digests.items())).encode()).hexdigest()
+
+    def _resolved_templates(self) -> Dict[str, Any]:
+        """Return the templates, with the content of dashboard files looked up."""
+        templates = cast(
+            Dict[str, Any],
+            type_convert_stored(self._stored.dashboard_templates),  # pyright: ignore
+        )
+        contents: Optional[Dict[str, str]] = None
+        resolved = {}
+        for dashboard_id, template in templates.items():
+            content_digest = template.pop("content_digest", None)
+            if content_digest is None:
+                resolved[dashboard_id] = template
+                continue
+            if contents is None:
+                contents = cached_dashboards(self._charm.charm_dir)
+            if content_digest not in contents and self._dashboards_path:
+                # The runtime cache is gone (e.g. removed by hand): compress the files again.
+                contents.update(
+                    compressed_dashboards(
+                        Path(self._dashboards_path), self._charm.charm_dir, self._charm.meta.name
+                    ).values()
+                )
+            if content_digest not in contents:
+                logger.warning("content of dashboard %s not found, skipping it", dashboard_id)
+                continue
+            template["content"] = contents[content_digest]
+            resolved[dashboard_id] = template
+        return resolved
+
+    @property
+    def dashboard_templates(self) -> List:
+        """Return a list of the known dashboard templates."""
+        return list(self._resolved_templates().values())
+
+    def _upset_dashboards_on_relation(self, relation: Relation) -> None:
+        """Update the dashboards in the relation data bucket, if they changed."""
+        digest = self._templates_digest()
+        relation_digests: Any = self._stored.relation_digests  # pyright: ignore
+        databag = relation.data[self._charm.app]
+        if relation_digests.get(str(relation.id)) == digest and "dashboards" in databag:
+            return
+
+        new_templates = self._resolved_templates()
+        # As in the library: when there is no digest to go by (e.g. right after a leadership
+        # change), compare with the databag so that consumers are not notified for nothing.
+        try:
+            existing_templates = json.loads(databag.get("dashboards", "{}")).get("templates", {})
+        except json.JSONDecodeError:
+            existing_templates = {}
+        if new_templates != existing_templates:
+            databag["dashboards"] = json.dumps(
+                {"templates": new_templates, "uuid": _data_hash(new_templates)}
+            )
+        relation_digests[str(relation.id)] = digest
+
+
+def precompress(charm_dir: Path, charm_name: str, src: str, dest: str) -> int:
+    """Precompress the builtin dashboards under `src`, as they will be found under `dest`.
+
+    Returns:
+        The number of dashboards precompressed.
+    """
+    precompressed = {}
+    for path in sorted((charm_dir / src).glob("**/*")):
+        if not (path.is_file() and path.name.endswith(_DASHBOARD_SUFFIXES)):
+            continue
+        runtime_path = charm_dir / dest / path.relative_to(charm_dir / src)
+        content = path.read_bytes()
+        compressed = _compress(content, runtime_path, charm_dir, charm_name)
+        if compressed is not None:
+            digest = _digest(content, charm_name, _rel_path(runtime_path, charm_dir))
+            precompressed[digest] = compressed
+    _write_atomically(charm_dir / PRECOMPRESSED_PATH, json.dumps(precompressed, sort_keys=True))
+    return len(precompressed)
+
+
+if __name__ == "__main__":
+    from grafana_agent import DASHBOARDS_DEST_PATH, DASHBOARDS_SRC_PATH
+
+    # The charm root, holding charmcraft.yaml, defaults to the current directory.
+    root = Path(sys.argv[1] if len(sys.argv) > 1 else ".").absolute()
+    name = yaml.safe_load((root / "charmcraft.yaml").read_text())["name"]
+    count = precompress(root, name, DASHBOARDS_SRC_PATH, DASHBOARDS_DEST_PATH)
+    print(f"precompressed {count} dashboards into {root / PRECOMPRESSED_PATH}")
@@ -3,6 +3,10 @@
 
 """Common logic for both k8s and machine charms for Grafana Agent."""
 
+import copy
+import filecmp
+import functools
+import hashlib
 import json
 import logging
 import os
@@ -10,39 +14,48 @@ import pathlib
 import re
 import shutil
 import socket
+import time
+import warnings
 from collections import namedtuple
 from dataclasses import dataclass
-from typing import Any, Callable, Dict, List, Optional, Set, Union, cast
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Set, Tuple, Union, cast
 
 import yaml
-from charms.certificate_transfer_interface.v1.certificate_transfer import (
-    CertificatesAvailableEvent as CertificateTransferAvailableEvent,
-)
-from charms.certificate_transfer_interface.v1.certificate_transfer import (
-    CertificatesRemovedEvent as CertificateTransferRemovedEvent,
-)
-from charms.certificate_transfer_interface.v1.certificate_transfer import (
-    CertificateTransferRequires,
-)
-from charms.grafana_cloud_integrator.v0.cloud_config_requirer import (
-    GrafanaCloudConfigRequirer,
-)
-from charms.grafana_k8s.v0.grafana_dashboard import GrafanaDashboardProvider
-from charms.loki_k8s.v1.loki_push_api import LokiPushApiConsumer
-from charms.observability_libs.v0.cert_handler import CertHandler
-from charms.prometheus_k8s.v1.prometheus_remote_write import (
-    PrometheusRemoteWriteConsumer,
-)
+from charms.grafana_agent.v0.cos_agent import minify_dashboard
 from charms.tempo_coordinator_k8s.v0.tracing import TracingEndpointRequirer, charm_tracing_config
 from cosl import MandatoryRelationPairs
 from ops.charm import CharmBase
-from ops.model import ActiveStatus, BlockedStatus, WaitingStatus
+from ops.framework import StoredState
+from ops.model import ActiveStatus, BlockedStatus, MaintenanceStatus, WaitingStatus
 from ops.pebble import APIError, PathError
 from requests import Session
 from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.exceptions import InsecureRequestWarning  # type: ignore
 from requests.packages.urllib3.util import Retry  # type: ignore
 from yaml.parser import ParserError
 
+# The relation libraries pull in heavy dependencies (cryptography, ...) that most hooks
+# never use: they are only imported when the object using them is first built.
+if TYPE_CHECKING:
+    from charms.certificate_transfer_interface.v1.certificate_transfer import (
+        CertificatesAvailableEvent as CertificateTransferAvailableEvent,
+    )
+    from charms.certificate_transfer_interface.v1.certificate_transfer import (
+        CertificatesRemovedEvent as CertificateTransferRemovedEvent,
+    )
+    from charms.certificate_transfer_interface.v1.certificate_transfer import (
+        CertificateTransferRequires,
+    )
+    from charms.grafana_cloud_integrator.v0.cloud_config_requirer import (
+        GrafanaCloudConfigRequirer,
+    )
+    from charms.grafana_k8s.v0.grafana_dashboard import GrafanaDashboardProvider
+    from charms.loki_k8s.v1.loki_push_api import LokiPushApiConsumer
+    from charms.observability_libs.v0.cert_handler import CertHandler
+    from charms.prometheus_k8s.v1.prometheus_remote_write import (
+        PrometheusRemoteWriteConsumer,
+    )
+
 logger = logging.getLogger(__name__)
 
 CONFIG_PATH = "/etc/grafana-agent.yaml"
@@ -57,6 +70,86 @@ DASHBOARDS_DEST_PATH = "grafana_dashboards"  # placeholder until we figure out t
 RulesMapping = namedtuple("RulesMapping", ["src", "dest"])
 
 
+def config_digest_path() -> str:
+    """Path of the file holding the digest of the config at CONFIG_PATH."""
+    return f"{CONFIG_PATH}.sha256"
+
+
+def fingerprint(obj: Any) -> str:
+    """Return a stable digest of a JSON-serializable object."""
+    serialized = json.dumps(obj, sort_keys=True, default=str)
+    return hashlib.sha256(serialized.encode()).hexdigest()
+
+
+def link_or_copy(src: pathlib.Path, dest: pathlib.Path) -> None:
+    """Make `dest` refer to the contents of `src`, without copying them if possible."""
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    dest.unlink(missing_ok=True)
+    try:
+        os.link(src, dest)
+    except OSError:
+        # e.g. the charm dir and the destination are on different filesystems
+        shutil.copy2(src, dest)
+
+
+def sync_dir(
+    dest: pathlib.Path, sources: Dict[str, pathlib.Path], contents: Dict[str, bytes]
+) -> bool:
+    """Make `dest` hold exactly the given files, only touching those that changed.
+
+    Files from `sources` are hard-linked into place, so they are neither read nor copied.
+    Files from `contents` are only written when their digest differs from the one recorded
+    next to `dest` the last time they were written.
+
+    Args:
+        dest: the directory to synchronize.
+        sources: existing files to expose, by path relative to `dest`.
+        contents: file contents to write, by path relative to `dest`.
+
+    Returns:
+        Whether any file in `dest` was added, changed or removed.
+    """
+    manifest_path = dest.with_name(f".{dest.name}.sha256")
+    try:
+        manifest = json.loads(manifest_path.read_text())
+    except (FileNotFoundError, ValueError):
+        manifest = {}
+    dest.mkdir(parents=True, exist_ok=True)
+    changed = False
+
+    for name, src in sources.items():
+        target = dest / name
+        if target.exists() and os.path.samefile(src, target):
+            continue
+        if target.exists() and filecmp.cmp(src, target):
+            # A copy made where hard links are not available.
+            continue
+        link_or_copy(src, target)
+        changed = True
+
+    digests = {}
+    for name, content in contents.items():
+        target = dest / name
+        digests[name] = hashlib.sha256(content).hexdigest()
+        if manifest.get(name) == digests[name] and target.exists():
+            continue
+        # Replace rather than rewrite in place, not to write through a hard link.
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(f".{target.name}.tmp")
+        tmp.write_bytes(content)
+        tmp.replace(target)
+        changed = True
+
+    for path in [path for path in dest.rglob("*") if path.is_file()]:
+        if str(path.relative_to(dest)) not in sources.keys() | contents.keys():
+            path.unlink()
+            changed = True
+
+    if digests != manifest:
+        manifest_path.write_text(json.dumps(digests, sort_keys=True))
+    return changed
+
+
 def key_value_pair_string_to_dict(key_value_pair: str) -> dict:
     """Transform a comma-separated key-value pairs into a dict."""
     result = {}
@@ -104,12 +197,18 @@ class CompoundStatus:
     update_config: Optional[Union[BlockedStatus, WaitingStatus]] = None
     validation_error: Optional[BlockedStatus] = None
     config_error: Optional[BlockedStatus] = None
+    snap_refresh: Optional[MaintenanceStatus] = None
+    snap_error: Optional[Union[BlockedStatus, WaitingStatus]] = None
 
 
 class GrafanaAgentCharm(CharmBase):
     """Grafana Agent Charm."""
 
+    _stored = StoredState()
+
     _name = "agent"
+    # Port the agent serves its own HTTP API on (including /-/reload).
+    _server_http_port = 12345
     _http_listen_port = 3500
     _grpc_listen_port = 3600
     # TODO Change to a more suitable location once the snap gets access (#216).
@@ -149,6 +248,23 @@ class GrafanaAgentCharm(CharmBase):
     # 'outgoing' are OR-ed, 'incoming' are AND-ed.
     mandatory_relation_pairs: Dict[str, List[Set[str]]]  # overridden
 
+    # Relation library objects, by attribute, and the relation endpoints whose hooks they observe.
+    # They are built on first use, or as the charm is set up if the dispatched hook is one of
+    # theirs, so that hooks none of them care about do not pay for setting all of them up.
+    _relation_libs: Dict[str, Set[str]] = {
+        "_remote_write": {"send-remote-write", "peers"},
+        "_loki_consumer": {"logging-consumer"},
+        "_grafana_dashboards_provider": {"grafana-dashboards-provider"},
+        "cert": {"certificates", "peers"},
+        "_cloud": {"grafana-cloud-config"},
+        "cert_transfer": {"receive-ca-cert"},
+    }
+    # Hooks that none of the relation library objects observe.
+    _relation_lib_free_hooks = {"update-status", "collect-metrics"}
+    # Relation library objects that defer events: they are built on every hook, since deferred
+    # events are only re-emitted to observers that exist, and dropped otherwise.
+    _deferring_relation_libs: Set[str] = set()
+
     def __new__(cls, *args: Any, **kwargs: Dict[Any, Any]):
         """Forbid the usage of GrafanaAgentCharm directly."""
         if cls is GrafanaAgentCharm:
@@ -162,6 +278,12 @@ class GrafanaAgentCharm(CharmBase):
         # Property to facilitate centralized status update
         self.status = CompoundStatus()
 
+        # Digest of the config parts that cannot be hot-reloaded, as of the last restart.
+        self._stored.set_default(restart_digest=None)
+        # When the config was last applied, and whether a change is held back since (see the
+        # `config_apply_window` config option).
+        self._stored.set_default(last_applied=0.0, apply_pending=False)
+
         charm_root = self.charm_dir.absolute()
         self._forward_alert_rules = cast(bool, self.config["forward_alert_rules"])
         self.loki_rules_paths = RulesMapping(
@@ -176,143 +298,250 @@ class GrafanaAgentCharm(CharmBase):
             src=charm_root.joinpath(*DASHBOARDS_SRC_PATH.split("/")),
             dest=charm_root.joinpath(*DASHBOARDS_DEST_PATH.split("/")),
         )
-        self.cert_transfer = CertificateTransferRequires(self, "receive-ca-cert")
+        self.tracing = TracingEndpointRequirer(
+            self,
+            protocols=[
+                "otlp_http",  # for charm traces
+                "otlp_grpc",  # for forwarding workload traces
+            ],
+        )
+        self._charm_tracing_endpoint, self._server_cert = charm_tracing_config(
+            self.tracing, self._ca_path
+        )
 
-        for rules in [self.loki_rules_paths, self.dashboard_paths]:
-            if not os.path.isdir(rules.dest):
-                rules.src.mkdir(parents=True, exist_ok=True)
-                shutil.copytree(rules.src, rules.dest, dirs_exist_ok=True)
+        self.framework.observe(self.on.upgrade_charm, self._on_upgrade_charm)
+        self.framework.observe(self.on.update_status, self._on_update_status)
+        self.framework.observe(self.on.config_changed, self._on_config_changed)
+
+        # Register status observers
+        for incoming, outgoings in self.mandatory_relation_pairs.items():
+            self.framework.observe(self.on[incoming].relation_joined, self._on_status_event)
+            self.framework.observe(self.on[incoming].relation_broken, self._on_status_event)
+            for outgoing_list in outgoings:
+                for outgoing in outgoing_list:
+                    self.framework.observe(
+                        self.on[outgoing].relation_joined, self._on_status_event
+                    )
+                    self.framework.observe(
+                        self.on[outgoing].relation_broken, self._on_status_event
+                    )
+
+        # Event handlers only mark what needs to be redone; the work runs once, at the end of
+        # the dispatch, however many handlers asked for it.
+        self._dirty: Set[str] = set()
+        self.framework.observe(self.on.collect_unit_status, self._reconcile)
+        # The remote_write endpoints of the config being rendered, if any.
+        self._rendered_remote_write: Optional[List[Dict[str, Any]]] = None
+
+        for name in self._eager_relation_libs():
+            getattr(self, name)
+
+    def _eager_relation_libs(self) -> Set[str]:
+        """Return the relation library objects the dispatched hook needs right away.
+
+        The others are only built if a handler or the reconcile uses them, except for those
+        deferring events, which always are.
+        """
+        eager = set(self._deferring_relation_libs)
+        # Juju dispatches hyphenated hook names, but test harnesses may use the event's name.
+        hook = os.environ.get("JUJU_DISPATCH_PATH", "").rsplit("/", 1)[-1].replace("_", "-")
+        if hook == "update-status" and not self.model.juju_version.has_secrets:
+            # Without Juju secrets, the TLS library checks the certificate for expiry on
+            # update-status.
+            return eager | {"cert"}
+        if hook in self._relation_lib_free_hooks or hook in self.meta.actions:
+            return eager
+        for endpoint in self.meta.relations:
+            if hook.startswith(f"{endpoint}-relation-"):
+                return eager | {
+                    name
+                    for name, endpoints in self._relation_libs.items()
+                    if endpoint in endpoints
+                }
+        # Any other hook may be observed by any of them (config-changed, upgrade-charm, ...).
+        return set(self._relation_libs)
 
-        alert_rules_path = self.metrics_rules_paths.dest
-        extra_alert_labels = key_value_pair_string_to_dict(
+    @property
+    def _extra_alert_labels(self) -> Dict[str, str]:
+        return key_value_pair_string_to_dict(
             cast(str, self.model.config.get("extra_alert_labels", ""))
         )
-        self._remote_write = PrometheusRemoteWriteConsumer(
+
+    @functools.cached_property
+    def _remote_write(self) -> "PrometheusRemoteWriteConsumer":
+        from charms.prometheus_k8s.v1.prometheus_remote_write import (
+            PrometheusRemoteWriteConsumer,
+        )
+
+        remote_write = PrometheusRemoteWriteConsumer(
             self,
-            alert_rules_path=alert_rules_path,
+            alert_rules_path=self.metrics_rules_paths.dest,
             forward_alert_rules=self._forward_alert_rules,
             refresh_event=[self.on.config_changed],
-            extra_alert_labels=extra_alert_labels,
+            extra_alert_labels=self._extra_alert_labels,
             peer_relation_name="peers",
         )
+        self.framework.observe(
+            remote_write.on.endpoints_changed,  # pyright: ignore
+            self.on_remote_write_changed,
+        )
+        return remote_write
+
+    @functools.cached_property
+    def _loki_consumer(self) -> "LokiPushApiConsumer":
+        from charms.loki_k8s.v1.loki_push_api import LokiPushApiConsumer
 
-        self._loki_consumer = LokiPushApiConsumer(
+        self._populate_rules_dest(self.loki_rules_paths)
+        loki_consumer = LokiPushApiConsumer(
             self,
             relation_name="logging-consumer",
             alert_rules_path=self.loki_rules_paths.dest,
             forward_alert_rules=self._forward_alert_rules,
             refresh_event=[self.on.config_changed],
-            extra_alert_labels=extra_alert_labels,
+            extra_alert_labels=self._extra_alert_labels,
+        )
+        self.framework.observe(
+            loki_consumer.on.loki_push_api_endpoint_joined,  # pyright: ignore
+            self._on_loki_push_api_endpoint_joined,
+        )
+        self.framework.observe(
+            loki_consumer.on.loki_push_api_endpoint_departed,  # pyright: ignore
+            self._on_loki_push_api_endpoint_departed,
         )
+        return loki_consumer
 
-        self._grafana_dashboards_provider = GrafanaDashboardProvider(
+    @functools.cached_property
+    def _grafana_dashboards_provider(self) -> "GrafanaDashboardProvider":
+        from dashboard_cache import CachedDashboardProvider
+
+        self._populate_rules_dest(self.dashboard_paths)
+        provider = CachedDashboardProvider(
             self,
             relation_name="grafana-dashboards-provider",
             dashboards_path=self.dashboard_paths.dest,
         )
+        self.framework.observe(
+            provider.on.dashboard_status_changed,  # pyright: ignore
+            self._on_dashboard_status_changed,
+        )
+        return provider
+
+    @functools.cached_property
+    def cert(self) -> "CertHandler":
+        """The TLS certificate of this unit's agent."""
+        from charms.observability_libs.v0.cert_handler import CertHandler
 
-        self.cert = CertHandler(
+        cert = CertHandler(
             self,
             key="grafana-agent-cert",
             peer_relation_name="peers",
         )
-        self.framework.observe(self.cert.on.cert_changed, self._on_cert_changed)  # pyright: ignore
+        self.framework.observe(cert.on.cert_changed, self._on_cert_changed)  # pyright: ignore
+        return cert
 
-        self.tracing = TracingEndpointRequirer(
-            self,
-            protocols=[
-                "otlp_http",  # for charm traces
-                "otlp_grpc",  # for forwarding workload traces
-            ],
-        )
-        self._charm_tracing_endpoint, self._server_cert = charm_tracing_config(
-            self.tracing, self._ca_path
+    @functools.cached_property
+    def _cloud(self) -> "GrafanaCloudConfigRequirer":
+        from charms.grafana_cloud_integrator.v0.cloud_config_requirer import (
+            GrafanaCloudConfigRequirer,
         )
 
-        self._cloud = GrafanaCloudConfigRequirer(self)
-
+        cloud = GrafanaCloudConfigRequirer(self)
         self.framework.observe(
-            self._cloud.on.cloud_config_available,  # pyright: ignore
+            cloud.on.cloud_config_available,  # pyright: ignore
             self._on_cloud_config_available,
         )
         self.framework.observe(
-            self._cloud.on.cloud_config_revoked,  # pyright: ignore
+            cloud.on.cloud_config_revoked,  # pyright: ignore
             self._on_cloud_config_revoked,
         )
+        return cloud
 
-        self.framework.observe(
-            self._grafana_dashboards_provider.on.dashboard_status_changed,  # pyright: ignore
-            self._on_dashboard_status_changed,
-        )
-
-        self.framework.observe(self.on.upgrade_charm, self._on_upgrade_charm)
-
-        self.framework.observe(
-            self._remote_write.on.endpoints_changed,  # pyright: ignore
-            self.on_remote_write_changed,
+    @functools.cached_property
+    def cert_transfer(self) -> "CertificateTransferRequires":
+        """The CA certificates received over `receive-ca-cert`."""
+        from charms.certificate_transfer_interface.v1.certificate_transfer import (
+            CertificateTransferRequires,
         )
 
+        cert_transfer = CertificateTransferRequires(self, "receive-ca-cert")
         self.framework.observe(
-            self._loki_consumer.on.loki_push_api_endpoint_joined,  # pyright: ignore
-            self._on_loki_push_api_endpoint_joined,
-        )
-        self.framework.observe(
-            self._loki_consumer.on.loki_push_api_endpoint_departed,  # pyright: ignore
-            self._on_loki_push_api_endpoint_departed,
-        )
-        self.framework.observe(self.on.config_changed, self._on_config_changed)
-
-        self.framework.observe(
-            self.cert_transfer.on.certificate_set_updated,  # pyright: ignore
+            cert_transfer.on.certificate_set_updated,  # pyright: ignore
             self._on_cert_transfer_available,
         )
         self.framework.observe(
-            self.cert_transfer.on.certificates_removed,  # pyright: ignore
+            cert_transfer.on.certificates_removed,  # pyright: ignore
             self._on_cert_transfer_removed,
         )
+        return cert_transfer
+
+    @staticmethod
+    def _populate_rules_dest(rules: RulesMapping) -> None:
+        """Seed the destination directory of bundled rules or dashboards on first use."""
+        if not os.path.isdir(rules.dest):
+            rules.src.mkdir(parents=True, exist_ok=True)
+            rules.dest.mkdir(parents=True, exist_ok=True)
+            for path in rules.src.rglob("*"):
+                if path.is_file():
+                    link_or_copy(path, rules.dest / path.relative_to(rules.src))
+
+    def _mark_dirty(self, *aspects: str) -> None:
+        """Request the given aspects to be reconciled at the end of the dispatch."""
+        self._dirty.update(aspects)
+
+    def _reconcile_steps(self) -> List[Tuple[str, Callable[[], Any]]]:
+        """Return the work to do for each aspect, in the order it must run."""
+        return [
+            ("snap", self._verify_snap_track),
+            ("config", self._update_config),
+            ("ca", self._update_ca),
+            ("metrics_rules", self._update_metrics_alerts),
+            ("logs_rules", self._update_loki_alerts),
+            ("dashboards", self._update_grafana_dashboards),
+            ("status", self._update_status),
+        ]
 
-        # Register status observers
-        for incoming, outgoings in self.mandatory_relation_pairs.items():
-            self.framework.observe(self.on[incoming].relation_joined, self._update_status)
-            self.framework.observe(self.on[incoming].relation_broken, self._update_status)
-            for outgoing_list in outgoings:
-                for outgoing in outgoing_list:
-                    self.framework.observe(self.on[outgoing].relation_joined, self._update_status)
-                    self.framework.observe(self.on[outgoing].relation_broken, self._update_status)
+    def _reconcile(self, _event=None) -> None:
+        """Run the work marked by the event handlers of this dispatch, once."""
+        if not self._dirty:
+            return
+        logger.debug("reconciling %s", ", ".join(sorted(self._dirty)))
+        for aspect, step in self._reconcile_steps():
+            if aspect in self._dirty:
+                self._dirty.discard(aspect)
+                step()
+
+    def _on_status_event(self, _event=None):
+        """Event handler for relation events affecting the status."""
+        self._mark_dirty("status")
 
     def _on_cert_changed(self, _event):
         """Event handler for cert change."""
-        self._update_config()
-        self._update_ca()
-        self._update_status()
+        self._mark_dirty("config", "ca", "status")
 
     def _on_mandatory_relation_event(self, _event=None):
         """Event handler for any mandatory relation event."""
-        self._update_config()
-        self._update_status()
+        self._mark_dirty("config", "status")
 
     def _on_upgrade_charm(self, _event=None):
         """Refresh alerts if the charm is updated."""
-        self._update_metrics_alerts()
-        self._update_loki_alerts()
-        self._update_config()
-        self._update_status()
+        self._mark_dirty("metrics_rules", "logs_rules", "config", "status")
+
+    def _on_update_status(self, _event=None):
+        """Apply config changes held back by `config_apply_window`."""
+        if self._stored.apply_pending:
+            self._mark_dirty("config", "status")
 
     def _on_loki_push_api_endpoint_joined(self, _event=None):
         """Rebuild the config with correct Loki sinks."""
-        self._update_config()
-        self._update_status()
+        self._mark_dirty("config", "status")
 
     def _on_loki_push_api_endpoint_departed(self, _event=None):
         """Rebuild the config with correct Loki sinks."""
-        self._update_config()
-        self._update_status()
+        self._mark_dirty("config", "status")
 
     def _on_config_changed(self, _event=None):
         """Rebuild the config."""
-        self._verify_snap_track()
-        self._update_config()
-        self._update_status()
+        self._mark_dirty("snap", "config", "status")
 
     def _on_cloud_config_available(self, _) -> None:
         logger.info("cloud config available")
@@ -322,13 +551,13 @@ class GrafanaAgentCharm(CharmBase):
         else:
             self._delete_file_if_exists(self._cloud_ca_path)
         self.run(["update-ca-certificates", "--fresh"])
-        self._update_config()
+        self._mark_dirty("config")
 
     def _on_cloud_config_revoked(self, _) -> None:
         logger.info("cloud config revoked")
-        self._update_config()
+        self._mark_dirty("config")
 
-    def _on_cert_transfer_available(self, event: CertificateTransferAvailableEvent):
+    def _on_cert_transfer_available(self, event: "CertificateTransferAvailableEvent"):
         for i, cert in enumerate(event.certificates):
             cert_filename = f"{self._ca_folder_path}/receive-ca-cert-{self.model.uuid}-{event.relation_id}-{i}-ca.crt"
             self.write_file(cert_filename, cert)
@@ -337,7 +566,7 @@ class GrafanaAgentCharm(CharmBase):
         # Restart the Agent with the new CA certs
         self.restart()
 
-    def _on_cert_transfer_removed(self, event: CertificateTransferRemovedEvent):
+    def _on_cert_transfer_removed(self, event: "CertificateTransferRemovedEvent"):
         certs_to_remove = [
             filename
             for filename in self.list_files(self._ca_folder_path)
@@ -509,33 +738,38 @@ class GrafanaAgentCharm(CharmBase):
     def update_dashboards(
         self, dashboards: Any, reload_func: Callable, mapping: RulesMapping
     ) -> None:
-        """Copy dashboards from relations, save them to disk, and update."""
-        shutil.rmtree(mapping.dest)
-        shutil.copytree(mapping.src, mapping.dest)
+        """Save the builtin dashboards and those from relations to disk, and update.
+
+        Only the dashboards that changed since the last update are written, and the
+        dashboards are only reloaded if any did.
+        """
+        builtin = {
+            str(path.relative_to(mapping.src)): path
+            for path in pathlib.Path(mapping.src).rglob("*")
+            if path.is_file()
+        }
+        related = {}
         for dash in dashboards:
             # Build dashboard custom filename
             charm = dash.get("charm", "charm-name")
             rel_id = dash.get("relation_id", "rel_id")
             title = dash.get("title").replace(" ", "_").replace("/", "_").lower()
             filename = f"juju_{title}-{charm}-{rel_id}.json"
+            related[filename] = minify_dashboard(dash["content"]).encode("utf-8")
 
-            with open(pathlib.Path(mapping.dest, filename), mode="w", encoding="utf-8") as f:
-                f.write(json.dumps(dash["content"]))
-                logger.debug("updated dashboard file %s", f.name)
-
+        if not sync_dir(pathlib.Path(mapping.dest), builtin, related):
+            logger.debug("dashboards unchanged")
+            return
+        logger.debug("updated dashboards in %s", mapping.dest)
         reload_func()
 
     def on_scrape_targets_changed(self, _event) -> None:
         """Event handler for the scrape targets changed event."""
-        self._update_config()
-        self._update_status()
-        self._update_metrics_alerts()
+        self._mark_dirty("config", "status", "metrics_rules")
 
     def on_remote_write_changed(self, _event) -> None:
         """Event handler for the remote write changed event."""
-        self._update_config()
-        self._update_status()
-        self._update_metrics_alerts()
+        self._mark_dirty("config", "status", "metrics_rules")
 
     def _update_status(self, *_):
         """Determine the charm status based on relation health and grafana-agent service readiness.
@@ -546,6 +780,14 @@ class GrafanaAgentCharm(CharmBase):
         TODO: Rework this when "compound status" is implemented
          https://github.com/canonical/operator/issues/665
         """
+        if self.status.snap_refresh:
+            self.unit.status = self.status.snap_refresh
+            return
+
+        if self.status.snap_error:
+            self.unit.status = self.status.snap_error
+            return
+
         if not self.is_ready:
             self.unit.status = WaitingStatus("waiting for agent to start")
             return
@@ -595,7 +837,12 @@ class GrafanaAgentCharm(CharmBase):
             if cos_rels.intersection(active_relations)
             else set()
         )
-        self.unit.status = ActiveStatus(", ".join([f"{x}: off" for x in missing_rels]))
+        messages = [f"{x}: off" for x in missing_rels]
+        if self._stored.apply_pending:
+            # The agent runs the previous config until a later hook (update-status at the
+            # latest) applies the change.
+            messages.append("config change pending (config_apply_window)")
+        self.unit.status = ActiveStatus(", ".join(messages))
 
     def _update_config(self) -> None:
         if not self.is_ready:
@@ -627,23 +874,18 @@ class GrafanaAgentCharm(CharmBase):
             self._delete_file_if_exists(self._snap_ca_path)
 
         config = self._generate_config()
+        config_text = yaml.dump(config)
 
-        try:
-            old_config = yaml.safe_load(self.read_file(CONFIG_PATH))
-        except (FileNotFoundError, PathError, ParserError):
-            # File does not yet exist? Processing a deferred event?
-            old_config = None
-
-        if config == old_config:
+        config_changed = not self._config_unchanged(config, config_text)
+        if not (config_changed or self._stored.apply_pending):
             # Nothing changed, possibly new installation. Move on.
             self.status.update_config = None
             return
 
         try:
-            self.write_file(CONFIG_PATH, yaml.dump(config))
-            # FIXME: change this to self._reload_config when #19 is fixed
-            # Restart the service to pick up the new config
-            self.restart()
+            if config_changed:
+                self._write_config(config_text)
+            self._apply_config(config)
         except GrafanaAgentReloadError as e:
             logger.error(str(e))
             self.status.update_config = BlockedStatus(str(e))
@@ -653,6 +895,89 @@ class GrafanaAgentCharm(CharmBase):
         else:
             self.status.update_config = None
 
+    def _write_config(self, config_text: str) -> None:
+        """Write the config file along with its digest."""
+        self.write_file(CONFIG_PATH, config_text)
+        self.write_file(config_digest_path(), hashlib.sha256(config_text.encode()).hexdigest())
+
+    def _config_unchanged(self, config: Dict[str, Any], config_text: str) -> bool:
+        """Check whether the config on disk already matches the freshly rendered one.
+
+        The digest kept next to the config file is compared first; the old config is only
+        parsed when that digest is missing or no longer matches the file on disk.
+        """
+        try:
+            on_disk = self.read_file(CONFIG_PATH)
+        except (FileNotFoundError, PathError):
+            # File does not yet exist? Processing a deferred event?
+            return False
+
+        try:
+            stored_digest = self.read_file(config_digest_path()).strip()
+        except (FileNotFoundError, PathError):
+            stored_digest = None
+
+        if stored_digest and stored_digest == hashlib.sha256(on_disk.encode()).hexdigest():
+            return stored_digest == hashlib.sha256(config_text.encode()).hexdigest()
+
+        logger.debug("config digest missing or stale; comparing against the parsed config")
+        try:
+            old_config = yaml.safe_load(on_disk)
+        except ParserError:
+            return False
+        if old_config != config:
+            return False
+
+        # Same config, rendered differently (e.g. by an older charm): refresh the file and its
+        # digest so the next comparison is a digest check again.
+        self._write_config(config_text)
+        return True
+
+    def _restart_digest(self, config: Dict[str, Any]) -> str:
+        """Digest of everything that requires a restart, rather than a reload, to take effect."""
+        return fingerprint(
+            {
+                "server": config["server"],
+                "cli_args": self._cli_args(),
+                "ports": [self._server_http_port, self._http_listen_port, self._grpc_listen_port],
+            }
+        )
+
+    def _apply_config(self, config: Dict[str, Any]) -> None:
+        """Make the agent pick up a freshly written config.
+
+        The config is hot-reloaded through the agent's reload endpoint, unless it changed in a
+        way that only a restart applies (server TLS, listen ports, CLI args) or reloading fails.
+        Within `config_apply_window` seconds of the previous reload or restart, the change is
+        held back until a later hook.
+        """
+        window = cast(int, self.config.get("config_apply_window") or 0)
+        since_last_applied = time.time() - self._stored.last_applied
+        if since_last_applied < window:
+            self._stored.apply_pending = True
+            logger.info(
+                "holding back config change: grafana-agent was reloaded or restarted %ds ago "
+                "(config_apply_window=%ds)",
+                since_last_applied,
+                window,
+            )
+            return
+        self._stored.apply_pending = False
+        self._stored.last_applied = time.time()
+
+        restart_digest = self._restart_digest(config)
+        if restart_digest != self._stored.restart_digest:
+            logger.info("server settings or CLI args changed: restarting grafana-agent")
+            self.restart()
+        else:
+            try:
+                self._reload_config(attempts=3)
+                logger.info("config changed: reloaded grafana-agent")
+            except GrafanaAgentReloadError as e:
+                logger.warning("%s: restarting grafana-agent instead", e)
+                self.restart()
+        self._stored.restart_digest = restart_digest
+
     def _delete_file_if_exists(self, file_path):
         try:
             self.read_file(file_path)
@@ -665,7 +990,7 @@ class GrafanaAgentCharm(CharmBase):
         """Re-initialize dashboards to forward."""
         # TODO: add constructor arg for `inject_dropdowns=False` instead of 'private' method?
         self._grafana_dashboards_provider._reinitialize_dashboard_data(inject_dropdowns=False)  # noqa
-        self._update_status()
+        self._mark_dirty("status")
 
     def _enhance_endpoints_with_tls(self, endpoints) -> List[Dict[str, Any]]:
         for endpoint in endpoints:
@@ -765,27 +1090,51 @@ class GrafanaAgentCharm(CharmBase):
         Returns:
             A yaml string with grafana agent config
         """
-        config = {
-            "server": self._server_config,
-            "integrations": self._integrations_config,
-            "metrics": {
-                "wal_directory": "/tmp/agent/data",
-                "global": {
-                    "scrape_timeout": self.model.config.get("global_scrape_timeout"),
-                    "scrape_interval": self.model.config.get("global_scrape_interval"),
-                },
-                "configs": [
-                    {
-                        "name": "agent_scraper",
-                        "scrape_configs": self.metrics_jobs(),
-                        "remote_write": self._prometheus_endpoints_with_tls(),
-                    }
-                ],
+        # The integrations and metrics sections both write to the remote_write endpoints:
+        # look them up once per render.
+        self._rendered_remote_write = self._prometheus_endpoints_with_tls()
+        try:
+            config = {
+                "server": self._server_config,
+                "integrations": self._integrations_config,
+                "metrics": self._metrics_config,
+                "logs": self._loki_config,
+                "traces": self._tempo_config,
+            }
+        finally:
+            self._rendered_remote_write = None
+        return config
+
+    def _remote_write_section(self) -> List[Dict[str, Any]]:
+        """Return the remote_write endpoints of the config being rendered.
+
+        Each section gets its own copy, so that the config is dumped without YAML anchors.
+        """
+        if self._rendered_remote_write is None:
+            return self._prometheus_endpoints_with_tls()
+        return copy.deepcopy(self._rendered_remote_write)
+
+    @property
+    def _metrics_config(self) -> Dict[str, Any]:
+        """Return the metrics section of the config.
+
+        Returns:
+            The dict representing the config
+        """
+        return {
+            "wal_directory": "/tmp/agent/data",
+            "global": {
+                "scrape_timeout": self.model.config.get("global_scrape_timeout"),
+                "scrape_interval": self.model.config.get("global_scrape_interval"),
             },
-            "logs": self._loki_config,
-            "traces": self._tempo_config,
+            "configs": [
+                {
+                    "name": "agent_scraper",
+                    "scrape_configs": self.metrics_jobs(),
+                    "remote_write": self._remote_write_section(),
+                }
+            ],
         }
-        return config
 
     @property
     def _server_config(self) -> dict:
@@ -814,7 +1163,7 @@ class GrafanaAgentCharm(CharmBase):
         # Align the "job" name with those of prometheus_scrape
         job_name = f"juju_{juju_model}_{juju_model_uuid}_{juju_application}_self-monitoring"
 
-        endpoints = self._prometheus_endpoints_with_tls()
+        endpoints = self._remote_write_section()
 
         conf = {
             "agent": {
@@ -1106,12 +1455,16 @@ class GrafanaAgentCharm(CharmBase):
         """
         try:
             logger.debug("reloading agent configuration")
-            url = "http://localhost/-/reload"
+            scheme = "https" if self.cert.enabled else "http"
+            url = f"{scheme}://localhost:{self._server_http_port}/-/reload"
             errors = list(range(400, 452)) + list(range(500, 513))
             s = Session()
             retries = Retry(total=attempts, backoff_factor=0.1, status_forcelist=errors)
-            s.mount("http://", HTTPAdapter(max_retries=retries))
-            s.post(url)
+            s.mount(f"{scheme}://", HTTPAdapter(max_retries=retries))
+            # The server cert is not issued for localhost, and nothing sensitive is sent.
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", InsecureRequestWarning)
+                s.post(url, timeout=5, verify=False).raise_for_status()
         except Exception as e:
             message = f"could not reload configuration: {str(e)}"
             raise GrafanaAgentReloadError(message)
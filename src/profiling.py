@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Opt-in per-hook CPU and memory profiling.
+
+Profiles are written to a directory that only keeps the most recent hooks, and can be
+summarized later on (e.g. from a Juju action) without having to copy them off the machine.
+"""
+
+import logging
+import os
+import time
+import tracemalloc
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Set
+
+# Only imported when profiling, which most hooks are not.
+if TYPE_CHECKING:
+    import cProfile
+
+logger = logging.getLogger(__name__)
+
+# Environment flag enabling profiling regardless of the charm config, e.g. "cpu,memory".
+PROFILE_ENV = "GRAFANA_AGENT_PROFILE"
+PROFILE_MODES = ("cpu", "memory")
+# Number of hooks whose profiles are kept around.
+MAX_PROFILED_HOOKS = 20
+
+_CPU_SUFFIX = ".pstats"
+_MEMORY_SUFFIX = ".tracemalloc"
+
+
+def profile_modes(setting: Optional[str]) -> Set[str]:
+    """Parse a comma-separated list of profiling modes, ignoring unknown ones."""
+    modes = {mode.strip() for mode in (setting or "").split(",") if mode.strip()}
+    if unknown := modes.difference(PROFILE_MODES):
+        logger.warning(f"ignoring unknown profiling modes: {sorted(unknown)}")
+    return modes.intersection(PROFILE_MODES)
+
+
+def profiles_dir(charm_dir: Path) -> Path:
+    """Directory the profiles are kept in, next to the charm's own state."""
+    return charm_dir / ".profiles"
+
+
+def hook_name() -> str:
+    """Name of the hook or action being dispatched, e.g. 'config-changed'."""
+    hook = os.environ.get("JUJU_DISPATCH_PATH", "unknown").rsplit("/", 1)[-1] or "unknown"
+    # Juju dispatches hyphenated hook names, but test harnesses may use the event's name.
+    return hook.replace("_", "-")
+
+
+class HookProfiler:
+    """Profile a single dispatch and keep the results of the last few."""
+
+    def __init__(self, directory: Path, modes: Set[str], keep: int = MAX_PROFILED_HOOKS):
+        self.directory = directory
+        self.modes = modes
+        self.keep = keep
+        self._profile: Optional["cProfile.Profile"] = None
+        self._started_tracemalloc = False
+
+    def start(self):
+        """Start collecting the enabled profiles."""
+        if "memory" in self.modes and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        if "cpu" in self.modes:
+            import cProfile
+
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+
+    def stop(self, hook: str) -> Dict[str, str]:
+        """Stop profiling and write this hook's profiles.
+
+        Returns:
+            The path each profile was written to, by mode.
+        """
+        written = {}
+        stem = self.directory / f"{time.time_ns()}-{hook}"
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            if self._profile:
+                self._profile.disable()
+                self._profile.dump_stats(f"{stem}{_CPU_SUFFIX}")
+                written["cpu"] = f"{stem}{_CPU_SUFFIX}"
+            if self._started_tracemalloc:
+                snapshot = tracemalloc.take_snapshot().filter_traces(
+                    [tracemalloc.Filter(False, tracemalloc.__file__)]
+                )
+                snapshot.dump(f"{stem}{_MEMORY_SUFFIX}")
+                written["memory"] = f"{stem}{_MEMORY_SUFFIX}"
+            self._rotate()
+        except OSError as e:
+            # Profiling is a debugging aid: it must never fail the hook.
+            logger.warning(f"could not write hook profile: {e}")
+        finally:
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+            self._profile = None
+            self._started_tracemalloc = False
+        return written
+
+    def _rotate(self):
+        for stale in _profiled_hooks(self.directory)[self.keep :]:
+            for suffix in (_CPU_SUFFIX, _MEMORY_SUFFIX):
+                self.directory.joinpath(f"{stale}{suffix}").unlink(missing_ok=True)
+
+
+def _profiled_hooks(directory: Path) -> List[str]:
+    """Stems of the profiled hooks in `directory`, most recent first."""
+    if not directory.is_dir():
+        return []
+    stems = {
+        path.stem for path in directory.iterdir() if path.suffix in (_CPU_SUFFIX, _MEMORY_SUFFIX)
+    }
+    return sorted(stems, key=lambda stem: int(stem.split("-", 1)[0]), reverse=True)
+
+
+def _hot_functions(path: Path, top: int) -> List[str]:
+    import pstats
+
+    stats = pstats.Stats(str(path)).stats  # pyright: ignore
+    by_own_time = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)
+    return [
+        f"{own:.3f}s own, {cumulative:.3f}s total, {calls} calls: {func} ({file}:{line})"
+        for (file, line, func), (_, calls, own, cumulative, _) in by_own_time[:top]
+    ]
+
+
+def _allocation_sites(path: Path, top: int) -> List[str]:
+    statistics = tracemalloc.Snapshot.load(str(path)).statistics("lineno")
+    return [
+        f"{stat.size / 1024:.1f} KiB in {stat.count} blocks: {stat.traceback[0]}"
+        for stat in statistics[:top]
+    ]
+
+
+def summarize(directory: Path, hooks: int = 3, top: int = 10) -> List[Dict[str, str]]:
+    """Summarize the profiles of the most recent hooks, most recent first.
+
+    Args:
+        directory: where the profiles were written.
+        hooks: how many of the most recent hooks to summarize.
+        top: how many functions and allocation sites to report per hook.
+    """
+    summaries = []
+    for stem in _profiled_hooks(directory)[:hooks]:
+        summary = {"hook": stem.split("-", 1)[1]}
+        if (cpu := directory / f"{stem}{_CPU_SUFFIX}").exists():
+            summary["functions"] = "\n".join(_hot_functions(cpu, top))
+        if (memory := directory / f"{stem}{_MEMORY_SUFFIX}").exists():
+            summary["allocations"] = "\n".join(_allocation_sites(memory, top))
+        summaries.append(summary)
+    return summaries
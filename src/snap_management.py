@@ -10,10 +10,12 @@
 Modified from https://github.com/canonical/k8s-operator/blob/main/charms/worker/k8s/src/snap.py
 """
 
+import hashlib
+import json
 import logging
+import os
 import platform
-import subprocess
-from typing import Dict, Optional
+from typing import Any, Dict, Iterable, Optional, Set, Tuple, cast
 
 import charms.operator_libs_linux.v2.snap as snap_lib
 
@@ -42,8 +44,152 @@ class SnapSpecError(Exception):
     pass
 
 
-def install_ga_snap(classic: bool, config: Optional[Dict[str, str]] = None):
-    """Looks up system details and installs the appropriate grafana-agent snap revision."""
+class SnapHandle:
+    """A single snap, loaded from snapd on first use and kept until explicitly refreshed.
+
+    Building a `SnapCache` reads the snap catalog and queries snapd for all installed snaps; a
+    handle only queries snapd for the snap it stands for, and only once per dispatch unless
+    refreshed (e.g. after the snap was installed or refreshed).
+    """
+
+    def __init__(self, name: str = _grafana_agent_snap_name):
+        self.name = name
+        # snapd API calls made so far.
+        self.api_calls = 0
+        # The snapd change refreshing the snap, if one was submitted.
+        self.pending_change: Optional[str] = None
+        self._snap: Optional[snap_lib.Snap] = None
+        self._client: Optional[snap_lib.SnapClient] = None
+
+    @property
+    def snap(self) -> snap_lib.Snap:
+        """The snap, installed or not."""
+        if self._snap is None:
+            self._snap = self._load()
+        return self._snap
+
+    def refresh(self) -> None:
+        """Load the snap from snapd again on next use."""
+        self._snap = None
+
+    def refresh_async(self, revision: str, classic: bool = False) -> str:
+        """Submit a refresh of the snap to `revision` to snapd, without waiting for it.
+
+        Returns:
+            The id of the snapd change doing the refresh.
+        """
+        body: Dict = {"action": "refresh", "revision": revision}
+        if classic:
+            body["classic"] = True
+        self.pending_change = self._submit(f"snaps/{self.name}", body)
+        return self.pending_change
+
+    def connected_slots(self, plug: str) -> Set[Tuple[str, str]]:
+        """The (snap, slot) pairs the snap's `plug` is connected to, from a single snapd call."""
+        connections = self._get("connections", query={"snap": self.name})
+        return {
+            (connection["slot"]["snap"], connection["slot"]["slot"])
+            for connection in connections.get("established", [])
+            if connection["plug"] == {"snap": self.name, "plug": plug}
+        }
+
+    def connect_all(
+        self, plug: str, slots: Iterable[Tuple[str, str]]
+    ) -> Dict[Tuple[str, str], snap_lib.Error]:
+        """Connect the snap's `plug` to each of the (snap, slot) `slots` that it is not yet.
+
+        snapd only connects one plug to one slot per change, so the changes are all submitted
+        before waiting for any of them: they are carried out together rather than one by one.
+
+        Returns:
+            The error connecting each slot that could not be connected.
+        """
+        missing = sorted(set(slots) - self.connected_slots(plug))
+        changes: Dict[Tuple[str, str], str] = {}
+        errors: Dict[Tuple[str, str], snap_lib.Error] = {}
+        for slot_snap, slot in missing:
+            body = {
+                "action": "connect",
+                "plugs": [{"snap": self.name, "plug": plug}],
+                "slots": [{"snap": slot_snap, "slot": slot}],
+            }
+            try:
+                changes[(slot_snap, slot)] = self._submit("interfaces", body)
+            except snap_lib.SnapAPIError as e:
+                errors[(slot_snap, slot)] = e
+        for slot, change in changes.items():
+            try:
+                self.api_calls += 1
+                self._snapd()._wait(change)  # noqa
+            except snap_lib.Error as e:
+                errors[slot] = e
+            except TimeoutError as e:
+                errors[slot] = snap_lib.SnapError(str(e))
+        return errors
+
+    def _get(self, path: str, query: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """Make a sync snapd request, for an object."""
+        self.api_calls += 1
+        return cast(Dict[str, Any], self._snapd()._request("GET", path, query=query) or {})  # noqa
+
+    def _submit(self, path: str, body: Dict) -> str:
+        """Submit an async snapd request without waiting for it, and return its change id."""
+        self.api_calls += 1
+        # Not `_request`, which waits for async changes to complete.
+        response = self._snapd()._request_raw(  # noqa
+            "POST",
+            path,
+            headers={"Accept": "application/json", "Content-Type": "application/json"},
+            data=json.dumps(body).encode("utf-8"),
+        )
+        return json.loads(response.read().decode())["change"]
+
+    def change_progress(self, change_id: str) -> Tuple[str, str]:
+        """The status of a snapd change (e.g. "Doing", "Done", "Error"), and its progress."""
+        change = self._get(f"changes/{change_id}")
+        tasks = change.get("tasks", [])
+        doing = next((task for task in tasks if task.get("status") == "Doing"), None)
+        if not doing:
+            done = sum(task.get("status") == "Done" for task in tasks)
+            return change["status"], f"{done}/{len(tasks)} tasks done"
+        progress = doing.get("progress", {})
+        percent = 100 * progress.get("done", 0) // max(progress.get("total", 0), 1)
+        return change["status"], f"{doing.get('summary', '')} ({percent}%)"
+
+    def _snapd(self) -> snap_lib.SnapClient:
+        if self._client is None:
+            if not os.path.isfile("/usr/bin/snap"):
+                raise snap_lib.SnapError("snapd is not installed or not in /usr/bin")
+            self._client = snap_lib.SnapClient()
+        return self._client
+
+    def _load(self) -> snap_lib.Snap:
+        info: Dict[str, Any]
+        try:
+            info = self._get(f"snaps/{self.name}")
+            state, apps = snap_lib.SnapState.Latest, info.get("apps")
+        except snap_lib.SnapAPIError:
+            # Not installed: look it up in the store instead, as `SnapCache` does.
+            try:
+                self.api_calls += 1
+                info = self._snapd().get_snap_information(self.name)
+            except snap_lib.SnapAPIError as e:
+                raise snap_lib.SnapNotFoundError(f"Snap '{self.name}' not found!") from e
+            state, apps = snap_lib.SnapState.Available, None
+        log.debug("loaded %s snap (%d snapd API calls so far)", self.name, self.api_calls)
+        return snap_lib.Snap(
+            name=info["name"],
+            state=state,
+            channel=info["channel"],
+            revision=info["revision"],
+            confinement=info["confinement"],
+            apps=apps,
+            version=info.get("version"),
+        )
+
+
+def desired_snap_state(classic: bool, config: Optional[Dict[str, str]] = None) -> Dict:
+    """The state the grafana-agent snap should be in, for this machine."""
     arch = get_system_arch()
     confinement = "classic" if classic else "strict"
     try:
@@ -52,7 +198,45 @@ def install_ga_snap(classic: bool, config: Optional[Dict[str, str]] = None):
         raise SnapSpecError(
             f"Snap spec not found for arch={arch} and confinement={confinement}"
         ) from e
-    _install_snap(name=_grafana_agent_snap_name, revision=revision, classic=classic, config=config)
+    return {"revision": revision, "confinement": confinement, "config": config or {}, "held": True}
+
+
+def snap_fingerprint(state: Dict) -> str:
+    """A digest of a snap state, to tell whether it was already applied."""
+    return hashlib.sha256(json.dumps(state, sort_keys=True).encode()).hexdigest()
+
+
+def install_ga_snap(
+    classic: bool,
+    config: Optional[Dict[str, str]] = None,
+    handle: Optional[SnapHandle] = None,
+    applied_fingerprint: Optional[str] = None,
+) -> Optional[str]:
+    """Looks up system details and installs the appropriate grafana-agent snap revision.
+
+    If `applied_fingerprint` is the fingerprint of the desired state, that state was already
+    applied and snapd is not called at all.
+
+    Refreshing an installed snap to another revision is only submitted to snapd: the handle's
+    `pending_change` is then set, and the state is to be applied again once that change is done.
+
+    Returns:
+        The fingerprint of the state applied, or None if a refresh is pending.
+    """
+    desired = desired_snap_state(classic, config)
+    fingerprint = snap_fingerprint(desired)
+    if fingerprint == applied_fingerprint:
+        log.debug("grafana-agent snap already at revision %s", desired["revision"])
+        return fingerprint
+    handle = handle or SnapHandle()
+    _install_snap(
+        name=_grafana_agent_snap_name,
+        revision=desired["revision"],
+        classic=classic,
+        config=config,
+        handle=handle,
+    )
+    return None if handle.pending_change else fingerprint
 
 
 def _install_snap(
@@ -60,13 +244,14 @@ def _install_snap(
     revision: str,
     classic: bool = False,
     config: Optional[Dict[str, str]] = None,
+    handle: Optional[SnapHandle] = None,
 ):
     """Install and pin the given snap revision.
 
     The revision will be held, i.e. it won't be automatically updated any time a new revision is released.
     """
-    cache = snap_lib.SnapCache()
-    snap = cache[name]
+    handle = handle or SnapHandle(name)
+    snap = handle.snap
     log.info(
         f"Ensuring {name} snap is installed at revision={revision}"
         f" with classic confinement={classic}"
@@ -77,13 +262,15 @@ def _install_snap(
     # https://github.com/canonical/operator-libs-linux/issues/129
     if snap.present:
         if snap.revision != revision:
-            cmd = ["snap", "refresh", "grafana-agent", f'--revision="{revision}"']
-            if classic:
-                cmd.append("--classic")
-            subprocess.run(cmd)
-            snap.start(enable=True)
+            # Downloading the new revision may take minutes: do not hold the hook until it is
+            # done. The config and the hold are applied once the refresh is (see
+            # `install_ga_snap`).
+            change = handle.refresh_async(revision, classic=classic)
+            log.info(f"Refreshing {name} snap to revision={revision} in snapd change {change}")
+            return
     else:
         snap.ensure(state=snap_lib.SnapState.Present, revision=revision, classic=classic)
+        handle.refresh()
 
     if config:
         snap.set(config)  # type: ignore
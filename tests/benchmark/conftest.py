@@ -0,0 +1,133 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+from pathlib import Path
+from typing import Dict
+from unittest.mock import MagicMock, PropertyMock, patch
+
+import pytest
+from charms.tempo_coordinator_k8s.v0.charm_tracing import charm_tracing_disabled
+from importtime import ImportTime
+from measure import UPDATE_BASELINES, Measurement, as_baseline, load_baselines, save_baselines
+
+CHARM_ROOT = Path(__file__).parents[2]
+
+RESULTS: Dict[str, Measurement] = {}
+IMPORT_RESULTS: Dict[str, ImportTime] = {}
+CODEC_RESULTS: Dict[str, dict] = {}
+
+
+@pytest.fixture(autouse=True)
+def charm_dir(tmp_path, monkeypatch):
+    """Run from a scratch charm dir so the rules and dashboards the charm copies don't leak."""
+    (tmp_path / "src").symlink_to(CHARM_ROOT / "src")
+    monkeypatch.chdir(tmp_path)
+    with patch("grafana_agent.CONFIG_PATH", tmp_path / "grafana-agent.yaml"):
+        yield tmp_path
+
+
+@pytest.fixture(autouse=True)
+def mock_host():
+    """Keep the charm off the host: no snapd, no agent binary, no reload endpoint."""
+    with patch("charm.GrafanaAgentMachineCharm.snap", new_callable=PropertyMock), patch(
+        "charm.GrafanaAgentMachineCharm._is_installed", new_callable=PropertyMock
+    ) as installed, patch("charm.GrafanaAgentMachineCharm._reload_config"), patch(
+        "snap_management._install_snap"
+    ), patch("charm.subprocess.run", MagicMock()), patch(
+        "socket.getfqdn", return_value="localhost"
+    ):
+        installed.return_value = True
+        yield
+
+
+@pytest.fixture(autouse=True)
+def mock_charm_tracing(tmp_path):
+    with charm_tracing_disabled(), patch(
+        "charms.tempo_coordinator_k8s.v0.charm_tracing.BUFFER_DEFAULT_CACHE_FILE_NAME",
+        str(tmp_path / "charm-tracing-buffer.json"),
+    ):
+        yield
+
+
+@pytest.fixture
+def record():
+    def _record(key: str, measurement: Measurement):
+        RESULTS[key] = measurement
+
+    return _record
+
+
+@pytest.fixture
+def record_import():
+    def _record(key: str, import_time: ImportTime):
+        IMPORT_RESULTS[key] = import_time
+
+    return _record
+
+
+@pytest.fixture
+def record_codec():
+    def _record(codec: str, measurement: dict):
+        CODEC_RESULTS[codec] = measurement
+
+    return _record
+
+
+def pytest_terminal_summary(terminalreporter):
+    _import_time_summary(terminalreporter)
+    _hook_latency_summary(terminalreporter)
+    _codec_summary(terminalreporter)
+
+
+def _import_time_summary(terminalreporter):
+    if not IMPORT_RESULTS:
+        return
+    baselines = load_baselines()
+    terminalreporter.section("import time")
+    for key, import_time in sorted(IMPORT_RESULTS.items()):
+        base = baselines.get(key, {}).get("import_time", 0)
+        terminalreporter.write_line(
+            f"{key:<48} {import_time.total / 1000:>10.1f}ms (base {base / 1000:.1f}ms)"
+        )
+        for package, self_time in import_time.by_package():
+            terminalreporter.write_line(f"    {package:<60} {self_time / 1000:>8.1f}ms")
+    if UPDATE_BASELINES:
+        baselines.update({key: {"import_time": t.total} for key, t in IMPORT_RESULTS.items()})
+        save_baselines(baselines)
+
+
+def _hook_latency_summary(terminalreporter):
+    if not RESULTS:
+        return
+    baselines = load_baselines()
+    terminalreporter.section("hook latency")
+    terminalreporter.write_line(
+        f"{'benchmark':<48} {'wall (ms)':>10} {'base':>8} {'peak (KiB)':>11} {'base':>8}"
+        f" {'calls':>6} {'base':>6}"
+    )
+    for key, measurement in sorted(RESULTS.items()):
+        base = baselines.get(key, {})
+        terminalreporter.write_line(
+            f"{key:<48} {measurement.wall_time * 1000:>10.1f}"
+            f" {base.get('wall_time', 0) * 1000:>8.1f}"
+            f" {measurement.peak_memory / 1024:>11.0f} {base.get('peak_memory', 0) / 1024:>8.0f}"
+            f" {measurement.hook_tool_calls:>6} {base.get('hook_tool_calls', 0):>6}"
+        )
+    if UPDATE_BASELINES:
+        baselines.update({key: as_baseline(m) for key, m in RESULTS.items()})
+        save_baselines(baselines)
+        terminalreporter.write_line(f"baselines updated for {len(RESULTS)} benchmarks")
+
+
+def _codec_summary(terminalreporter):
+    if not CODEC_RESULTS:
+        return
+    terminalreporter.section("dashboard codecs")
+    terminalreporter.write_line(
+        f"{'codec':<12} {'compress (ms)':>14} {'decompress (ms)':>16} {'size (KiB)':>11}"
+        f" {'ratio':>6}"
+    )
+    for codec, m in CODEC_RESULTS.items():
+        terminalreporter.write_line(
+            f"{codec:<12} {m['compress'] * 1000:>14.1f} {m['decompress'] * 1000:>16.1f}"
+            f" {m['size'] / 1024:>11.0f} {m['size'] / m['raw_size']:>6.2f}"
+        )
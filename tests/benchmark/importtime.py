@@ -0,0 +1,77 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Measure the cold import of the charm, broken down as `python -X importtime` reports it."""
+
+import os
+import re
+import subprocess
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from measure import ROUNDS
+
+CHARM_ROOT = Path(__file__).parents[2]
+
+# import time:       123 |        456 | package.module
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+@dataclass
+class ImportTime:
+    """What importing a module from a fresh interpreter cost."""
+
+    # Cumulative import time of the module, in microseconds.
+    total: int
+    # Self import time of every module loaded along with it, in microseconds.
+    modules: Dict[str, int]
+
+    def by_package(self, top: int = 10) -> List[Tuple[str, int]]:
+        """The `top` packages taking the longest to import, slowest first.
+
+        Charm libraries are grouped by library (`charms.loki_k8s.v1.loki_push_api`) rather than
+        under `charms`, since that is the granularity they are imported lazily at.
+        """
+        packages: Dict[str, int] = {}
+        for module, self_time in self.modules.items():
+            parts = module.split(".")
+            package = ".".join(parts[:4]) if parts[0] == "charms" else parts[0]
+            packages[package] = packages.get(package, 0) + self_time
+        return sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+def _import_once(module: str) -> ImportTime:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        str(CHARM_ROOT / path) for path in ("", "lib", "src")
+    )
+    # Not `subprocess.run`, which the benchmarks patch to keep the charm off the host.
+    with subprocess.Popen(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+    ) as process:
+        _, stderr = process.communicate()
+    if process.returncode:
+        raise RuntimeError(f"importing {module} failed:\n{stderr}")
+    # Each module is reported after everything it imported, so the modules loaded for `module`
+    # are the ones reported since the previous top-level import (the interpreter's own startup).
+    modules: Dict[str, int] = {}
+    for line in stderr.splitlines():
+        if not (match := _LINE.match(line)):
+            continue
+        self_time, cumulative, indent, name = match.groups()
+        modules[name] = modules.get(name, 0) + int(self_time)
+        if len(indent) == 1:
+            if name == module:
+                return ImportTime(total=int(cumulative), modules=modules)
+            modules = {}
+    raise RuntimeError(f"{module} missing from the import time report")
+
+
+def measure_import(module: str, rounds: int = ROUNDS) -> ImportTime:
+    """Import `module` in `rounds` fresh interpreters and keep the fastest import."""
+    return min((_import_once(module) for _ in range(rounds)), key=lambda run: run.total)
@@ -0,0 +1,143 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Measure a Scenario run: wall time, peak memory and hook-tool calls."""
+
+import json
+import logging
+import os
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+from ops.model import _ModelBackend
+from scenario.mocking import _MockModelBackend
+
+BASELINES_PATH = Path(__file__).parent / "baselines.json"
+
+# Set to regenerate baselines.json from the current tree instead of comparing against it.
+UPDATE_BASELINES = os.environ.get("BENCHMARK_UPDATE_BASELINES", "") not in ("", "0")
+# Relative slack allowed before a measurement is reported as a regression. Wall time is noisy
+# and machine-dependent, so it gets a much larger default slack than the other metrics.
+WALL_TIME_TOLERANCE = float(os.environ.get("BENCHMARK_WALL_TIME_TOLERANCE", "1.0"))
+PEAK_MEMORY_TOLERANCE = float(os.environ.get("BENCHMARK_PEAK_MEMORY_TOLERANCE", "0.25"))
+ROUNDS = int(os.environ.get("BENCHMARK_ROUNDS", "3"))
+
+
+@dataclass
+class Measurement:
+    """What a single hook cost."""
+
+    wall_time: float
+    peak_memory: int
+    hook_tool_calls: int
+    hook_tools: Dict[str, int]
+
+
+def _hook_tools() -> List[str]:
+    # Every public _ModelBackend method that the Scenario backend overrides stands for a
+    # hook tool invocation (relation-get, config-get, status-set, ...) in a real dispatch.
+    return [
+        name
+        for name, attr in vars(_MockModelBackend).items()
+        if callable(attr) and not name.startswith("_") and hasattr(_ModelBackend, name)
+    ]
+
+
+@contextmanager
+def count_hook_tools() -> Iterator[Counter]:
+    """Count calls to the mocked hook tools for the duration of the context."""
+    calls: Counter = Counter()
+    originals = {name: vars(_MockModelBackend)[name] for name in _hook_tools()}
+
+    def counting(name: str, method: Callable) -> Callable:
+        def wrapper(*args, **kwargs):
+            calls[name] += 1
+            return method(*args, **kwargs)
+
+        return wrapper
+
+    for name, method in originals.items():
+        setattr(_MockModelBackend, name, counting(name, method))
+    try:
+        yield calls
+    finally:
+        for name, method in originals.items():
+            setattr(_MockModelBackend, name, method)
+
+
+@contextmanager
+def _root_logging_restored() -> Iterator[None]:
+    # Every run installs a JujuLogHandler on the root logger and never removes it, so without
+    # this each round would log (and call juju-log) once more per record than the previous one.
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    try:
+        yield
+    finally:
+        root.handlers[:] = handlers
+        root.setLevel(level)
+
+
+def measure(run: Callable[[], object], rounds: int = ROUNDS) -> Measurement:
+    """Run `run` `rounds` times for timing, plus once more to trace memory and hook tools.
+
+    The timed rounds do not trace allocations, so tracemalloc's overhead does not skew them;
+    the fastest round is kept as the least noisy estimate.
+    """
+    timings = []
+    for _ in range(rounds):
+        with _root_logging_restored():
+            start = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        with _root_logging_restored(), count_hook_tools() as calls:
+            run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return Measurement(
+        wall_time=min(timings),
+        peak_memory=peak,
+        hook_tool_calls=sum(calls.values()),
+        hook_tools=dict(sorted(calls.items())),
+    )
+
+
+def load_baselines() -> Dict[str, dict]:
+    if not BASELINES_PATH.exists():
+        return {}
+    return json.loads(BASELINES_PATH.read_text())
+
+
+def save_baselines(baselines: Dict[str, dict]):
+    BASELINES_PATH.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+
+
+def regressions(measurement: Measurement, baseline: Optional[dict]) -> List[str]:
+    """Describe every metric of `measurement` that is worse than `baseline` allows."""
+    if not baseline:
+        return []
+    found = []
+    if measurement.hook_tool_calls > baseline["hook_tool_calls"]:
+        found.append(
+            f"hook tool calls: {measurement.hook_tool_calls} > {baseline['hook_tool_calls']}"
+        )
+    if measurement.wall_time > baseline["wall_time"] * (1 + WALL_TIME_TOLERANCE):
+        found.append(f"wall time: {measurement.wall_time:.3f}s > {baseline['wall_time']:.3f}s")
+    if measurement.peak_memory > baseline["peak_memory"] * (1 + PEAK_MEMORY_TOLERANCE):
+        found.append(f"peak memory: {measurement.peak_memory}B > {baseline['peak_memory']}B")
+    return found
+
+
+def as_baseline(measurement: Measurement) -> dict:
+    baseline = asdict(measurement)
+    baseline["wall_time"] = round(baseline["wall_time"], 4)
+    return baseline
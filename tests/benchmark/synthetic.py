@@ -0,0 +1,161 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Synthetic deployment states for the hook latency benchmarks."""
+
+import json
+from dataclasses import dataclass
+from typing import Dict, List
+
+from charms.grafana_agent.v0.cos_agent import (
+    DASHBOARD_CODECS,
+    CosAgentPeersUnitData,
+    CosAgentProviderUnitData,
+    CosAgentRequirerUnitData,
+)
+from cosl import LZMABase64
+from ops.testing import PeerRelation, Relation, State, SubordinateRelation
+
+
+@dataclass(frozen=True)
+class DeploymentSize:
+    """Shape of a synthetic deployment.
+
+    Attributes:
+        principals: number of principal applications related over cos-agent.
+        jobs: number of scrape jobs each principal requests.
+        dashboards: number of dashboards each principal forwards.
+        peers: number of grafana-agent peer units (besides the unit under test).
+    """
+
+    principals: int
+    jobs: int
+    dashboards: int
+    peers: int
+
+    @property
+    def id(self) -> str:
+        return f"n{self.principals}-m{self.jobs}-k{self.dashboards}-p{self.peers}"
+
+
+def _dashboard(app: str, index: int) -> str:
+    panels = [
+        {
+            "id": panel,
+            "title": f"{app} panel {panel}",
+            "type": "timeseries",
+            "targets": [{"expr": f'rate({app}_requests_total{{panel="{panel}"}}[5m])'}],
+        }
+        for panel in range(20)
+    ]
+    dashboard = {"title": f"{app} dashboard {index}", "uid": f"{app}-{index}", "panels": panels}
+    return LZMABase64.compress(json.dumps(dashboard))
+
+
+def _alert_rules(app: str) -> dict:
+    return {
+        "groups": [
+            {
+                "name": f"{app}_alerts",
+                "rules": [
+                    {
+                        "alert": f"{app}Down",
+                        "expr": f'up{{juju_application="{app}"}} == 0',
+                        "for": "5m",
+                        "labels": {"severity": "critical"},
+                    }
+                ],
+            }
+        ]
+    }
+
+
+def _provider_data(app: str, size: DeploymentSize) -> CosAgentProviderUnitData:
+    return CosAgentProviderUnitData(
+        metrics_alert_rules=_alert_rules(app),
+        log_alert_rules={},
+        dashboards=[_dashboard(app, index) for index in range(size.dashboards)],
+        metrics_scrape_jobs=[
+            {
+                "job_name": f"{app}_job_{job}",
+                "metrics_path": "/metrics",
+                "static_configs": [{"targets": [f"localhost:{9000 + job}"]}],
+            }
+            for job in range(size.jobs)
+        ],
+        log_slots=[],
+    )
+
+
+def _peer_databag(unit: int, size: DeploymentSize) -> Dict[str, str]:
+    # Every unit runs the same version of the library, and already told its peers so.
+    databag = {"dashboard_codecs": json.dumps(list(DASHBOARD_CODECS))}
+    for principal in range(size.principals):
+        app = f"principal-{principal}"
+        provider_data = _provider_data(app, size)
+        data = CosAgentPeersUnitData(
+            unit_name=f"{app}/{unit}",
+            relation_id=str(principal),
+            relation_name="cos-agent",
+            metrics_alert_rules=provider_data.metrics_alert_rules,
+            log_alert_rules=provider_data.log_alert_rules,
+            dashboards=provider_data.dashboards,
+        )
+        databag[f"{CosAgentPeersUnitData.KEY}-{data.unit_name}"] = data.json()
+    return databag
+
+
+def principal_relations(size: DeploymentSize) -> List[SubordinateRelation]:
+    """One cos-agent relation per principal application, as seen from unit 0."""
+    relations = []
+    for principal in range(size.principals):
+        app = f"principal-{principal}"
+        data = _provider_data(app, size)
+        relations.append(
+            SubordinateRelation(
+                "cos-agent",
+                remote_app_name=app,
+                remote_unit_id=0,
+                remote_unit_data={data.KEY: data.json()},
+                # What the unit already advertises to its principal, as in a settled deployment.
+                local_unit_data=CosAgentRequirerUnitData(
+                    receivers=[], dashboard_codecs=list(DASHBOARD_CODECS)
+                ).dump(),
+            )
+        )
+    return relations
+
+
+def peer_relation(size: DeploymentSize) -> PeerRelation:
+    """The peers relation, with every unit forwarding the data of its principals."""
+    return PeerRelation(
+        "peers",
+        local_unit_data=_peer_databag(0, size),
+        peers_data={unit: _peer_databag(unit, size) for unit in range(1, size.peers + 1)},
+    )
+
+
+def synthetic_state(size: DeploymentSize, leader: bool = True) -> State:
+    """A leader unit related to `size.principals` principals and the usual o11y backends."""
+    remote_write = Relation(
+        "send-remote-write",
+        remote_units_data={
+            0: {"remote_write": json.dumps({"url": "http://prometheus:9090/api/v1/write"})}
+        },
+    )
+    logging = Relation(
+        "logging-consumer",
+        remote_units_data={
+            0: {"endpoint": json.dumps({"url": "http://loki:3100/loki/api/v1/push"})}
+        },
+    )
+    dashboards = Relation("grafana-dashboards-provider")
+    return State(
+        leader=leader,
+        relations=[
+            *principal_relations(size),
+            peer_relation(size),
+            remote_write,
+            logging,
+            dashboards,
+        ],
+    )
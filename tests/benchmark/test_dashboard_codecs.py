@@ -0,0 +1,67 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Compression time, decompression time and size of the builtin dashboards, per cos_agent codec.
+
+Run with `tox -e benchmark`; the numbers are listed in the summary. Timings depend too much on
+the machine to be compared against baselines, so only the codecs' relative speed is checked.
+"""
+
+import json
+import time
+from pathlib import Path
+from typing import Callable
+
+import pytest
+from charms.grafana_agent.v0.cos_agent import (
+    DASHBOARD_CODECS,
+    DEFAULT_DASHBOARD_CODEC,
+    decode_dashboard,
+    encode_dashboard,
+    minify_dashboard,
+)
+from measure import ROUNDS
+
+CHARM_ROOT = Path(__file__).parents[2]
+DASHBOARDS = [
+    minify_dashboard(json.loads(path.read_text()))
+    for path in sorted((CHARM_ROOT / "src" / "grafana_dashboards").glob("*.json"))
+]
+
+
+def _fastest(run: Callable[[], object], rounds: int = ROUNDS) -> float:
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def _measure(codec: str) -> dict:
+    encoded = [encode_dashboard(dashboard, codec) for dashboard in DASHBOARDS]
+    return {
+        "compress": _fastest(lambda: [encode_dashboard(d, codec) for d in DASHBOARDS]),
+        "decompress": _fastest(lambda: [decode_dashboard(e) for e in encoded]),
+        "size": sum(len(e) for e in encoded),
+        "raw_size": sum(len(d) for d in DASHBOARDS),
+    }
+
+
+@pytest.mark.parametrize("codec", DASHBOARD_CODECS)
+def test_dashboard_codec(codec, record_codec):
+    # WHEN the builtin dashboards are encoded and decoded with the codec
+    measurement = _measure(codec)
+    record_codec(codec, measurement)
+
+    # THEN they decode to what was encoded
+    assert [decode_dashboard(encode_dashboard(d, codec)) for d in DASHBOARDS] == DASHBOARDS
+
+
+def test_preferred_codec_decodes_faster_than_default():
+    # GIVEN the codec negotiated when both ends of the relation support all of them
+    preferred = next(iter(DASHBOARD_CODECS))
+    if preferred == DEFAULT_DASHBOARD_CODEC:
+        pytest.skip("no codec other than the default one is available")
+
+    # THEN decoding dashboards with it is faster than with the default codec
+    assert _measure(preferred)["decompress"] < _measure(DEFAULT_DASHBOARD_CODEC)["decompress"]
@@ -0,0 +1,51 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Hook latency benchmarks against synthetic deployments of growing size.
+
+Run with `tox -e benchmark`. Each benchmark is compared against `baselines.json` and fails
+if it regressed beyond the configured tolerance; set `BENCHMARK_UPDATE_BASELINES=1` to
+record the current tree as the new baseline instead.
+"""
+
+import pytest
+from measure import UPDATE_BASELINES, load_baselines, measure, regressions
+from ops.testing import Context
+from synthetic import DeploymentSize, synthetic_state
+
+import charm
+
+SIZES = [
+    DeploymentSize(principals=1, jobs=1, dashboards=1, peers=1),
+    DeploymentSize(principals=5, jobs=10, dashboards=5, peers=2),
+    DeploymentSize(principals=20, jobs=25, dashboards=10, peers=5),
+]
+
+EVENTS = {
+    "config-changed": lambda ctx, state: ctx.on.config_changed(),
+    "cos-agent-relation-changed": lambda ctx, state: ctx.on.relation_changed(
+        state.get_relations("cos-agent")[0], remote_unit=0
+    ),
+    "peers-relation-changed": lambda ctx, state: ctx.on.relation_changed(
+        state.get_relations("peers")[0], remote_unit=1
+    ),
+    "upgrade-charm": lambda ctx, state: ctx.on.upgrade_charm(),
+    "update-status": lambda ctx, state: ctx.on.update_status(),
+}
+
+
+@pytest.mark.parametrize("event", EVENTS)
+@pytest.mark.parametrize("size", SIZES, ids=lambda size: size.id)
+def test_hook_latency(size, event, record):
+    # GIVEN a synthetic deployment of the given size
+    ctx = Context(charm_type=charm.GrafanaAgentMachineCharm)
+    state = synthetic_state(size)
+
+    # WHEN the hook is dispatched
+    measurement = measure(lambda: ctx.run(EVENTS[event](ctx, state), state))
+    key = f"{event}[{size.id}]"
+    record(key, measurement)
+
+    # THEN it is not slower, hungrier or chattier than the stored baseline
+    if not UPDATE_BASELINES:
+        found = regressions(measurement, load_baselines().get(key))
+        assert not found, f"{key} regressed: {'; '.join(found)}"
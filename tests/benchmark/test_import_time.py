@@ -0,0 +1,39 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Cold import time of the charm, which every hook pays before doing anything.
+
+Run with `tox -e benchmark`; the slowest packages to import are listed in the summary.
+"""
+
+from importtime import measure_import
+from measure import UPDATE_BASELINES, WALL_TIME_TOLERANCE, load_baselines
+
+# Only needed by some hooks, so imported when first used rather than with the charm.
+LAZY_MODULES = [
+    "cryptography",
+    "cProfile",
+    "charms.tls_certificates_interface.v2.tls_certificates",
+    "charms.observability_libs.v0.cert_handler",
+    "charms.loki_k8s.v1.loki_push_api",
+    "charms.grafana_k8s.v0.grafana_dashboard",
+    "charms.prometheus_k8s.v1.prometheus_remote_write",
+    "charms.grafana_cloud_integrator.v0.cloud_config_requirer",
+    "charms.certificate_transfer_interface.v1.certificate_transfer",
+]
+
+
+def test_charm_import_time(record_import):
+    # WHEN the charm is imported from a fresh interpreter, as on every dispatch
+    import_time = measure_import("charm")
+    record_import("import[charm]", import_time)
+
+    # THEN the modules only some hooks need are left out
+    assert not [module for module in LAZY_MODULES if module in import_time.modules]
+
+    # AND it is not slower than the stored baseline
+    baseline = load_baselines().get("import[charm]")
+    if baseline and not UPDATE_BASELINES:
+        limit = baseline["import_time"] * (1 + WALL_TIME_TOLERANCE)
+        assert import_time.total <= limit, (
+            f"import[charm] regressed: {import_time.total}us > {baseline['import_time']}us"
+        )
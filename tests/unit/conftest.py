@@ -25,6 +25,13 @@ def mock_snap():
         yield
 
 
+@pytest.fixture(autouse=True)
+def mock_reload():
+    """Mock the agent's reload endpoint so we don't access the host."""
+    with patch("charm.GrafanaAgentMachineCharm._reload_config") as mock:
+        yield mock
+
+
 @pytest.fixture(autouse=True)
 def mock_refresh():
     """Mock the refresh call so we don't access the host."""
@@ -32,6 +39,13 @@ def mock_refresh():
         yield
 
 
+@pytest.fixture(autouse=True)
+def mock_snap_connections():
+    """Mock the snap plug connections so we don't access the host."""
+    with patch("snap_management.SnapHandle.connect_all", return_value={}) as mock:
+        yield mock
+
+
 CONFIG_MATRIX = [
     {"classic_snap": True},
     {"classic_snap": False},
@@ -1,5 +1,6 @@
 # Copyright 2023 Canonical Ltd.
 # See LICENSE file for licensing details.
+from pathlib import Path
 from unittest.mock import MagicMock
 
 
@@ -13,3 +14,9 @@ def set_run_out(mock_run, returncode: int = 0, stdout: str = "", stderr: str = "
         }
     )
     mock_run.return_value = mock_stdout
+
+
+def charm_root(path: Path) -> Path:
+    """A charm root in `path`, with the charm's sources, that a charm can write to."""
+    (path / "src").symlink_to(Path(__file__).parents[2] / "src")
+    return path
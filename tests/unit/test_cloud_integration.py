@@ -1,9 +1,10 @@
 import tempfile
 import unittest
 from pathlib import Path
-from unittest.mock import patch
+from unittest.mock import PropertyMock, patch
 
 import yaml
+from helpers import charm_root
 from ops import ActiveStatus, BlockedStatus
 from ops.testing import Harness
 
@@ -34,6 +35,16 @@ class TestUpdateStatus(unittest.TestCase):
         self.mock_verify_snap_track = patcher.start()
         self.addCleanup(patcher.stop)
 
+        # otherwise will write the rules and dashboards into the source tree
+        patcher = patch.object(
+            GrafanaAgentCharm,
+            "charm_dir",
+            new_callable=PropertyMock,
+            return_value=charm_root(Path(tempfile.mkdtemp())),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
     def test_prometheus_remote_write_config_with_grafana_cloud_integrator(self):
         """Asserts that the prometheus remote write config is written correctly for leaders and non-leaders."""
         for leader in (True, False):
@@ -42,10 +53,13 @@ class TestUpdateStatus(unittest.TestCase):
                 harness.set_model_name(self.__class__.__name__)
                 harness.set_leader(True)
                 harness.begin_with_initial_hooks()
+                # Event handlers only mark work; it runs when the status is collected.
+                harness.evaluate_status()
 
                 # WHEN an incoming relation is added
                 rel_id = harness.add_relation("juju-info", "grafana-agent")
                 harness.add_relation_unit(rel_id, "grafana-agent/0")
+                harness.evaluate_status()
 
                 # THEN the charm goes into blocked status
                 assert isinstance(harness.charm.unit.status, BlockedStatus)
@@ -56,6 +70,7 @@ class TestUpdateStatus(unittest.TestCase):
                     "grafana-cloud-integrator",
                     app_data={"prometheus_url": "http://some.domain.name:9090/api/v1/write"},
                 )
+                harness.evaluate_status()
 
                 # THEN the charm goes into active status
                 assert isinstance(harness.charm.unit.status, ActiveStatus)
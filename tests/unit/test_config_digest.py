@@ -0,0 +1,90 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+import dataclasses
+import hashlib
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+import yaml
+from ops.testing import Context, PeerRelation, State
+
+import charm
+
+
+@pytest.fixture(autouse=True)
+def patch_all(placeholder_cfg_path):
+    with patch("grafana_agent.CONFIG_PATH", placeholder_cfg_path), patch(
+        "charm.GrafanaAgentMachineCharm.is_ready", True
+    ), patch("charm.GrafanaAgentMachineCharm._verify_snap_track"):
+        yield
+
+
+@pytest.fixture
+def digest_path(placeholder_cfg_path):
+    return Path(f"{placeholder_cfg_path}.sha256")
+
+
+@pytest.fixture
+def restart():
+    with patch("charm.GrafanaAgentMachineCharm.restart") as mock:
+        yield mock
+
+
+def _sha256(path: Path) -> str:
+    return hashlib.sha256(path.read_text().encode()).hexdigest()
+
+
+def test_digest_is_written_next_to_the_config(placeholder_cfg_path, digest_path):
+    # WHEN the config is written
+    ctx = Context(charm_type=charm.GrafanaAgentMachineCharm)
+    ctx.run(ctx.on.config_changed(), State(relations=[PeerRelation("peers")]))
+
+    # THEN its digest is stored next to it
+    assert digest_path.read_text() == _sha256(placeholder_cfg_path)
+
+
+def test_unchanged_config_is_detected_without_parsing(restart, mock_reload):
+    # GIVEN a config that has already been written along with its digest
+    ctx = Context(charm_type=charm.GrafanaAgentMachineCharm)
+    state = ctx.run(ctx.on.config_changed(), State(relations=[PeerRelation("peers")]))
+    restart.reset_mock()
+
+    # WHEN the config is rendered again without any change
+    ctx.run(ctx.on.config_changed(), state)
+
+    # THEN the old config is not parsed, and the agent is left alone
+    assert not any("comparing against the parsed config" in log.message for log in ctx.juju_log)
+    restart.assert_not_called()
+    mock_reload.assert_not_called()
+
+
+def test_missing_digest_falls_back_to_parsing(placeholder_cfg_path, digest_path, restart):
+    # GIVEN a config written without a digest (e.g. by an older charm revision)
+    ctx = Context(charm_type=charm.GrafanaAgentMachineCharm)
+    state = ctx.run(ctx.on.config_changed(), State(relations=[PeerRelation("peers")]))
+    digest_path.unlink()
+    restart.reset_mock()
+
+    # WHEN the config is rendered again without any change
+    ctx.run(ctx.on.config_changed(), state)
+
+    # THEN the old config is parsed, found unchanged, and the digest is restored
+    assert any("comparing against the parsed config" in log.message for log in ctx.juju_log)
+    restart.assert_not_called()
+    assert digest_path.read_text() == _sha256(placeholder_cfg_path)
+
+
+def test_stale_digest_is_not_trusted(placeholder_cfg_path, digest_path, mock_reload):
+    # GIVEN a config file that was modified after its digest was written
+    ctx = Context(charm_type=charm.GrafanaAgentMachineCharm)
+    state = ctx.run(ctx.on.config_changed(), State(relations=[PeerRelation("peers")]))
+    placeholder_cfg_path.write_text(yaml.dump({"server": {"log_level": "info"}}))
+
+    # WHEN the config is rendered again
+    ctx.run(ctx.on.config_changed(), dataclasses.replace(state))
+
+    # THEN the config is rewritten and re-applied
+    assert "integrations" in yaml.safe_load(placeholder_cfg_path.read_text())
+    assert digest_path.read_text() == _sha256(placeholder_cfg_path)
+    mock_reload.assert_called_once()
@@ -0,0 +1,155 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+import dataclasses
+from unittest.mock import patch
+
+import pytest
+from ops.testing import ActiveStatus, Context, PeerRelation, Relation, State, SubordinateRelation
+
+import charm
+from grafana_agent import GrafanaAgentReloadError
+
+
+@pytest.fixture(autouse=True)
+def patch_all(placeholder_cfg_path):
+    with patch("grafana_agent.CONFIG_PATH", placeholder_cfg_path), patch(
+        "charm.GrafanaAgentMachineCharm.is_ready", True
+    ), patch("charm.GrafanaAgentMachineCharm._verify_snap_track"):
+        yield
+
+
+@pytest.fixture
+def restart():
+    with patch("charm.GrafanaAgentMachineCharm.restart") as mock:
+        yield mock
+
+
+def _first_run(ctx):
+    return ctx.run(ctx.on.config_changed(), State(relations=[PeerRelation("peers")]))
+
+
+def test_first_config_write_restarts(restart, mock_reload):
+    # GIVEN no config has been applied yet
+    ctx = Context(charm_type=charm.GrafanaAgentMachineCharm)
+
+    # WHEN the config is written for the first time
+    _first_run(ctx)
+
+    # THEN the agent is restarted rather than reloaded
+    restart.assert_called_once()
+    mock_reload.assert_not_called()
+
+
+def test_reloadable_change_reloads(restart, mock_reload):
+    # GIVEN an agent that has already been (re)started with the current server settings
+    ctx = Context(charm_type=charm.GrafanaAgentMachineCharm)
+    state = _first_run(ctx)
+    restart.reset_mock()
+
+    # WHEN a config option that can be hot-reloaded changes
+    ctx.run(
+        ctx.on.config_changed(),
+        dataclasses.replace(state, config={"global_scrape_interval": "2m"}),
+    )
+
+    # THEN the agent config is reloaded without a restart
+    mock_reload.assert_called_once()
+    restart.assert_not_called()
+    assert any("reloaded grafana-agent" in log.message for log in ctx.juju_log)
+
+
+def test_server_change_restarts(restart, mock_reload):
+    # GIVEN an agent that has already been (re)started with the current server settings
+    ctx = Context(charm_type=charm.GrafanaAgentMachineCharm)
+    state = _first_run(ctx)
+    restart.reset_mock()
+
+    # WHEN a server setting changes
+    ctx.run(ctx.on.config_changed(), dataclasses.replace(state, config={"log_level": "debug"}))
+
+    # THEN the agent is restarted
+    restart.assert_called_once()
+    mock_reload.assert_not_called()
+
+
+def test_failed_reload_falls_back_to_restart(restart, mock_reload):
+    # GIVEN an agent whose reload endpoint is not reachable
+    mock_reload.side_effect = GrafanaAgentReloadError("could not reload configuration: boom")
+    ctx = Context(charm_type=charm.GrafanaAgentMachineCharm)
+    state = _first_run(ctx)
+    restart.reset_mock()
+
+    # WHEN a config option that can be hot-reloaded changes
+    ctx.run(
+        ctx.on.config_changed(),
+        dataclasses.replace(state, config={"global_scrape_interval": "2m"}),
+    )
+
+    # THEN the agent is restarted instead
+    mock_reload.assert_called_once()
+    restart.assert_called_once()
+
+
+def test_changes_within_apply_window_are_held_back(restart, mock_reload):
+    # GIVEN a charm configured to apply config changes at most once a minute
+    ctx = Context(charm_type=charm.GrafanaAgentMachineCharm)
+    with patch("grafana_agent.time.time", return_value=1000.0):
+        state = ctx.run(
+            ctx.on.config_changed(),
+            State(relations=[PeerRelation("peers")], config={"config_apply_window": 60}),
+        )
+    restart.assert_called_once()
+
+    # WHEN the config changes again within the window
+    with patch("grafana_agent.time.time", return_value=1010.0):
+        state = ctx.run(
+            ctx.on.config_changed(),
+            dataclasses.replace(
+                state, config={"config_apply_window": 60, "global_scrape_interval": "2m"}
+            ),
+        )
+
+    # THEN the change is not applied yet
+    mock_reload.assert_not_called()
+    restart.assert_called_once()
+
+    # AND it is applied by update-status once the window has elapsed
+    with patch("grafana_agent.time.time", return_value=1100.0):
+        ctx.run(ctx.on.update_status(), state)
+    mock_reload.assert_called_once()
+    restart.assert_called_once()
+
+
+def test_held_back_change_is_reported_in_the_status(restart, mock_reload):
+    # GIVEN an active charm configured to apply config changes at most once a minute
+    ctx = Context(charm_type=charm.GrafanaAgentMachineCharm)
+    relations = [
+        SubordinateRelation("juju-info"),
+        Relation("send-remote-write"),
+        PeerRelation("peers"),
+    ]
+    with patch("grafana_agent.time.time", return_value=1000.0):
+        state = ctx.run(
+            ctx.on.config_changed(),
+            State(relations=relations, config={"config_apply_window": 60}),
+        )
+    assert isinstance(state.unit_status, ActiveStatus)
+    assert "pending" not in state.unit_status.message
+
+    # WHEN the config changes again within the window
+    with patch("grafana_agent.time.time", return_value=1010.0):
+        state = ctx.run(
+            ctx.on.config_changed(),
+            dataclasses.replace(
+                state, config={"config_apply_window": 60, "global_scrape_interval": "2m"}
+            ),
+        )
+
+    # THEN the status says a change is pending
+    assert isinstance(state.unit_status, ActiveStatus)
+    assert "config change pending" in state.unit_status.message
+
+    # AND the message is cleared once update-status applies it
+    with patch("grafana_agent.time.time", return_value=1100.0):
+        state = ctx.run(ctx.on.update_status(), state)
+    assert "pending" not in state.unit_status.message
@@ -0,0 +1,69 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+import json
+from unittest.mock import patch
+
+import pytest
+import yaml
+from charms.grafana_agent.v0.cos_agent import CosAgentProviderUnitData
+from ops.testing import Context, PeerRelation, Relation, State, SubordinateRelation
+
+import charm
+
+
+@pytest.fixture(autouse=True)
+def patch_all(placeholder_cfg_path):
+    with patch("grafana_agent.CONFIG_PATH", placeholder_cfg_path), patch(
+        "charm.GrafanaAgentMachineCharm.is_ready", True
+    ):
+        yield
+
+
+def _cos_agent_relation(scrape_port: int) -> SubordinateRelation:
+    data = CosAgentProviderUnitData(
+        metrics_alert_rules={},
+        log_alert_rules={},
+        dashboards=[],
+        metrics_scrape_jobs=[
+            {
+                "job_name": "principal_default",
+                "static_configs": [{"targets": [f"localhost:{scrape_port}"]}],
+            }
+        ],
+        log_slots=[],
+    )
+    return SubordinateRelation(
+        "cos-agent", remote_app_name="principal", remote_unit_data={data.KEY: data.json()}
+    )
+
+
+def test_remote_write_endpoints_are_looked_up_once_per_render():
+    # GIVEN a charm with a remote-write endpoint
+    ctx = Context(charm_type=charm.GrafanaAgentMachineCharm)
+    remote_write = Relation(
+        "send-remote-write",
+        remote_units_data={
+            0: {"remote_write": json.dumps({"url": "http://prometheus:9090/api/v1/write"})}
+        },
+    )
+    state = State(relations=[_cos_agent_relation(8080), remote_write, PeerRelation("peers")])
+
+    # WHEN the config is generated
+    with ctx(ctx.on.update_status(), state) as mgr:
+        with patch.object(
+            mgr.charm,
+            "_prometheus_endpoints_with_tls",
+            wraps=mgr.charm._prometheus_endpoints_with_tls,
+        ) as lookup:
+            config = mgr.charm._generate_config()
+        mgr.run()
+
+    # THEN the endpoints are looked up once, for both sections they appear in
+    lookup.assert_called_once()
+    integrations_rw = config["integrations"]["prometheus_remote_write"]
+    metrics_rw = config["metrics"]["configs"][0]["remote_write"]
+    assert integrations_rw
+    assert integrations_rw == metrics_rw
+    # AND each section holds its own copy, so that the config is dumped without YAML anchors
+    assert integrations_rw is not metrics_rw
+    assert "&id" not in yaml.dump(config)
@@ -7,12 +7,16 @@ import pytest
 from charms.grafana_agent.v0.cos_agent import (
     CosAgentPeersUnitData,
     COSAgentProvider,
+    CosAgentProviderUnitData,
     COSAgentRequirer,
     _dict_hash_except_key,
+    decode_dashboard,
+    encode_dashboard,
 )
 from cosl.rules import generic_alert_groups
 from ops.charm import CharmBase
 from ops.framework import Framework
+from ops.model import RelationDataContent
 from ops.testing import Context, PeerRelation, State, SubordinateRelation
 
 PROVIDER_NAME = "mock-principal"
@@ -146,7 +150,7 @@ def test_cos_agent_renders_job_name_for_scrape_configs():
                         "static_configs": [{"targets": ["bar:8008"]}],
                         "scheme": "http",
                         "job_name": "bar-job",
-                    }
+                    },
                 ],
             )
 
@@ -300,6 +304,10 @@ def test_subordinate_update():
     assert "localhost:4317" in urls
     assert "http://localhost:4318" in urls
 
+    # and the codecs it can decode dashboards with, always including the original one
+    requirer_data = state_out1.get_relations("cos-agent")[0].local_unit_data
+    assert "lzma" in json.loads(requirer_data["dashboard_codecs"])
+
 
 def test_cos_agent_wrong_rel_data():
     # Step 1: principal charm is deployed and ends in "unknown" state
@@ -316,3 +324,207 @@ def test_cos_agent_wrong_rel_data():
         log.level == "ERROR" and "Invalid relation data provided:" in log.message
         for log in provider_ctx.juju_log
     )
+
+
+@pytest.mark.parametrize(
+    "requirer_data, codec",
+    [
+        # an older requirer, advertising no codec
+        ({}, "lzma"),
+        ({"receivers": "[]", "dashboard_codecs": '["zlib", "lzma"]'}, "zlib"),
+        ({"receivers": "[]", "dashboard_codecs": '["unknown"]'}, "lzma"),
+    ],
+)
+def test_cos_agent_negotiates_dashboard_codec(tmp_path, requirer_data, codec):
+    # GIVEN a principal with a dashboard to forward
+    (tmp_path / "dashboards").mkdir()
+    (tmp_path / "dashboards" / "dashboard.json").write_text(GRAFANA_DASH)
+
+    class DashboardsProvider(CharmBase):
+        def __init__(self, framework: Framework):
+            super().__init__(framework)
+            self.gagent = COSAgentProvider(
+                self, dashboard_dirs=[str(self.charm_dir / "dashboards")]
+            )
+
+    # AND a requirer advertising the codecs it can decode dashboards with, if any
+    provider_ctx = Context(charm_type=DashboardsProvider, meta=PROVIDER_META, charm_root=tmp_path)
+    cos_agent = SubordinateRelation("cos-agent", remote_unit_data=requirer_data)
+
+    # WHEN the relation_changed event fires
+    state_out = provider_ctx.run(
+        provider_ctx.on.relation_changed(relation=cos_agent, remote_unit=1),
+        State(relations=[cos_agent]),
+    )
+
+    # THEN the dashboard is encoded with the fastest codec both sides support
+    config = json.loads(
+        state_out.get_relation(cos_agent.id).local_unit_data[CosAgentPeersUnitData.KEY]
+    )
+    (dashboard,) = config["dashboards"]
+    assert dashboard.startswith("zlib:") == (codec == "zlib")
+    # AND it decodes to the original dashboard
+    assert json.loads(decode_dashboard(dashboard))["title"] == "foo"
+
+
+@pytest.mark.parametrize(
+    "peer_data, codec",
+    [
+        # a peer running an older version of the library, advertising no codec
+        ({}, "lzma"),
+        ({"dashboard_codecs": '["zlib", "lzma"]'}, "zlib"),
+    ],
+)
+def test_peer_dashboards_are_kept_decodable_by_every_peer(peer_data, codec):
+    # GIVEN a principal forwarding a dashboard encoded with zlib
+    provider_data = CosAgentProviderUnitData(
+        metrics_alert_rules={},
+        log_alert_rules={},
+        dashboards=[encode_dashboard(GRAFANA_DASH, "zlib")],
+        metrics_scrape_jobs=[],
+        log_slots=[],
+    )
+    cos_agent = SubordinateRelation(
+        "cos-agent",
+        remote_app_name=PROVIDER_NAME,
+        remote_unit_data={provider_data.KEY: provider_data.json()},
+    )
+    # AND a peer advertising the codecs it can decode dashboards with, if any
+    peer = PeerRelation("peers", peers_data={1: peer_data})
+    requirer_ctx = Context(charm_type=SubordinateRequirer, meta=REQUIRER_META)
+
+    # WHEN the relation_changed event fires
+    state_out = requirer_ctx.run(
+        requirer_ctx.on.relation_changed(relation=cos_agent, remote_unit=0),
+        State(relations=[cos_agent, peer]),
+    )
+
+    # THEN the dashboard is forwarded with a codec every peer can decode
+    peer_out = state_out.get_relation(peer.id).local_unit_data
+    forwarded = json.loads(peer_out[f"{CosAgentPeersUnitData.KEY}-{PROVIDER_NAME}/0"])
+    (dashboard,) = forwarded["dashboards"]
+    assert dashboard.startswith("zlib:") == (codec == "zlib")
+    assert json.loads(decode_dashboard(dashboard))["title"] == "foo"
+    # AND this unit advertises the codecs it can decode
+    assert "zlib" in json.loads(peer_out["dashboard_codecs"])
+
+
+def test_peer_dashboards_are_reencoded_when_an_older_peer_joins():
+    # GIVEN a unit that forwarded a zlib dashboard while every peer could decode it
+    forwarded = CosAgentPeersUnitData(
+        unit_name=f"{PROVIDER_NAME}/0",
+        relation_id="1",
+        relation_name="cos-agent",
+        metrics_alert_rules={},
+        log_alert_rules={},
+        dashboards=[encode_dashboard(GRAFANA_DASH, "zlib")],
+    )
+    peer_key = f"{CosAgentPeersUnitData.KEY}-{PROVIDER_NAME}/0"
+    # AND a peer running an older version of the library, advertising no codec
+    peer = PeerRelation("peers", local_unit_data={peer_key: forwarded.json()}, peers_data={1: {}})
+    requirer_ctx = Context(charm_type=SubordinateRequirer, meta=REQUIRER_META)
+
+    # WHEN the peer relation changes
+    state_out = requirer_ctx.run(
+        requirer_ctx.on.relation_changed(relation=peer, remote_unit=1), State(relations=[peer])
+    )
+
+    # THEN the forwarded dashboard is re-encoded with the codec older versions decode
+    peer_out = state_out.get_relation(peer.id).local_unit_data
+    (dashboard,) = json.loads(peer_out[peer_key])["dashboards"]
+    assert not dashboard.startswith("zlib:")
+    assert json.loads(decode_dashboard(dashboard))["title"] == "foo"
+
+
+def test_peer_dashboards_are_reencoded_when_every_peer_decodes_a_faster_codec():
+    # GIVEN a principal forwarding a dashboard encoded with zlib
+    provider_data = CosAgentProviderUnitData(
+        metrics_alert_rules={},
+        log_alert_rules={},
+        dashboards=[encode_dashboard(GRAFANA_DASH, "zlib")],
+        metrics_scrape_jobs=[],
+        log_slots=[],
+    )
+    cos_agent = SubordinateRelation(
+        "cos-agent",
+        remote_app_name=PROVIDER_NAME,
+        remote_unit_data={provider_data.KEY: provider_data.json()},
+    )
+    # AND a unit that re-encoded it with the default codec while an older peer was around
+    forwarded = CosAgentPeersUnitData(
+        unit_name=f"{PROVIDER_NAME}/0",
+        relation_id=str(cos_agent.id),
+        relation_name="cos-agent",
+        metrics_alert_rules={},
+        log_alert_rules={},
+        dashboards=[encode_dashboard(GRAFANA_DASH, "lzma")],
+    )
+    peer_key = f"{CosAgentPeersUnitData.KEY}-{PROVIDER_NAME}/0"
+    # AND that peer, upgraded, now advertising zlib
+    peer = PeerRelation(
+        "peers",
+        local_unit_data={peer_key: forwarded.json()},
+        peers_data={1: {"dashboard_codecs": '["zlib", "lzma"]'}},
+    )
+    requirer_ctx = Context(charm_type=SubordinateRequirer, meta=REQUIRER_META)
+
+    # WHEN the peer relation changes
+    state_out = requirer_ctx.run(
+        requirer_ctx.on.relation_changed(relation=peer, remote_unit=1),
+        State(relations=[cos_agent, peer]),
+    )
+
+    # THEN the forwarded dashboard is restored in the codec the principal used
+    peer_out = state_out.get_relation(peer.id).local_unit_data
+    (dashboard,) = json.loads(peer_out[peer_key])["dashboards"]
+    assert dashboard.startswith("zlib:")
+    assert json.loads(decode_dashboard(dashboard))["title"] == "foo"
+
+
+def test_cos_agent_provider_data_is_parsed_once_per_dispatch():
+    # GIVEN a principal providing scrape jobs, log slots and tracing protocols
+    provider_data = CosAgentProviderUnitData(
+        metrics_alert_rules={},
+        log_alert_rules={},
+        dashboards=[],
+        metrics_scrape_jobs=[{"job_name": "job", "static_configs": [{"targets": ["a:1"]}]}],
+        log_slots=["charmed-kafka:logs"],
+        tracing_protocols=["otlp_http"],
+    )
+    cos_agent = SubordinateRelation(
+        "cos-agent", remote_unit_data={provider_data.KEY: provider_data.json()}
+    )
+    requirer_ctx = Context(charm_type=SubordinateRequirer, meta=REQUIRER_META)
+
+    # WHEN all the accessors of the principal's data are used, some of them repeatedly
+    with patch(
+        "charms.grafana_agent.v0.cos_agent.CosAgentProviderUnitData",
+        side_effect=CosAgentProviderUnitData,
+        KEY=CosAgentProviderUnitData.KEY,
+    ) as parse:
+        with requirer_ctx(requirer_ctx.on.update_status(), State(relations=[cos_agent])) as mgr:
+            mgr.run()
+            requirer = mgr.charm.gagent
+            jobs = requirer.metrics_jobs
+            assert requirer.metrics_jobs == jobs
+            assert len(requirer.snap_log_endpoints) == 1
+            assert len(requirer.snap_log_endpoints_with_topology) == 1
+            assert requirer.requested_tracing_protocols() == {"otlp_http"}
+
+    # THEN the data is only parsed once
+    assert parse.call_count == 1
+
+
+def test_unchanged_tracing_receivers_are_not_rewritten():
+    # GIVEN a subordinate that already advertised its tracing receivers
+    requirer_ctx = Context(charm_type=SubordinateRequirer, meta=REQUIRER_META)
+    state = State(relations=[SubordinateRelation("cos-agent"), PeerRelation("peers")])
+    with requirer_ctx(requirer_ctx.on.update_status(), state) as mgr:
+        mgr.charm.gagent.update_tracing_receivers()
+
+        # WHEN they are updated again, with nothing changed
+        with patch.object(RelationDataContent, "_commit") as commit:
+            mgr.charm.gagent.update_tracing_receivers()
+
+        # THEN the databag is not written to
+        commit.assert_not_called()
@@ -0,0 +1,148 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+import dataclasses
+import json
+from unittest.mock import patch
+
+from charms.grafana_k8s.v0.grafana_dashboard import CharmedDashboard, GrafanaDashboardProvider
+from ops.charm import CharmBase
+from ops.framework import Framework
+from ops.testing import Context, Relation, State
+
+import dashboard_cache
+from dashboard_cache import CachedDashboardProvider, compressed_dashboards, precompress
+
+
+def write_dashboard(path, uid):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"uid": uid, "title": uid}))
+
+
+def test_dashboards_are_compressed_like_the_library_does(tmp_path):
+    # GIVEN a dashboards directory
+    write_dashboard(tmp_path / "grafana_dashboards" / "a.json", "a")
+
+    # WHEN the dashboards are compressed
+    dashboards = compressed_dashboards(tmp_path / "grafana_dashboards", tmp_path, "charm")
+
+    # THEN they are the same as those the dashboards library would have produced
+    expected = CharmedDashboard.load_dashboards_from_dir(
+        dashboards_path=tmp_path / "grafana_dashboards",
+        charm_name="charm",
+        charm_dir=tmp_path,
+        inject_dropdowns=True,
+        juju_topology={},
+    )
+    assert {key: content for key, (_, content) in dashboards.items()} == {
+        key: obj["content"] for key, obj in expected.items()
+    }
+
+
+def test_unchanged_dashboards_are_not_recompressed(tmp_path):
+    # GIVEN dashboards that were compressed before
+    write_dashboard(tmp_path / "grafana_dashboards" / "a.json", "a")
+    write_dashboard(tmp_path / "grafana_dashboards" / "b.json", "b")
+    compressed_dashboards(tmp_path / "grafana_dashboards", tmp_path, "charm")
+
+    # WHEN one of them changes and they are compressed again
+    write_dashboard(tmp_path / "grafana_dashboards" / "b.json", "b2")
+    with patch.object(
+        dashboard_cache, "_compress", wraps=dashboard_cache._compress
+    ) as compress:
+        compressed_dashboards(tmp_path / "grafana_dashboards", tmp_path, "charm")
+
+    # THEN only the changed one is compressed
+    assert [call.args[1].name for call in compress.call_args_list] == ["b.json"]
+
+
+def test_precompressed_builtin_dashboards_are_used(tmp_path):
+    # GIVEN builtin dashboards precompressed at build time
+    write_dashboard(tmp_path / "src" / "grafana_dashboards" / "a.json", "a")
+    assert precompress(tmp_path, "charm", "src/grafana_dashboards", "grafana_dashboards") == 1
+
+    # WHEN they are loaded from where the charm puts them at runtime
+    write_dashboard(tmp_path / "grafana_dashboards" / "a.json", "a")
+    with patch.object(dashboard_cache, "_compress") as compress:
+        dashboards = compressed_dashboards(tmp_path / "grafana_dashboards", tmp_path, "charm")
+
+    # THEN none of them is compressed at runtime
+    compress.assert_not_called()
+    assert list(dashboards) == ["file:a"]
+
+
+class ProviderCharm(CharmBase):
+    META = {
+        "name": "provider",
+        "provides": {"grafana-dashboards-provider": {"interface": "grafana_dashboard"}},
+    }
+
+    def __init__(self, framework: Framework):
+        super().__init__(framework)
+        self.provider = CachedDashboardProvider(
+            self,
+            relation_name="grafana-dashboards-provider",
+            dashboards_path="grafana_dashboards",
+        )
+
+
+def test_relations_are_only_rewritten_when_dashboards_change(tmp_path):
+    # GIVEN a leader that already sent its dashboards to grafana
+    write_dashboard(tmp_path / "grafana_dashboards" / "a.json", "a")
+    ctx = Context(charm_type=ProviderCharm, meta=ProviderCharm.META, charm_root=tmp_path)
+    grafana = Relation("grafana-dashboards-provider")
+    state = ctx.run(ctx.on.config_changed(), State(leader=True, relations=[grafana]))
+    sent = json.loads(state.get_relation(grafana.id).local_app_data["dashboards"])
+
+    # WHEN the dashboards are updated again without any change
+    with patch.object(GrafanaDashboardProvider, "_upset_dashboards_on_relation") as upset:
+        state = ctx.run(ctx.on.config_changed(), state)
+
+    # THEN the relation is neither compared nor rewritten
+    upset.assert_not_called()
+    assert json.loads(state.get_relation(grafana.id).local_app_data["dashboards"]) == sent
+
+    # AND WHEN a dashboard changes
+    write_dashboard(tmp_path / "grafana_dashboards" / "a.json", "a2")
+    state = ctx.run(ctx.on.config_changed(), state)
+
+    # THEN the relation is updated with it
+    templates = json.loads(state.get_relation(grafana.id).local_app_data["dashboards"])
+    assert templates["templates"] != sent["templates"]
+
+
+def test_relations_are_compared_again_when_leadership_is_regained(tmp_path):
+    # GIVEN a unit that sent its dashboards to grafana while it was the leader
+    write_dashboard(tmp_path / "grafana_dashboards" / "a.json", "a")
+    ctx = Context(charm_type=ProviderCharm, meta=ProviderCharm.META, charm_root=tmp_path)
+    grafana = Relation("grafana-dashboards-provider")
+    state = ctx.run(ctx.on.config_changed(), State(leader=True, relations=[grafana]))
+    sent = state.get_relation(grafana.id).local_app_data["dashboards"]
+    # AND another leader wrote other dashboards to the relation since
+    grafana = dataclasses.replace(
+        state.get_relation(grafana.id),
+        local_app_data={"dashboards": json.dumps({"templates": {}, "uuid": "other"})},
+    )
+    state = dataclasses.replace(state, relations=[grafana])
+
+    # WHEN the unit is elected leader again
+    state = ctx.run(ctx.on.leader_elected(), state)
+
+    # THEN its dashboards are written to the relation again
+    assert state.get_relation(grafana.id).local_app_data["dashboards"] == sent
+
+
+def test_stored_state_holds_no_dashboard_content(tmp_path):
+    # GIVEN a dashboard file
+    write_dashboard(tmp_path / "grafana_dashboards" / "a.json", "a")
+    ctx = Context(charm_type=ProviderCharm, meta=ProviderCharm.META, charm_root=tmp_path)
+    grafana = Relation("grafana-dashboards-provider")
+
+    # WHEN the leader sends it to grafana
+    with ctx(ctx.on.config_changed(), State(leader=True, relations=[grafana])) as mgr:
+        state = mgr.run()
+        stored = dict(mgr.charm.provider._stored.dashboard_templates)
+
+    # THEN its content is sent over the relation, but not kept in the stored state
+    sent = json.loads(state.get_relation(grafana.id).local_app_data["dashboards"])
+    assert sent["templates"]["file:a"]["content"]
+    assert "content" not in stored["file:a"]
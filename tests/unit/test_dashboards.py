@@ -2,11 +2,13 @@
 # See LICENSE file for licensing details.
 
 import json
-from unittest.mock import MagicMock
+import os
+from unittest.mock import MagicMock, patch
 
 from charms.grafana_agent.v0.cos_agent import (
     CosAgentPeersUnitData,
     COSAgentRequirer,
+    minify_dashboard,
 )
 from charms.prometheus_k8s.v1.prometheus_remote_write import (
     PrometheusRemoteWriteConsumer,
@@ -208,3 +210,160 @@ def test_update_dashboards_writes_unique_files_for_no_title(tmp_path):
         assert "uid" in data
     # AND the reload function is called exactly once
     reload_func.assert_called_once()
+
+
+def test_update_dashboards_only_writes_changed_dashboards(tmp_path):
+    # GIVEN a builtin dashboard and a dashboard from a relation, already on disk
+    src = tmp_path / "src"
+    dest = tmp_path / "dest"
+    src.mkdir()
+    (src / "builtin.json").write_text('{"uid": "builtin"}')
+    dashboard = {"charm": "principal", "relation_id": "1", "title": "a", "content": {"uid": "a"}}
+    mapping = RulesMapping(src=src, dest=dest)
+    GrafanaAgentCharm.update_dashboards(MagicMock(), [dashboard], MagicMock(), mapping)
+    written = {path.name: path.stat().st_mtime_ns for path in dest.iterdir()}
+
+    # WHEN the same dashboards are updated again
+    reload_func = MagicMock()
+    GrafanaAgentCharm.update_dashboards(MagicMock(), [dashboard], reload_func, mapping)
+
+    # THEN nothing is rewritten, and nothing is reloaded
+    assert {path.name: path.stat().st_mtime_ns for path in dest.iterdir()} == written
+    reload_func.assert_not_called()
+
+    # AND the builtin dashboard is referenced in place rather than copied
+    assert os.path.samefile(src / "builtin.json", dest / "builtin.json")
+
+
+def test_update_dashboards_removes_stale_dashboards(tmp_path):
+    # GIVEN a dashboard from a relation on disk
+    src = tmp_path / "src"
+    src.mkdir()
+    mapping = RulesMapping(src=src, dest=tmp_path / "dest")
+    dashboard = {"charm": "principal", "relation_id": "1", "title": "a", "content": {"uid": "a"}}
+    GrafanaAgentCharm.update_dashboards(MagicMock(), [dashboard], MagicMock(), mapping)
+
+    # WHEN the relation no longer provides it
+    reload_func = MagicMock()
+    GrafanaAgentCharm.update_dashboards(MagicMock(), [], reload_func, mapping)
+
+    # THEN it is removed, and the dashboards are reloaded
+    assert not list(mapping.dest.iterdir())
+    reload_func.assert_called_once()
+
+
+class MyCachingRequirerCharm(MyRequirerCharm):
+    def __init__(self, framework: Framework):
+        CharmBase.__init__(self, framework)
+        self.cosagent = COSAgentRequirer(
+            self, dashboards_cache_dir=self.charm_dir / "cache", dashboards_cache_max_bytes=50
+        )
+
+
+def test_cached_dashboards_are_not_decompressed_again(tmp_path):
+    # GIVEN a requirer caching the dashboards it decoded before
+    ctx = Context(
+        charm_type=MyCachingRequirerCharm, meta=MyRequirerCharm.META, charm_root=tmp_path
+    )
+    state = _peer_state_with_dashboards([{"title": "a", "uid": "a"}])
+    with ctx(ctx.on.update_status(), state) as mgr:
+        mgr.run()
+        expected = mgr.charm.cosagent.dashboards
+
+    # WHEN the same dashboards are read again, in another hook
+    with ctx(ctx.on.update_status(), state) as mgr:
+        mgr.run()
+        with patch.object(LZMABase64, "decompress") as decompress:
+            dashboards = mgr.charm.cosagent.dashboards
+
+    # THEN they are not decompressed, and are the same as before
+    decompress.assert_not_called()
+    assert dashboards == expected
+
+
+def test_corrupted_cached_dashboards_are_decoded_again(tmp_path):
+    # GIVEN a requirer whose cached dashboard was truncated on disk
+    ctx = Context(
+        charm_type=MyCachingRequirerCharm, meta=MyRequirerCharm.META, charm_root=tmp_path
+    )
+    state = _peer_state_with_dashboards([{"title": "a", "uid": "a"}])
+    with ctx(ctx.on.update_status(), state) as mgr:
+        mgr.run()
+        expected = mgr.charm.cosagent.dashboards
+    (cached,) = (tmp_path / "cache").iterdir()
+    cached.write_text(cached.read_text()[:5])
+
+    # WHEN the dashboards are read again, in another hook
+    with ctx(ctx.on.update_status(), state) as mgr:
+        mgr.run()
+        dashboards = mgr.charm.cosagent.dashboards
+
+    # THEN the dashboard is decoded again, and the cache entry repaired
+    assert dashboards == expected
+    assert json.loads(cached.read_text())
+    assert not list((tmp_path / "cache").glob("*.tmp"))
+
+
+def test_dashboards_cache_is_bounded(tmp_path):
+    # GIVEN a requirer whose dashboards cache holds about one dashboard
+    ctx = Context(
+        charm_type=MyCachingRequirerCharm, meta=MyRequirerCharm.META, charm_root=tmp_path
+    )
+    dashboards = [{"title": f"dashboard {i}", "uid": f"uid_{i}"} for i in range(3)]
+
+    # WHEN more dashboards than it can hold are decoded
+    with ctx(ctx.on.update_status(), _peer_state_with_dashboards(dashboards)) as mgr:
+        mgr.run()
+        assert len(mgr.charm.cosagent.dashboards) == 3
+
+    # THEN the least recently used ones are evicted
+    assert len(list((tmp_path / "cache").iterdir())) == 1
+
+
+def test_minified_dashboards_keep_their_meaning():
+    # GIVEN a dashboard with null values and empty panel fields, including in a row
+    dashboard = {
+        "uid": "a",
+        "description": None,
+        "panels": [
+            {"id": 1, "title": "", "targets": [], "options": {}, "gridPos": {"h": 8, "w": None}},
+            {"id": 2, "type": "row", "panels": [{"id": 3, "links": [], "title": "b"}]},
+        ],
+    }
+
+    # WHEN it is minified
+    minified = minify_dashboard(dashboard)
+
+    # THEN the fields Grafana would default are dropped, and nothing else
+    assert json.loads(minified) == {
+        "uid": "a",
+        "panels": [
+            {"id": 1, "gridPos": {"h": 8}},
+            {"id": 2, "type": "row", "panels": [{"id": 3, "title": "b"}]},
+        ],
+    }
+    # AND it is smaller than the plain serialization
+    assert len(minified) < len(json.dumps(dashboard))
+
+
+class MyBudgetRequirerCharm(MyRequirerCharm):
+    def __init__(self, framework: Framework):
+        CharmBase.__init__(self, framework)
+        self.cosagent = COSAgentRequirer(self, dashboards_budget_bytes=300)
+
+
+def test_dashboards_over_budget_are_reported(caplog):
+    # GIVEN a requirer with a dashboards size budget, and a principal going over it
+    ctx = Context(charm_type=MyBudgetRequirerCharm, meta=MyRequirerCharm.META)
+    small = [{"title": "small", "uid": "small"}]
+    large = [{"title": f"large {i}", "uid": os.urandom(64).hex()} for i in range(3)]
+
+    # WHEN the dashboards are read
+    with ctx(ctx.on.update_status(), _peer_state_with_dashboards(small, large)) as mgr:
+        mgr.run()
+        assert len(mgr.charm.cosagent.dashboards) == 4
+
+    # THEN only the principal going over the budget is warned about
+    warnings = [r.getMessage() for r in caplog.records if r.levelname == "WARNING"]
+    assert [w for w in warnings if "over the budget" in w and "primary_1" in w]
+    assert not [w for w in warnings if "over the budget" in w and "primary_0" in w]
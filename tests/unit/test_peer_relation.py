@@ -1,10 +1,13 @@
 # Copyright 2021 Canonical Ltd.
 # See LICENSE file for licensing details.
+import dataclasses
 import json
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 
 import pytest
 from charms.grafana_agent.v0.cos_agent import (
+    COSAgentDataChanged,
+    COSAgentLogSlotsChanged,
     CosAgentPeersUnitData,
     CosAgentProviderUnitData,
     COSAgentRequirer,
@@ -42,6 +45,8 @@ def test_fetch_data_from_relation():
     obj._charm.unit = unit
 
     obj.peer_relation = relation
+    obj._peer_data_snapshot = {}
+    obj._peer_data = lambda *args: COSAgentRequirer._peer_data(obj, *args)
     data = COSAgentRequirer._gather_peer_data(obj)
     assert len(data) == 1
 
@@ -451,3 +456,110 @@ def test_cosagent_to_peer_data_app_vs_unit(leader):
     assert json.loads(peer_databag_peer_data)["dashboards"][0] == encode_as_dashboard(
         raw_dashboard_1
     )
+
+
+def test_peer_data_is_parsed_once_per_dispatch():
+    # GIVEN peer data from several principals
+    peers_data = {
+        i: {
+            f"{CosAgentPeersUnitData.KEY}-primary_{i}/0": CosAgentPeersUnitData(
+                unit_name=f"primary_{i}/0",
+                relation_id=str(i),
+                relation_name="cos-agent",
+                dashboards=[encode_as_dashboard({"title": f"title {i}"})],
+                metrics_alert_rules={"groups": []},
+                log_alert_rules={"groups": []},
+            ).json()
+        }
+        for i in range(1, 4)
+    }
+    state = State(relations=[PeerRelation("peers", peers_data=peers_data)], leader=True)
+    ctx = Context(charm_type=MyRequirerCharm, meta=MyRequirerCharm.META)
+
+    # WHEN the alerts and the dashboards are all gathered in the same dispatch
+    with patch(
+        "charms.grafana_agent.v0.cos_agent.CosAgentPeersUnitData",
+        side_effect=CosAgentPeersUnitData,
+        KEY=CosAgentPeersUnitData.KEY,
+    ) as parse:
+        with ctx(ctx.on.update_status(), state) as mgr:
+            mgr.run()
+            assert len(mgr.charm.cosagent.metrics_alerts) == 3
+            assert len(mgr.charm.cosagent.logs_alerts) == 3
+            assert len(mgr.charm.cosagent.dashboards) == 3
+
+    # THEN the data of each principal is only parsed once
+    assert parse.call_count == 3
+
+
+def test_unchanged_cosagent_data_is_not_processed_again():
+    # GIVEN a principal whose cos-agent data was already copied to peer data
+    data = CosAgentProviderUnitData(
+        metrics_alert_rules={},
+        log_alert_rules={},
+        metrics_scrape_jobs=[],
+        log_slots=[],
+        dashboards=[encode_as_dashboard({"title": "title"})],
+    )
+    cos_agent = SubordinateRelation(
+        endpoint="cos-agent",
+        remote_app_name="primary",
+        remote_unit_data={data.KEY: data.json()},
+    )
+    ctx = Context(charm_type=MyRequirerCharm, meta=MyRequirerCharm.META)
+    state_out = ctx.run(
+        ctx.on.relation_changed(relation=cos_agent, remote_unit=0),
+        State(relations=[PeerRelation("peers"), cos_agent]),
+    )
+    assert [e for e in ctx.emitted_events if isinstance(e, COSAgentDataChanged)]
+    ctx.emitted_events.clear()
+
+    # WHEN the relation changes again, with the same data
+    cos_agent = state_out.get_relation(cos_agent.id)
+    ctx.run(ctx.on.relation_changed(relation=cos_agent, remote_unit=0), state_out)
+
+    # THEN the data is not processed again
+    assert not [e for e in ctx.emitted_events if isinstance(e, COSAgentDataChanged)]
+
+    # BUT WHEN it changes with different data
+    data.log_slots = ["snap:logs"]
+    cos_agent = dataclasses.replace(cos_agent, remote_unit_data={data.KEY: data.json()})
+    state = dataclasses.replace(
+        state_out, relations=[state_out.get_relations("peers")[0], cos_agent]
+    )
+    ctx.run(ctx.on.relation_changed(relation=cos_agent, remote_unit=0), state)
+
+    # THEN it is processed
+    assert [e for e in ctx.emitted_events if isinstance(e, COSAgentDataChanged)]
+
+
+def test_only_the_changed_parts_of_cosagent_data_are_signalled():
+    # GIVEN a principal whose cos-agent data was already processed
+    data = CosAgentProviderUnitData(
+        metrics_alert_rules={},
+        log_alert_rules={},
+        metrics_scrape_jobs=[],
+        log_slots=[],
+        dashboards=[],
+    )
+    cos_agent = SubordinateRelation(
+        endpoint="cos-agent",
+        remote_app_name="primary",
+        remote_unit_data={data.KEY: data.json()},
+    )
+    ctx = Context(charm_type=MyRequirerCharm, meta=MyRequirerCharm.META)
+    state = ctx.run(
+        ctx.on.relation_changed(relation=cos_agent, remote_unit=0),
+        State(relations=[PeerRelation("peers"), cos_agent]),
+    )
+    ctx.emitted_events.clear()
+
+    # WHEN only its log slots change
+    data.log_slots = ["snap:logs"]
+    cos_agent = dataclasses.replace(cos_agent, remote_unit_data={data.KEY: data.json()})
+    state = dataclasses.replace(state, relations=[state.get_relations("peers")[0], cos_agent])
+    ctx.run(ctx.on.relation_changed(relation=cos_agent, remote_unit=0), state)
+
+    # THEN only the log slots are signalled as changed, besides the catch-all event
+    changes = [type(e) for e in ctx.emitted_events if isinstance(e, COSAgentDataChanged)]
+    assert changes == [COSAgentLogSlotsChanged, COSAgentDataChanged]
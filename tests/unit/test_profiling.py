@@ -0,0 +1,101 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+import dataclasses
+from unittest.mock import patch
+
+import pytest
+from ops.testing import ActionFailed, Context, PeerRelation, State
+
+import charm
+from profiling import HookProfiler, profile_modes, profiles_dir, summarize
+
+
+@pytest.fixture(autouse=True)
+def patch_all(placeholder_cfg_path):
+    with patch("grafana_agent.CONFIG_PATH", placeholder_cfg_path), patch(
+        "charm.GrafanaAgentMachineCharm.is_ready", True
+    ), patch("charm.GrafanaAgentMachineCharm._verify_snap_track"), patch(
+        "charm.GrafanaAgentMachineCharm.restart"
+    ):
+        yield
+
+
+@pytest.fixture
+def ctx(tmp_path):
+    return Context(charm_type=charm.GrafanaAgentMachineCharm, charm_root=tmp_path)
+
+
+def test_hooks_are_not_profiled_by_default(ctx, tmp_path):
+    # WHEN a hook runs without profiling enabled
+    ctx.run(ctx.on.config_changed(), State(relations=[PeerRelation("peers")]))
+
+    # THEN no profile is written
+    assert not profiles_dir(tmp_path).exists()
+
+
+def test_profiles_are_reported_by_the_action(ctx, tmp_path):
+    # GIVEN cpu and memory profiling are enabled
+    state = State(relations=[PeerRelation("peers")], config={"profile_hooks": "cpu,memory"})
+
+    # WHEN a hook runs
+    state = ctx.run(ctx.on.config_changed(), state)
+
+    # THEN both profiles are written for it
+    assert {path.suffix for path in profiles_dir(tmp_path).iterdir()} == {
+        ".pstats",
+        ".tracemalloc",
+    }
+
+    # AND the action reports the hottest functions and allocation sites of that hook
+    ctx.run(ctx.on.action("show-profiles", params={"hooks": 1, "top": 5}), state)
+    summary = ctx.action_results["hook-1"]  # pyright: ignore
+    assert summary["hook"] == "config-changed"
+    assert len(summary["functions"].splitlines()) == 5
+    assert len(summary["allocations"].splitlines()) == 5
+
+
+def test_environment_flag_enables_profiling(ctx, tmp_path):
+    # GIVEN the profiling environment flag is set
+    with patch.dict("os.environ", {"GRAFANA_AGENT_PROFILE": "cpu"}):
+        # WHEN a hook runs
+        ctx.run(ctx.on.update_status(), State(relations=[PeerRelation("peers")]))
+
+    # THEN only its cpu profile is written
+    assert [path.suffix for path in profiles_dir(tmp_path).iterdir()] == [".pstats"]
+
+
+def test_action_fails_without_profiles(ctx):
+    # WHEN the action runs before any hook was profiled
+    # THEN it fails
+    with pytest.raises(ActionFailed):
+        ctx.run(ctx.on.action("show-profiles"), State(relations=[PeerRelation("peers")]))
+
+
+def test_only_the_most_recent_hooks_are_kept(tmp_path):
+    # GIVEN a profiler keeping the last two hooks
+    for hook in ("install", "config-changed", "update-status"):
+        profiler = HookProfiler(tmp_path, {"cpu"}, keep=2)
+        profiler.start()
+        profiler.stop(hook)
+
+    # THEN older profiles are removed
+    assert [summary["hook"] for summary in summarize(tmp_path, hooks=5)] == [
+        "update-status",
+        "config-changed",
+    ]
+
+
+def test_unknown_profile_modes_are_ignored():
+    assert profile_modes("cpu, gpu,,memory") == {"cpu", "memory"}
+    assert profile_modes(None) == set()
+
+
+def test_enabling_profiling_profiles_the_same_hook(ctx, tmp_path):
+    # GIVEN a charm that was not profiling
+    state = ctx.run(ctx.on.config_changed(), State(relations=[PeerRelation("peers")]))
+
+    # WHEN profiling is enabled
+    ctx.run(ctx.on.config_changed(), dataclasses.replace(state, config={"profile_hooks": "cpu"}))
+
+    # THEN the config-changed hook that enabled it is profiled already
+    assert [s["hook"] for s in summarize(profiles_dir(tmp_path))] == ["config-changed"]
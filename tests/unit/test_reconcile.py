@@ -0,0 +1,91 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+import dataclasses
+from unittest.mock import patch
+
+import pytest
+from charms.grafana_agent.v0.cos_agent import CosAgentProviderUnitData
+from cosl import LZMABase64
+from ops.testing import Context, PeerRelation, State, SubordinateRelation
+
+import charm
+
+
+@pytest.fixture(autouse=True)
+def patch_all(placeholder_cfg_path):
+    with patch("grafana_agent.CONFIG_PATH", placeholder_cfg_path), patch(
+        "charm.GrafanaAgentMachineCharm.is_ready", True
+    ), patch("charm.GrafanaAgentMachineCharm._verify_snap_track") as verify_snap_track:
+        yield verify_snap_track
+
+
+def test_work_runs_once_per_dispatch(patch_all):
+    # GIVEN a charm related to a principal over cos-agent
+    cos_agent = SubordinateRelation("cos-agent", remote_app_name="principal")
+    state = State(relations=[cos_agent, PeerRelation("peers")])
+    ctx = Context(charm_type=charm.GrafanaAgentMachineCharm)
+
+    # WHEN config-changed fires, which is observed by the charm and by the cos-agent and
+    # remote-write libraries alike
+    with patch.object(
+        charm.GrafanaAgentMachineCharm, "_update_config", autospec=True
+    ) as update_config, patch.object(
+        charm.GrafanaAgentMachineCharm, "_update_status", autospec=True
+    ) as update_status, patch.object(
+        charm.GrafanaAgentMachineCharm, "_update_grafana_dashboards", autospec=True
+    ) as update_dashboards:
+        ctx.run(ctx.on.config_changed(), state)
+
+    # THEN each piece of work runs exactly once
+    update_config.assert_called_once()
+    update_status.assert_called_once()
+    update_dashboards.assert_called_once()
+    patch_all.assert_called_once()
+
+
+def test_nothing_runs_when_nothing_is_marked():
+    # GIVEN a charm with no pending work
+    ctx = Context(charm_type=charm.GrafanaAgentMachineCharm)
+
+    # WHEN a hook nothing is interested in fires
+    with patch.object(
+        charm.GrafanaAgentMachineCharm, "_update_config", autospec=True
+    ) as update_config:
+        ctx.run(ctx.on.update_status(), State(relations=[PeerRelation("peers")]))
+
+    # THEN no work is done
+    update_config.assert_not_called()
+
+
+def test_only_the_work_depending_on_changed_cos_agent_data_runs():
+    # GIVEN a charm that already processed its principal's cos-agent data
+    data = CosAgentProviderUnitData(
+        metrics_alert_rules={},
+        log_alert_rules={},
+        metrics_scrape_jobs=[],
+        log_slots=[],
+        dashboards=[],
+    )
+    cos_agent = SubordinateRelation(
+        "cos-agent", remote_app_name="principal", remote_unit_data={data.KEY: data.json()}
+    )
+    ctx = Context(charm_type=charm.GrafanaAgentMachineCharm)
+    state = ctx.run(
+        ctx.on.relation_changed(cos_agent, remote_unit=0),
+        State(relations=[cos_agent, PeerRelation("peers")]),
+    )
+
+    # WHEN only the dashboards of the principal change
+    data.dashboards = [LZMABase64.compress('{"title": "a"}')]
+    cos_agent = dataclasses.replace(cos_agent, remote_unit_data={data.KEY: data.json()})
+    state = dataclasses.replace(state, relations=[cos_agent, state.get_relations("peers")[0]])
+    with patch.object(
+        charm.GrafanaAgentMachineCharm, "_update_config", autospec=True
+    ) as update_config, patch.object(
+        charm.GrafanaAgentMachineCharm, "_update_grafana_dashboards", autospec=True
+    ) as update_dashboards:
+        ctx.run(ctx.on.relation_changed(cos_agent, remote_unit=0), state)
+
+    # THEN the dashboards are updated, but the config is not rendered again
+    update_dashboards.assert_called_once()
+    update_config.assert_not_called()
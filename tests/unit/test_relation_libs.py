@@ -0,0 +1,96 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+import dataclasses
+from unittest.mock import patch
+
+import pytest
+from charms.grafana_agent.v0.cos_agent import COSAgentRequirer
+from ops.testing import Context, PeerRelation, Relation, State, SubordinateRelation
+
+import charm
+
+RELATION_LIBS = set(charm.GrafanaAgentMachineCharm._relation_libs)
+DEFERRING_RELATION_LIBS = set(charm.GrafanaAgentMachineCharm._deferring_relation_libs)
+
+
+@pytest.fixture(autouse=True)
+def patch_all(placeholder_cfg_path):
+    with patch("grafana_agent.CONFIG_PATH", placeholder_cfg_path), patch(
+        "charm.GrafanaAgentMachineCharm.is_ready", True
+    ), patch("charm.GrafanaAgentMachineCharm._verify_snap_track"):
+        yield
+
+
+@pytest.fixture
+def ctx():
+    return Context(charm_type=charm.GrafanaAgentMachineCharm)
+
+
+def built_relation_libs(charm_instance) -> set:
+    """Names of the relation library objects that were built so far."""
+    return RELATION_LIBS.intersection(vars(charm_instance))
+
+
+def test_update_status_builds_only_the_deferring_relation_libs(ctx):
+    # WHEN update-status fires with nothing to reconcile
+    with ctx(ctx.on.update_status(), State(relations=[PeerRelation("peers")])) as mgr:
+        mgr.run()
+
+        # THEN only the relation library objects that may have deferred events are built
+        assert built_relation_libs(mgr.charm) == DEFERRING_RELATION_LIBS
+
+
+def test_update_status_builds_the_tls_lib_without_juju_secrets():
+    # GIVEN a Juju version without secrets, where the TLS library checks for expiry on
+    # update-status
+    ctx = Context(charm_type=charm.GrafanaAgentMachineCharm, juju_version="2.9.44")
+
+    # WHEN update-status fires
+    with ctx(ctx.on.update_status(), State(relations=[PeerRelation("peers")])) as mgr:
+        # THEN the certificate handler is built before the event is emitted
+        assert built_relation_libs(mgr.charm) == {"cert", *DEFERRING_RELATION_LIBS}
+        mgr.run()
+
+
+def test_config_changed_builds_all_relation_libs(ctx):
+    # WHEN config-changed fires, which most relation libraries observe
+    with ctx(ctx.on.config_changed(), State(relations=[PeerRelation("peers")])) as mgr:
+        # THEN all relation library objects are built before the event is emitted
+        assert built_relation_libs(mgr.charm) == RELATION_LIBS
+        mgr.run()
+
+
+def test_relation_hook_builds_its_own_relation_lib(ctx):
+    # GIVEN a grafana-cloud-config relation
+    cloud = Relation("grafana-cloud-config")
+    state = State(relations=[cloud, PeerRelation("peers")])
+
+    # WHEN one of its hooks fires
+    with ctx(ctx.on.relation_changed(cloud), state) as mgr:
+        # THEN the library observing it is built before the event is emitted
+        assert built_relation_libs(mgr.charm) == {"_cloud", *DEFERRING_RELATION_LIBS}
+        mgr.run()
+
+
+def test_deferred_cos_agent_events_are_emitted_on_unrelated_hooks(ctx):
+    # GIVEN a cos-agent relation event, deferred while the peer relation was not there
+    cos_agent = SubordinateRelation("cos-agent")
+    deferred = dataclasses.replace(
+        ctx.on.relation_changed(cos_agent, remote_unit=0).deferred(
+            COSAgentRequirer._on_relation_data_changed
+        ),
+        # Scenario can only tell the path of observers that are the charm itself.
+        handle_path=f"GrafanaAgentMachineCharm/on/cos_agent_relation_changed[{cos_agent.id}]",
+        owner="GrafanaAgentMachineCharm/COSAgentRequirer[cos-agent]",
+    )
+    state = State(relations=[cos_agent, PeerRelation("peers")], deferred=[deferred])
+
+    # WHEN a hook none of the other relation libraries observe fires
+    with patch.object(
+        COSAgentRequirer, "_on_relation_data_changed", autospec=True
+    ) as on_changed:
+        state_out = ctx.run(ctx.on.update_status(), state)
+
+    # THEN the deferred event is emitted again, rather than dropped
+    on_changed.assert_called_once()
+    assert not state_out.deferred
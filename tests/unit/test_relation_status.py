@@ -3,8 +3,10 @@
 
 import tempfile
 import unittest
-from unittest.mock import patch
+from pathlib import Path
+from unittest.mock import PropertyMock, patch
 
+from helpers import charm_root
 from ops.model import ActiveStatus, BlockedStatus
 from ops.testing import Harness
 
@@ -35,12 +37,24 @@ class TestRelationStatus(unittest.TestCase):
         self.mock_verify_snap_track = patcher.start()
         self.addCleanup(patcher.stop)
 
+        # otherwise will write the rules and dashboards into the source tree
+        patcher = patch.object(
+            GrafanaAgentCharm,
+            "charm_dir",
+            new_callable=PropertyMock,
+            return_value=charm_root(Path(tempfile.mkdtemp())),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
         self.harness = Harness(GrafanaAgentCharm)
         self.harness.set_model_name(self.__class__.__name__)
 
         self.addCleanup(self.harness.cleanup)
         self.harness.set_leader(True)
         self.harness.begin_with_initial_hooks()
+        # Event handlers only mark work; it runs when the status is collected.
+        self.harness.evaluate_status()
 
     def test_no_relations(self):
         # GIVEN no relations joined (see SetUp)
@@ -50,6 +64,7 @@ class TestRelationStatus(unittest.TestCase):
 
         # AND WHEN "update-status" fires
         self.harness.charm.on.update_status.emit()
+        self.harness.evaluate_status()
         # THEN status is still "blocked"
         self.assertIsInstance(self.harness.charm.unit.status, BlockedStatus)
 
@@ -57,6 +72,7 @@ class TestRelationStatus(unittest.TestCase):
         # WHEN an incoming relation is added
         rel_id = self.harness.add_relation("cos-agent", "zookeeper")
         self.harness.add_relation_unit(rel_id, "zookeeper/0")
+        self.harness.evaluate_status()
 
         # THEN the charm goes into blocked status
         self.assertIsInstance(self.harness.charm.unit.status, BlockedStatus)
@@ -65,12 +81,14 @@ class TestRelationStatus(unittest.TestCase):
         for outgoing in ["send-remote-write", "logging-consumer", "grafana-dashboards-provider"]:
             rel_id = self.harness.add_relation(outgoing, "cos-lite")
             self.harness.add_relation_unit(rel_id, "cos-lite/0")
+            self.harness.evaluate_status()
 
             # THEN the charm goes into active status when one mandatory relation is added
             self.assertIsInstance(self.harness.charm.unit.status, ActiveStatus)
 
         # AND WHEN we remove one of the mandatory relations
         self.harness.remove_relation(rel_id)
+        self.harness.evaluate_status()
 
         # THEN the charm keeps into active status
         self.assertIsInstance(self.harness.charm.unit.status, ActiveStatus)
@@ -83,6 +101,7 @@ class TestRelationStatus(unittest.TestCase):
         # WHEN an incoming relation is added
         rel_id = self.harness.add_relation("juju-info", "grafana-agent")
         self.harness.add_relation_unit(rel_id, "grafana-agent/0")
+        self.harness.evaluate_status()
 
         # THEN the charm goes into blocked status
         self.assertIsInstance(self.harness.charm.unit.status, BlockedStatus)
@@ -91,6 +110,7 @@ class TestRelationStatus(unittest.TestCase):
         for outgoing in ["send-remote-write", "logging-consumer"]:
             rel_id = self.harness.add_relation(outgoing, "grafana-agent")
             self.harness.add_relation_unit(rel_id, "grafana-agent/0")
+        self.harness.evaluate_status()
 
         # THEN the charm goes into active status
         self.assertIsInstance(self.harness.charm.unit.status, ActiveStatus)
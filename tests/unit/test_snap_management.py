@@ -0,0 +1,399 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+import io
+import json
+from unittest.mock import MagicMock, PropertyMock, mock_open, patch
+
+import charms.operator_libs_linux.v2.snap as snap_lib
+import pytest
+from ops.testing import (
+    BlockedStatus,
+    Context,
+    MaintenanceStatus,
+    PeerRelation,
+    State,
+    StoredState,
+    WaitingStatus,
+)
+
+import charm
+from snap_management import SnapHandle, _install_snap, install_ga_snap
+
+# Not mocked like in the charm tests (see conftest).
+connect_all = SnapHandle.connect_all
+
+INSTALLED = {
+    "name": "grafana-agent",
+    "channel": "latest/stable",
+    "revision": "142",
+    "confinement": "strict",
+    "apps": [{"snap": "grafana-agent", "name": "grafana-agent"}],
+    "version": "0.44.6",
+}
+
+
+@pytest.fixture
+def snap_client():
+    with patch("snap_management.os.path.isfile", return_value=True), patch.object(
+        snap_lib, "SnapClient"
+    ) as client:
+        yield client.return_value
+
+
+def test_snap_is_loaded_once_until_refreshed(snap_client):
+    # GIVEN an installed snap
+    snap_client._request.return_value = INSTALLED
+    handle = SnapHandle()
+
+    # WHEN it is used several times
+    assert handle.snap.present
+    assert handle.snap.revision == "142"
+
+    # THEN snapd is only asked about it once
+    assert handle.api_calls == 1
+    snap_client._request.assert_called_once_with("GET", "snaps/grafana-agent", query=None)
+    snap_client.get_installed_snaps.assert_not_called()
+
+    # AND WHEN it is refreshed
+    handle.refresh()
+    assert handle.snap.present
+
+    # THEN snapd is asked again
+    assert handle.api_calls == 2
+
+
+def test_snap_not_installed_is_looked_up_in_the_store(snap_client):
+    # GIVEN a snap that is not installed
+    snap_client._request.side_effect = snap_lib.SnapAPIError({}, 404, "Not Found", "not found")
+    snap_client.get_snap_information.return_value = {**INSTALLED, "apps": None}
+
+    # WHEN it is loaded
+    handle = SnapHandle()
+
+    # THEN it is available, but not present
+    assert not handle.snap.present
+    assert handle.api_calls == 2
+
+
+def test_snap_state_already_applied_is_not_applied_again():
+    with patch("snap_management.get_system_arch", return_value="amd64"), patch(
+        "snap_management._install_snap"
+    ) as install_snap:
+        # GIVEN the snap state was applied once
+        fingerprint = install_ga_snap(classic=False, config={"reporting-enabled": "0"})
+        install_snap.assert_called_once()
+
+        # WHEN the same state is requested again
+        install_ga_snap(
+            classic=False, config={"reporting-enabled": "0"}, applied_fingerprint=fingerprint
+        )
+
+        # THEN snapd is left alone
+        install_snap.assert_called_once()
+
+        # BUT WHEN a different state is requested
+        new_fingerprint = install_ga_snap(
+            classic=False, config={"reporting-enabled": "1"}, applied_fingerprint=fingerprint
+        )
+
+        # THEN it is applied
+        assert install_snap.call_count == 2
+        assert new_fingerprint != fingerprint
+
+
+def test_refresh_is_submitted_without_waiting(snap_client):
+    # GIVEN the snap installed at another revision
+    handle = SnapHandle()
+    handle._snap = MagicMock(present=True, revision="1")
+
+    # WHEN it is refreshed
+    with patch.object(handle, "refresh_async", return_value="7") as refresh_async:
+        _install_snap("grafana-agent", revision="142", config={"a": "b"}, handle=handle)
+
+    # THEN the refresh is submitted, and the rest is left for when it is done
+    refresh_async.assert_called_once_with("142", classic=False)
+    handle._snap.set.assert_not_called()
+    handle._snap.hold.assert_not_called()
+
+
+@pytest.mark.parametrize("done", (False, True))
+def test_pending_refresh_is_checked_on_update_status(placeholder_cfg_path, done):
+    # GIVEN a snap refresh in progress
+    state = State(
+        relations=[PeerRelation("peers")],
+        stored_states={
+            StoredState(owner_path="GrafanaAgentMachineCharm", content={"snap_change": "7"})
+        },
+    )
+    ctx = Context(charm_type=charm.GrafanaAgentMachineCharm)
+    progress = ("Done", "3/3 tasks done") if done else ("Doing", "Download snap (40%)")
+
+    # WHEN update-status fires
+    with patch("grafana_agent.CONFIG_PATH", placeholder_cfg_path), patch.object(
+        SnapHandle, "change_progress", return_value=progress
+    ), patch("charm.install_ga_snap") as install, patch(
+        "charm.GrafanaAgentMachineCharm.snap", new_callable=PropertyMock
+    ) as snap, patch("charm.GrafanaAgentMachineCharm._update_config"):
+        install.return_value = "fingerprint"
+        state_out = ctx.run(ctx.on.update_status(), state)
+
+    stored = next(s for s in state_out.stored_states if s.owner_path == "GrafanaAgentMachineCharm")
+    if not done:
+        # THEN its progress is reported, and nothing else is done with the snap
+        assert state_out.unit_status == MaintenanceStatus(
+            "Refreshing grafana-agent snap: Download snap (40%)"
+        )
+        assert stored.content["snap_change"] == "7"
+        install.assert_not_called()
+    else:
+        # THEN the agent is started on the new revision, and the rest of the state is applied
+        assert stored.content["snap_change"] is None
+        snap.return_value.start.assert_called_once_with(enable=True)
+        install.assert_called_once()
+        assert stored.content["snap_fingerprint"] == "fingerprint"
+
+
+def test_config_is_applied_once_the_pending_refresh_is_done(placeholder_cfg_path):
+    # GIVEN a snap refresh in progress
+    state = State(
+        relations=[PeerRelation("peers")],
+        stored_states={
+            StoredState(owner_path="GrafanaAgentMachineCharm", content={"snap_change": "7"})
+        },
+    )
+    ctx = Context(charm_type=charm.GrafanaAgentMachineCharm)
+
+    with patch("grafana_agent.CONFIG_PATH", placeholder_cfg_path), patch.object(
+        SnapHandle, "change_progress", return_value=("Doing", "Download snap (40%)")
+    ) as progress, patch("charm.install_ga_snap", return_value="fingerprint"), patch(
+        "charm.GrafanaAgentMachineCharm.snap", new_callable=PropertyMock
+    ) as snap, patch("charm.GrafanaAgentMachineCharm._connect_logging_snap_endpoints") as connect:
+        snap.return_value.restart.side_effect = snap_lib.SnapError("snap has changes in progress")
+
+        # WHEN config-changed fires
+        state_out = ctx.run(ctx.on.config_changed(), state)
+
+        # THEN the hook does not fail, and neither the config nor the plugs are applied yet
+        assert state_out.unit_status == MaintenanceStatus(
+            "Refreshing grafana-agent snap: Download snap (40%)"
+        )
+        snap.return_value.restart.assert_not_called()
+        snap.return_value.start.assert_not_called()
+        connect.assert_not_called()
+        assert not placeholder_cfg_path.exists()
+
+        # AND WHEN update-status fires once the refresh is done
+        progress.return_value = ("Done", "3/3 tasks done")
+        snap.return_value.restart.side_effect = None
+        state_out = ctx.run(ctx.on.update_status(), state_out)
+
+    # THEN the agent is started, and the plugs are connected before the config is applied
+    snap.return_value.start.assert_called_once_with(enable=True)
+    connect.assert_called_once()
+    assert placeholder_cfg_path.read_text()
+
+
+@pytest.mark.parametrize(
+    "error, status",
+    (
+        (
+            snap_lib.SnapAPIError(
+                {}, 409, "Conflict", 'snap "grafana-agent" has changes in progress'
+            ),
+            WaitingStatus("waiting for another snapd change to grafana-agent"),
+        ),
+        (
+            snap_lib.SnapNotFoundError("Snap 'grafana-agent' not found!"),
+            BlockedStatus("Failed to refresh grafana-agent. Snap 'grafana-agent' not found!"),
+        ),
+    ),
+)
+def test_snap_errors_are_reported_and_retried(placeholder_cfg_path, error, status):
+    ctx = Context(charm_type=charm.GrafanaAgentMachineCharm)
+    with patch("grafana_agent.CONFIG_PATH", placeholder_cfg_path), patch(
+        "charm.install_ga_snap"
+    ) as install, patch("charm.GrafanaAgentMachineCharm._update_config"):
+        # GIVEN snapd failing to apply the snap state
+        install.side_effect = error
+
+        # WHEN config-changed fires
+        state_out = ctx.run(ctx.on.config_changed(), State(relations=[PeerRelation("peers")]))
+
+        # THEN the hook does not fail, and the unit reports why the snap is not applied
+        assert state_out.unit_status == status
+        stored = next(
+            s for s in state_out.stored_states if s.owner_path == "GrafanaAgentMachineCharm"
+        )
+        assert stored.content["snap_failed"]
+
+        # AND WHEN update-status fires, once snapd can apply it
+        install.side_effect = None
+        install.return_value = "fingerprint"
+        state_out = ctx.run(ctx.on.update_status(), state_out)
+
+    # THEN the snap state is applied again
+    assert install.call_count == 2
+    assert state_out.unit_status != status
+    stored = next(s for s in state_out.stored_states if s.owner_path == "GrafanaAgentMachineCharm")
+    assert not stored.content["snap_failed"]
+    assert stored.content["snap_fingerprint"] == "fingerprint"
+
+
+def test_only_missing_plugs_are_connected_at_once(snap_client):
+    # GIVEN a plug already connected to one of three slots
+    snap_client._request.return_value = {
+        "established": [
+            {
+                "slot": {"snap": "app", "slot": "logs-1"},
+                "plug": {"snap": "grafana-agent", "plug": "logs"},
+                "interface": "content",
+            }
+        ]
+    }
+    snap_client._request_raw.side_effect = lambda *args, **kwargs: io.BytesIO(
+        json.dumps({"type": "async", "change": str(snap_client._request_raw.call_count)}).encode()
+    )
+    handle = SnapHandle()
+
+    # WHEN the plug is connected to all three
+    slots = [("app", "logs-1"), ("app", "logs-2"), ("app", "logs-3")]
+    errors = connect_all(handle, "logs", slots)
+
+    # THEN the connections are read once, and only the other two slots are connected
+    assert errors == {}
+    snap_client._request.assert_called_once_with(
+        "GET", "connections", query={"snap": "grafana-agent"}
+    )
+    submitted = [json.loads(call.kwargs["data"]) for call in snap_client._request_raw.mock_calls]
+    assert [body["slots"] for body in submitted] == [
+        [{"snap": "app", "slot": "logs-2"}],
+        [{"snap": "app", "slot": "logs-3"}],
+    ]
+
+    # AND both are submitted before waiting for either
+    assert [(name, args[-1]) for name, args, _ in snap_client.mock_calls if name == "_wait"] == [
+        ("_wait", "1"),
+        ("_wait", "2"),
+    ]
+    assert [name for name, _, _ in snap_client.mock_calls if name != "_request"] == [
+        "_request_raw",
+        "_request_raw",
+        "_wait",
+        "_wait",
+    ]
+
+
+SNAP_YAML = """
+apps: {app: {}}
+slots:
+  logs: {source: {read: [$SNAP_DATA/logs, $SNAP_COMMON/logs]}}
+  audit: {source: {read: [$SNAP_COMMON/audit]}}
+"""
+
+
+def test_snap_log_dirs_are_evaluated_in_a_single_invocation(placeholder_cfg_path):
+    ctx = Context(charm_type=charm.GrafanaAgentMachineCharm)
+    evaluated = MagicMock(
+        returncode=0,
+        stdout="/var/snap/app/12/logs\n/var/snap/app/common/logs\n/var/snap/app/common/audit\n",
+    )
+    with patch("grafana_agent.CONFIG_PATH", placeholder_cfg_path), ctx(
+        ctx.on.update_status(), State(relations=[PeerRelation("peers")])
+    ) as mgr, patch("charm.open", mock_open(read_data=SNAP_YAML), create=True), patch(
+        "charm.os.readlink", return_value="12"
+    ), patch("charm.subprocess.run", return_value=evaluated) as run:
+        # GIVEN a snap with two log slots
+        # WHEN their log directories are looked up
+        log_dirs = mgr.charm._snap_log_dirs("app", ["logs", "audit"])
+
+    # THEN the paths of both slots are evaluated in a single invocation
+    assert log_dirs == {
+        "revision": "12",
+        "slots": {
+            "logs": ["/var/snap/app/12/logs", "/var/snap/app/common/logs"],
+            "audit": ["/var/snap/app/common/audit"],
+        },
+    }
+    run.assert_called_once()
+    assert run.call_args.kwargs["input"] == (
+        "echo $SNAP_DATA/logs\necho $SNAP_COMMON/logs\necho $SNAP_COMMON/audit\n"
+    )
+
+
+def test_stored_snap_log_dirs_are_reused_while_the_revision_is_current(placeholder_cfg_path):
+    # GIVEN the log directories of a snap evaluated at revision 12 by a previous dispatch
+    # AND those of a snap that is no longer connected
+    stored = {
+        "app": {"revision": "12", "slots": {"logs": ["/var/snap/app/12/logs"]}},
+        "gone": {"revision": "3", "slots": {"logs": ["/var/snap/gone/3/logs"]}},
+    }
+    state = State(
+        config={"classic_snap": True},
+        relations=[PeerRelation("peers")],
+        stored_states={
+            StoredState(owner_path="GrafanaAgentMachineCharm", content={"snap_log_dirs": stored})
+        },
+    )
+    ctx = Context(charm_type=charm.GrafanaAgentMachineCharm)
+    endpoints = {"app": [(MagicMock(owner="app"), MagicMock())]}
+    endpoints["app"][0][0].name = "logs"
+    evaluated = MagicMock(
+        returncode=0, stdout="/var/snap/app/13/logs\n/var/snap/app/common/logs\n"
+    )
+    with patch("grafana_agent.CONFIG_PATH", placeholder_cfg_path), ctx(
+        ctx.on.update_status(), state
+    ) as mgr, patch.object(
+        mgr.charm, "_snap_log_endpoints_by_owner", return_value=endpoints
+    ), patch("charm.open", mock_open(read_data=SNAP_YAML), create=True), patch(
+        "charm.os.readlink", return_value="12"
+    ) as readlink, patch("charm.subprocess.run", return_value=evaluated) as run:
+        # WHEN they are updated at the same revision
+        mgr.charm._update_snap_log_dirs()
+
+        # THEN the snap is not run again, and the snap no longer connected is dropped
+        run.assert_not_called()
+        assert dict(mgr.charm._stored.snap_log_dirs) == {"app": stored["app"]}
+
+        # AND WHEN the snap was refreshed to another revision
+        readlink.return_value = "13"
+        # THEN looking its directories up evaluates them again, without storing them
+        log_dirs = mgr.charm._snap_log_dirs("app", ["logs"])
+        assert log_dirs is not None
+        assert log_dirs["slots"]["logs"][0] == "/var/snap/app/13/logs"
+        assert mgr.charm._stored.snap_log_dirs["app"]["revision"] == "12"
+        # AND updating them stores those of the new revision
+        mgr.charm._update_snap_log_dirs()
+        state_out = mgr.run()
+
+    assert run.call_count == 2
+    stored_out = next(
+        s for s in state_out.stored_states if s.owner_path == "GrafanaAgentMachineCharm"
+    )
+    assert stored_out.content["snap_log_dirs"] == {
+        "app": {
+            "revision": "13",
+            "slots": {"logs": ["/var/snap/app/13/logs", "/var/snap/app/common/logs"]},
+        }
+    }
+
+
+def test_log_paths_evaluated_to_empty_lines_are_kept(placeholder_cfg_path):
+    ctx = Context(charm_type=charm.GrafanaAgentMachineCharm)
+    with patch("grafana_agent.CONFIG_PATH", placeholder_cfg_path), ctx(
+        ctx.on.update_status(), State(relations=[PeerRelation("peers")])
+    ) as mgr, patch("charm.subprocess.run") as run:
+        # GIVEN a path that evaluates to nothing, between two others
+        run.return_value = MagicMock(returncode=0, stdout="/a\n\n/c\n")
+
+        # WHEN the paths are evaluated
+        paths = mgr.charm._evaluate_log_paths(["/a", "$UNSET", "/c"], snap="app", app="app")
+
+        # THEN each path keeps its place
+        assert paths == ["/a", "", "/c"]
+
+        # AND WHEN some paths are missing from the output
+        run.return_value = MagicMock(returncode=0, stdout="/a\n")
+
+        # THEN a log path error is raised
+        with pytest.raises(charm.GrafanaAgentLogPathError):
+            mgr.charm._evaluate_log_paths(["/a", "/b"], snap="app", app="app")
@@ -3,8 +3,10 @@
 
 import tempfile
 import unittest
-from unittest.mock import patch
+from pathlib import Path
+from unittest.mock import PropertyMock, patch
 
+from helpers import charm_root
 from ops.testing import Harness
 
 from charm import GrafanaAgentMachineCharm as GrafanaAgentCharm
@@ -34,6 +36,16 @@ class TestUpdateStatus(unittest.TestCase):
         self.mock_verify_snap_track = patcher.start()
         self.addCleanup(patcher.stop)
 
+        # otherwise will write the rules and dashboards into the source tree
+        patcher = patch.object(
+            GrafanaAgentCharm,
+            "charm_dir",
+            new_callable=PropertyMock,
+            return_value=charm_root(Path(tempfile.mkdtemp())),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
         self.harness = Harness(GrafanaAgentCharm)
         self.harness.set_model_name(self.__class__.__name__)
 